@@ -0,0 +1,99 @@
+# backend/app/core/keyword_rules.py
+"""
+Keyword safety heuristics.
+
+KEYWORD_RULES is the declarative rule table: a text whose lowercased form
+contains any phrase of a rule gets at least that rule's boost for each label.
+All phrases are compiled once at import into a single lookahead alternation,
+so one regex pass over a text (or a whole batch of texts) finds every rule hit,
+including overlapping ones.
+"""
+import bisect
+import re
+from typing import Dict, List
+
+import numpy as np
+
+KEYWORD_RULES: List[Dict] = [
+    {
+        "name": "self_harm",
+        "phrases": ["suicid", "end it", "kill myself", "end it all", "want to die", "not worth living", "end my life"],
+        "boosts": {"self_harm": 0.95, "mental_health_risk": 0.9},
+    },
+    {
+        "name": "depression",
+        "phrases": ["depressed", "depression", "hopeless", "alone", "can't go on", "can't keep going"],
+        "boosts": {"mental_health_risk": 0.85},
+    },
+    {
+        "name": "bullying",
+        "phrases": ["bully", "bullied", "bullying"],
+        "boosts": {"cyberbullying": 0.92},
+    },
+    {
+        "name": "substance_abuse",
+        "phrases": ["drink", "drugs", "pill", "alcohol", "high"],
+        "boosts": {"substance_abuse": 0.6},
+    },
+    {
+        "name": "adult_content",
+        "phrases": ["nude", "sex", "porn"],
+        "boosts": {"adult_content": 0.7},
+    },
+]
+
+# Joins batched texts; no phrase contains it, so no match can span two texts
+_SEP = "\x00"
+
+
+def _compile(rules: List[Dict]):
+    """
+    Build one regex matching, at every position, the longest phrase starting there.
+    Any other phrase matching at the same position is a prefix of that one, so each
+    phrase maps to the rule indices of itself and all of its prefix phrases.
+    """
+    phrase_rules: Dict[str, set] = {}
+    for j, rule in enumerate(rules):
+        for phrase in rule["phrases"]:
+            phrase_rules.setdefault(phrase, set()).add(j)
+    implied = {
+        p: sorted(set().union(*(rs for q, rs in phrase_rules.items() if p.startswith(q))))
+        for p in phrase_rules
+    }
+    ordered = sorted(phrase_rules, key=len, reverse=True)
+    # cheap first-character check before trying the full alternation
+    first = "".join(sorted({p[0] for p in ordered}))
+    pattern = re.compile(
+        "(?=[" + re.escape(first) + "])(?=(" + "|".join(re.escape(p) for p in ordered) + "))"
+    )
+    return pattern, implied
+
+
+_PATTERN, _IMPLIED_RULES = _compile(KEYWORD_RULES)
+
+
+def match_rules_batch(texts: List[str]) -> np.ndarray:
+    """Return a bool (n_texts x n_rules) matrix of rule hits, from one scan over all texts."""
+    return match_lowered_batch([t.lower() for t in texts])
+
+
+def match_lowered_batch(lowered: List[str]) -> np.ndarray:
+    """match_rules_batch for texts the caller has already lowercased."""
+    hits = np.zeros((len(lowered), len(KEYWORD_RULES)), dtype=bool)
+    if not lowered:
+        return hits
+    # start offset of each text within the joined string
+    starts = []
+    pos = 0
+    for t in lowered:
+        starts.append(pos)
+        pos += len(t) + 1
+    for m in _PATTERN.finditer(_SEP.join(lowered)):
+        i = bisect.bisect_right(starts, m.start()) - 1
+        hits[i, _IMPLIED_RULES[m.group(1)]] = True
+    return hits
+
+
+def match_rules(text: str) -> np.ndarray:
+    """Return a bool (n_rules,) vector of rule hits for one text."""
+    return match_rules_batch([text])[0]
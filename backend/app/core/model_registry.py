@@ -0,0 +1,136 @@
+# backend/app/core/model_registry.py
+"""
+Model registry.
+Modules register a loader per model name; artifacts are loaded on first use
+(or by warm_up() in a background task at startup) instead of at import, and
+the registry records which models are loaded and how long each load took.
+
+MODEL_WARMUP env: "background" (default) warms all models after startup,
+"lazy" loads each model only when first requested.
+
+reload() loads a fresh copy next to the live one, validates it, then swaps the
+reference in a single assignment: callers that already hold the old model
+finish on it, later get() calls see the new one.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+WARMUP_MODE = os.getenv("MODEL_WARMUP", "background").lower()
+
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], validate: Optional[Callable[[Any], None]] = None, warm: bool = True):
+        self.loader = loader
+        self.validate = validate
+        self.warm = warm
+        self.value: Any = None
+        self.loaded = False
+        self.loading = False
+        self.load_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.reloads = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self.warmup_started = False
+        self.warmup_done = False
+
+    def register(self, name: str, loader: Callable[[], Any], validate: Optional[Callable[[Any], None]] = None,
+                 warm: bool = True):
+        """
+        Register a zero-arg loader; it runs once on first get() and again on reload().
+        `validate(model)` should raise if a freshly loaded model is unusable.
+        warm=False leaves the model out of the default warm_up() (load on first use).
+        """
+        self._entries[name] = _Entry(loader, validate, warm)
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model (None if its loader failed or found nothing)."""
+        entry = self._entries[name]
+        if entry.loaded:
+            return entry.value
+        with entry.lock:
+            if not entry.loaded:
+                entry.loading = True
+                t0 = time.perf_counter()
+                try:
+                    entry.value = entry.loader()
+                except Exception as e:
+                    entry.value = None
+                    entry.error = f"{type(e).__name__}: {e}"
+                entry.load_ms = (time.perf_counter() - t0) * 1000.0
+                entry.loading = False
+                entry.loaded = True
+        return entry.value
+
+    def reload(self, name: str) -> Dict[str, Any]:
+        """
+        Load, validate and atomically swap in a new copy of a model. On any failure
+        the current model stays live. Returns a report of the attempt.
+        """
+        entry = self._entries[name]
+        with entry.reload_lock:
+            t0 = time.perf_counter()
+            report: Dict[str, Any] = {"model": name, "swapped": False, "error": None}
+            try:
+                new = entry.loader()
+                if new is None:
+                    raise FileNotFoundError("artifact not found")
+                if entry.validate is not None:
+                    entry.validate(new)
+            except Exception as e:
+                report["error"] = f"{type(e).__name__}: {e}"
+            else:
+                with entry.lock:
+                    entry.value = new
+                    entry.loaded = True
+                    entry.error = None
+                    entry.load_ms = (time.perf_counter() - t0) * 1000.0
+                entry.reloads += 1
+                report["swapped"] = True
+            report["version"] = getattr(entry.value, "version", None)
+            report["ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+            entry.last_reload = report
+            return report
+
+    def is_loaded(self, name: str) -> bool:
+        return self._entries[name].loaded
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        """Load the given (default: all registered with warm=True) models now."""
+        self.warmup_started = True
+        for name in names or [n for n, e in self._entries.items() if e.warm]:
+            self.get(name)
+        self.warmup_done = True
+
+    def ready(self) -> bool:
+        if any(e.loading for e in self._entries.values()):
+            return False
+        return WARMUP_MODE == "lazy" or self.warmup_done
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "loaded": e.loaded,
+                "available": e.loaded and e.value is not None,
+                "load_ms": round(e.load_ms, 2) if e.load_ms is not None else None,
+                "error": e.error,
+                "version": getattr(e.value, "version", None),
+                "reloads": e.reloads,
+                "last_reload": e.last_reload,
+            }
+            for name, e in self._entries.items()
+        }
+
+
+registry = ModelRegistry()
@@ -1,19 +1,30 @@
 # backend/app/core/models_api.py
 """
-Light, robust model loader:
-- Try to load transformer_multilabel from experiments/transformer_model
-- Else, try a TF-IDF OneVsRest pipeline joblib
-Expose predict_multilabel_single(text) -> dict label->prob and map_probs_to_risk
+Light, robust model loader (artifacts load lazily through model_registry):
+- With INFERENCE_BACKEND=transformer, the fine-tuned model in
+  experiments/transformer_model is served by core.transformer_backend
+- Else (and as the fallback), a TF-IDF OneVsRest pipeline joblib (served through
+  its compiled fast-path export when one built from the same artifact is present)
+Expose predict_multilabel_single(text) -> dict label->prob,
+predict_multilabel_batch(texts) -> (n x 7) array and map_probs_to_risk
 """
-import os, joblib, json
+import os, re, joblib, json, hashlib
 from pathlib import Path
+from typing import List, Optional
 import numpy as np
 
+from .keyword_rules import KEYWORD_RULES, match_rules_batch
+from .model_registry import registry
+
 ROOT = Path(__file__).resolve().parents[2]
 EXP = ROOT / "experiments"
 TFIDF_PIPE = EXP / "tfidf_ovr_pipeline.joblib"
+TFIDF_COMPILED = EXP / "tfidf_ovr_compiled.joblib"
 TRANS_DIR = EXP / "transformer_model"
 
+# "tfidf" (default), "transformer" or "cascade"; see services.ai_inference
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tfidf").lower()
+
 LABELS = [
     "mental_health_risk",
     "substance_abuse",
@@ -24,79 +35,219 @@ LABELS = [
     "online_predator",
 ]
 
-# Try TF-IDF pipeline first (fast)
-_tfidf_pipeline = None
-_label_binarizer = None
-try:
-    if TFIDF_PIPE.exists():
-        _tfidf_pipeline = joblib.load(str(TFIDF_PIPE))
-except Exception:
-    _tfidf_pipeline = None
 
-def predict_multilabel_single(text: str) -> dict:
-    # returns dict label->prob (0..1)
-    out = {l: 0.0 for l in LABELS}
-    
-    if _tfidf_pipeline:
-        try:
-            probs = _tfidf_pipeline.predict_proba([text])
-            # OneVsRest predict_proba returns list of arrays per class; handle accordingly
-            try:
-                class_probs = np.array([p[:,1] if p.ndim==2 else p for p in probs]).T[0]
-            except Exception:
-                class_probs = np.clip(probs[0], 0.0, 1.0)
-            for i, label in enumerate(LABELS):
-                out[label] = float(class_probs[i]) if i < len(class_probs) else 0.0
-        except Exception:
-            pass  # Fall through to keyword heuristics
-    
+def artifact_fingerprint(path: Path = TFIDF_PIPE):
+    """Cheap (mtime_ns, size) stamp used to notice when an artifact file changes."""
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+
+def _file_version(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+
+class CompiledTfidfScorer:
+    """
+    Fast path for the TF-IDF OneVsRest pipeline, built from the artifact written by
+    training/train_tfidf_multilabel.py::export_compiled. Scores a batch with one
+    sparse (tfidf) x dense (stacked coef) product and np.interp isotonic tables.
+    """
+
+    def __init__(self, compiled: dict):
+        self.vocabulary = compiled["vocabulary"]
+        self.idf = compiled["idf"]
+        self.token_re = re.compile(compiled["token_pattern"])
+        self.lowercase = compiled["lowercase"]
+        self.min_n, self.max_n = compiled["ngram_range"]
+        self.norm = compiled["norm"]
+        self.coef = np.ascontiguousarray(compiled["coef"])
+        self.intercept = compiled["intercept"]
+        self.calib_x = compiled["calib_x"]
+        self.calib_y = compiled["calib_y"]
+        col_label = compiled["col_label"]
+        n_labels = len(compiled["labels"])
+        # (n_cols x n_labels) averaging matrix over each label's calibrated folds
+        avg = np.zeros((len(col_label), n_labels))
+        avg[np.arange(len(col_label)), col_label] = 1.0
+        self.avg = avg / np.maximum(avg.sum(axis=0), 1.0)
+        self.source_version = compiled.get("source_version")
+
+    def _ngrams(self, doc: str):
+        tokens = self.token_re.findall(doc.lower() if self.lowercase else doc)
+        if self.max_n == 1:
+            return tokens
+        out = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), min(self.max_n, len(tokens)) + 1):
+            out.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return out
+
+    def transform(self, texts: List[str]):
+        from scipy import sparse
+        vocab = self.vocabulary
+        indices, data, indptr = [], [], [0]
+        for doc in texts:
+            counts = {}
+            for g in self._ngrams(doc):
+                j = vocab.get(g)
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(data, dtype=np.float64) * self.idf[indices]
+        indptr = np.asarray(indptr, dtype=np.int32)
+        if self.norm == "l2" and len(data):
+            sq = np.zeros(len(texts))
+            rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+            np.add.at(sq, rows, data * data)
+            data /= np.sqrt(sq)[rows]
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(texts), len(self.idf)))
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        scores = self.transform(texts) @ self.coef + self.intercept
+        calibrated = np.empty_like(scores)
+        for c in range(scores.shape[1]):
+            calibrated[:, c] = np.interp(scores[:, c], self.calib_x[c], self.calib_y[c])
+        return calibrated @ self.avg
+
+
+class TfidfModel:
+    """A loaded TF-IDF pipeline, its optional compiled fast path and version tag."""
+
+    def __init__(self, pipeline, scorer: "CompiledTfidfScorer" = None, version: str = "tfidf"):
+        self.pipeline = pipeline
+        self.scorer = scorer
+        self.version = version
+
+    def predict_proba(self, texts: List[str]):
+        if self.scorer is not None:
+            return self.scorer.predict_proba(texts)
+        return self.pipeline.predict_proba(texts)
+
+
+def _load_tfidf():
+    # Try TF-IDF pipeline first (fast)
+    if not TFIDF_PIPE.exists():
+        return None
+    pipeline = joblib.load(str(TFIDF_PIPE))
+    version = "tfidf-" + _file_version(TFIDF_PIPE)
+    scorer = None
+    # Compiled fast path; only used when it was exported from the loaded pipeline
+    try:
+        if TFIDF_COMPILED.exists() and os.getenv("TFIDF_FAST_PATH", "1") != "0":
+            compiled = CompiledTfidfScorer(joblib.load(str(TFIDF_COMPILED)))
+            if "tfidf-" + str(compiled.source_version) == version:
+                scorer = compiled
+    except Exception:
+        scorer = None
+    return TfidfModel(pipeline, scorer, version)
+
+
+def _validate_tfidf(model: TfidfModel):
+    """Smoke prediction run on a freshly loaded pipeline before it is swapped in."""
+    probs = np.asarray(model.predict_proba(["hey, are you coming later?", "i want to end it all"]))
+    if probs.shape != (2, len(LABELS)) or not np.all(np.isfinite(probs)):
+        raise ValueError(f"smoke prediction returned shape {probs.shape} / non-finite values")
+    if probs.min() < -1e-6 or probs.max() > 1 + 1e-6:
+        raise ValueError("smoke prediction returned probabilities outside [0, 1]")
+
+
+# Loaded on first use (or by the startup warm-up), not at import; hot-reloadable
+registry.register("tfidf", _load_tfidf, validate=_validate_tfidf)
+
+
+def _version_of(model) -> str:
+    return model.version if model is not None else "keywords-only"
+
+
+def model_version() -> str:
+    """Identifies the active scorer; part of every prediction cache key."""
+    return _version_of(registry.get("tfidf"))
+
+# (n_rules x n_labels) boost matrix matching keyword_rules.KEYWORD_RULES
+_KEYWORD_BOOSTS = np.array(
+    [[rule["boosts"].get(l, 0.0) for l in LABELS] for rule in KEYWORD_RULES],
+    dtype=np.float64,
+)
+
+
+def _model_probs_batch(texts: List[str], model=None) -> np.ndarray:
+    """Run the TF-IDF pipeline once over all texts -> (n_texts x n_labels)."""
+    out = np.zeros((len(texts), len(LABELS)), dtype=np.float64)
+    if model is None or not texts:
+        return out
+    try:
+        probs = model.predict_proba(list(texts))
+        # OneVsRest predict_proba returns (n, n_labels); older estimators may return
+        # a list of per-class (n, 2) arrays
+        if isinstance(probs, list):
+            probs = np.column_stack([p[:, 1] if p.ndim == 2 else p for p in probs])
+        probs = np.clip(np.asarray(probs, dtype=np.float64), 0.0, 1.0)
+        k = min(probs.shape[1], len(LABELS))
+        out[:, :k] = probs[:, :k]
+    except Exception:
+        pass  # Fall through to keyword heuristics
+    return out
+
+
+def _keyword_probs_batch(texts: List[str], hits: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Keyword heuristic probabilities -> (n_texts x n_labels). hits: the texts'
+    keyword_rules match matrix, when the caller already has it.
+    """
+    if hits is None:
+        hits = match_rules_batch(texts)
+    if not hits.any():
+        return np.zeros((len(hits), len(LABELS)), dtype=np.float64)
+    return (hits[:, :, None] * _KEYWORD_BOOSTS[None, :, :]).max(axis=1)
+
+
+def score_tiers(texts: List[str], hits: Optional[np.ndarray] = None):
+    """
+    TF-IDF and keyword probabilities kept apart -> (model_probs, keyword_probs, version),
+    for callers (the cascade) that route on them separately. hits as _keyword_probs_batch.
+    """
+    model = registry.get("tfidf")
+    texts = list(texts)
+    if not texts:
+        empty = np.zeros((0, len(LABELS)), dtype=np.float64)
+        return empty, empty, _version_of(model)
+    return _model_probs_batch(texts, model), _keyword_probs_batch(texts, hits), _version_of(model)
+
+
+def predict_multilabel_batch_versioned(texts: List[str], hits: Optional[np.ndarray] = None):
+    """
+    Like predict_multilabel_batch, but also returns the version of the model that
+    scored the batch. The model reference is taken once, so a concurrent hot
+    reload never mixes two models within one batch. hits as _keyword_probs_batch.
+    """
+    model_probs, keyword_probs, version = score_tiers(texts, hits)
     # Always run keyword heuristics and take max with model predictions
     # This ensures critical cases are caught even if model misses them
-    lower = text.lower()
-    keyword_probs = {l: 0.0 for l in LABELS}
-    
-    # Self-harm detection - more comprehensive
-    if any(phrase in lower for phrase in ["suicid", "end it", "kill myself", "end it all", "want to die", "not worth living", "end my life"]):
-        keyword_probs["self_harm"] = 0.95
-        keyword_probs["mental_health_risk"] = 0.9
-    # Depression and mental health
-    if any(phrase in lower for phrase in ["depressed", "depression", "hopeless", "alone", "can't go on", "can't keep going"]):
-        keyword_probs["mental_health_risk"] = max(keyword_probs["mental_health_risk"], 0.85)
-    # Bullying
-    if any(phrase in lower for phrase in ["bully", "bullied", "bullying"]):
-        keyword_probs["cyberbullying"] = 0.92
-    # Substance abuse
-    if any(phrase in lower for phrase in ["drink", "drugs", "pill", "alcohol", "high"]):
-        keyword_probs["substance_abuse"] = 0.6
-    # Adult content
-    if any(phrase in lower for phrase in ["nude", "sex", "porn"]):
-        keyword_probs["adult_content"] = 0.7
-    
-    # Take maximum of model and keyword predictions
-    for label in LABELS:
-        out[label] = max(out[label], keyword_probs[label])
-    
-    return out
-    # fallback simple keyword heuristics (temporary)
-    lower = text.lower()
-    out = {l: 0.0 for l in LABELS}
-    # Self-harm detection - more comprehensive
-    if any(phrase in lower for phrase in ["suicid", "end it", "kill myself", "end it all", "want to die", "not worth living", "end my life"]):
-        out["self_harm"] = 0.95
-        out["mental_health_risk"] = 0.9
-    # Depression and mental health
-    if any(phrase in lower for phrase in ["depressed", "depression", "hopeless", "alone", "can't go on", "can't keep going"]):
-        out["mental_health_risk"] = max(out["mental_health_risk"], 0.85)
-    # Bullying
-    if any(phrase in lower for phrase in ["bully", "bullied", "bullying"]):
-        out["cyberbullying"] = 0.92
-    # Substance abuse
-    if any(phrase in lower for phrase in ["drink", "drugs", "pill", "alcohol", "high"]):
-        out["substance_abuse"] = 0.6
-    # Adult content
-    if any(phrase in lower for phrase in ["nude", "sex", "porn"]):
-        out["adult_content"] = 0.7
-    return out
+    return np.maximum(model_probs, keyword_probs), version
+
+
+def predict_multilabel_batch(texts: List[str]) -> np.ndarray:
+    """
+    Score many texts at once -> (n_texts x n_labels) array, columns ordered as LABELS.
+    One vectorizer transform and one predict_proba for the whole batch.
+    """
+    return predict_multilabel_batch_versioned(texts)[0]
+
+
+def probs_row_to_dict(row) -> dict:
+    return {label: float(row[i]) for i, label in enumerate(LABELS)}
+
+
+def predict_multilabel_single(text: str) -> dict:
+    # returns dict label->prob (0..1)
+    return probs_row_to_dict(predict_multilabel_batch([text])[0])
 
 def map_probs_to_risk(probs: dict) -> dict:
     # simple rule-based map; more sophisticated model in experiments can replace this
@@ -124,3 +275,11 @@ def map_probs_to_risk(probs: dict) -> dict:
         # Normal scaling
         norm = max(0.0, min(1.0, score / (sum(weights.values()) * 0.5)))
     return {"risk_score": float(norm), "label_probs": probs}
+
+
+# every value risk_level_for returns, i.e. what routes persist as RiskHistory.risk_level
+RISK_LEVELS = ("low", "medium", "high")
+
+
+def risk_level_for(score: float) -> str:
+    return "high" if score >= 0.7 else "medium" if score >= 0.45 else "low"
@@ -0,0 +1,145 @@
+# backend/app/core/prediction_cache.py
+"""
+Bounded cache of per-text label probabilities.
+
+Keys are a SHA-256 of utils.normalize_text(text) plus models_api.model_version(),
+so repeated short messages ("ok", "lol", "where are you") are scored once.
+Entries are evicted LRU-first when the entry count or memory cap is exceeded,
+and expire after a TTL. The whole cache is cleared when the TF-IDF pipeline
+artifact on disk changes.
+
+Configured via env:
+ - PREDICTION_CACHE_SIZE: max entries (default 50000, 0 disables the cache)
+ - PREDICTION_CACHE_TTL_S: entry lifetime in seconds (default 3600, 0 = no expiry)
+ - PREDICTION_CACHE_MAX_MB: approximate memory cap (default 64)
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import models_api
+
+MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", "3600"))
+MAX_BYTES = int(float(os.getenv("PREDICTION_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+# how often (seconds) to stat the artifact for changes
+_ARTIFACT_CHECK_S = 2.0
+# rough per-entry bookkeeping cost (key tuple, OrderedDict node, array header)
+_ENTRY_OVERHEAD = 240
+
+
+def make_key(normalized_text: str, model_version: str) -> Tuple[str, bytes]:
+    return (model_version, hashlib.sha256(normalized_text.encode("utf-8")).digest())
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl_s: float = TTL_S, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Tuple[str, bytes], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._fingerprint = models_api.artifact_fingerprint()
+        self._checked_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"lru": 0, "ttl": 0, "memory": 0}
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def _entry_bytes(key, row: np.ndarray) -> int:
+        return len(key[1]) + row.nbytes + _ENTRY_OVERHEAD
+
+    def _check_artifact(self, now: float):
+        if now - self._checked_at < _ARTIFACT_CHECK_S:
+            return
+        self._checked_at = now
+        fp = models_api.artifact_fingerprint()
+        if fp != self._fingerprint:
+            self._fingerprint = fp
+            self._clear_locked()
+            self.invalidations += 1
+
+    def _clear_locked(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def get_many(self, keys: List[Tuple[str, bytes]]) -> List[Optional[np.ndarray]]:
+        """Look up keys; returns the cached row or None for each."""
+        out: List[Optional[np.ndarray]] = []
+        now = time.monotonic()
+        with self._lock:
+            self._check_artifact(now)
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and self.ttl_s > 0 and entry[0] <= now:
+                    del self._data[key]
+                    self._bytes -= self._entry_bytes(key, entry[1])
+                    self.evictions["ttl"] += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    out.append(entry[1])
+        return out
+
+    def put_many(self, keys: List[Tuple[str, bytes]], rows: np.ndarray):
+        """Store one row per key, evicting least recently used entries as needed."""
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            for key, row in zip(keys, rows):
+                row = np.array(row, dtype=np.float64)
+                row.setflags(write=False)
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._bytes -= self._entry_bytes(key, old[1])
+                self._data[key] = (expires, row)
+                self._bytes += self._entry_bytes(key, row)
+            while len(self._data) > self.max_entries:
+                self._pop_oldest("lru")
+            while self._data and self._bytes > self.max_bytes:
+                self._pop_oldest("memory")
+
+    def _pop_oldest(self, reason: str):
+        key, (_, row) = self._data.popitem(last=False)
+        self._bytes -= self._entry_bytes(key, row)
+        self.evictions[reason] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._data),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": dict(self.evictions),
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
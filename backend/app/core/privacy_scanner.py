@@ -0,0 +1,184 @@
+# backend/app/core/privacy_scanner.py
+"""
+Privacy scanner.
+All SENSITIVE_PATTERNS are compiled once, at import, into a single alternation
+with one named group per pattern, so a message is scanned in one pass and
+every (non-overlapping) finding is reported with its type and span.
+
+Patterns run on the original text (spans index into what the client sent, so
+they can be used to redact it). Letters are matched case-insensitively only
+inside (?i:...), which keeps case-significant formats such as PAN exact and
+keeps the scan fast. _START is a lookahead every match must pass: it lists the
+characters a match can begin with, so most positions are rejected before any
+alternative is tried. Keep it in sync when adding patterns.
+
+Where two patterns could match at the same position, the one listed first in
+SENSITIVE_PATTERNS wins; the scan then resumes after that match. A pattern
+matching only inside another finding is therefore not a finding of its own,
+but it still counts for the reported "type": that is the first type in table
+order whose patterns match anywhere in the text, as when each pattern was
+searched separately. Only positions inside findings need a second look.
+
+Matching is linear in the input length. Every quantifier has an upper bound,
+so no match is longer than MAX_MATCH characters and the work done at one start
+position is bounded; optional tokens each carry their own trailing whitespace
+(never "\s*X?\s*"), so a failing attempt does not retry every way of splitting
+a whitespace run. The text is scanned in SCAN_CHUNK pieces, each searched up
+to MAX_MATCH characters past its end, which finds exactly what one pass over
+the whole text would; the time budget is checked before each piece.
+"""
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+try:  # Python 3.11+
+    from re import _parser as _sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse
+
+MAX_CHARS = int(os.getenv("PRIVACY_MAX_CHARS", "100000"))           # longest text /api/privacy/check accepts
+SCAN_BUDGET_MS = float(os.getenv("PRIVACY_SCAN_BUDGET_MS", "200"))  # stop scanning (complete=False) after this
+SCAN_CHUNK = 16384                                                  # characters scanned between budget checks
+
+SENSITIVE_PATTERNS = {
+    "Home Address": [
+        r"\b\d{1,5}\s{1,8}\w{1,40}\s{1,8}(?i:street|st|road|rd|lane|ln|avenue|ave)\b",
+    ],
+    "House Number": [
+        r"(?i:house|home)\s{0,8}(?:(?i:no|number|#)\s{0,8})?(?:(?i:is|:)\s{0,8})?\d{4,64}",
+        r"\b\d{4,64}\s{0,8}(?i:house|home)\b",
+    ],
+    "Phone Number": [
+        r"\b\d{10}\b",
+        r"\+\d{1,3}\s?\d{6,12}",
+    ],
+    "Bank Account Number": [
+        r"(?i:bank|account)\s{0,8}(?:(?i:no|number|#|detail|details)\s{0,8})?(?:(?i:is|:)\s{0,8})?\d{4,64}",
+        # "bank details" followed by a number later on the same line
+        r"(?i:bank\s{1,8}detail)[^\n]{0,100}?\d{4,64}",
+    ],
+    "Password": [
+        r"(?i:password)\s{0,8}[:=]",
+        r"(?i:pwd)\s{0,8}[:=]",
+    ],
+    "Government ID": [
+        r"\b\d{4}\s\d{4}\s\d{4}\b",  # Aadhaar
+        r"\b[A-Z]{5}\d{4}[A-Z]\b",  # PAN
+    ],
+    "Email": [
+        # RFC 5321 length limits; starts only where an address can start
+        r"(?<![a-zA-Z0-9_.+-])[a-zA-Z0-9_.+-]{1,64}@[a-zA-Z0-9-]{1,63}\.[a-zA-Z0-9-.]{1,190}"
+    ]
+}
+
+# digits, "+", the first letters of the keyword patterns, an upper-case word
+# start (PAN), or the start of an e-mail local part (a leftmost e-mail match
+# never begins right after another e-mail character)
+_START = r"(?=[0-9+hbapHBAP]|\b[A-Z]|(?<![a-zA-Z0-9_.+-])[a-zA-Z_.+-])"
+
+
+def _compile(patterns: Dict[str, List[str]]):
+    group_types: Dict[str, str] = {}
+    parts = []
+    for label, pats in patterns.items():
+        for pat in pats:
+            name = f"p{len(group_types)}"
+            group_types[name] = label
+            parts.append(f"(?P<{name}>{pat})")
+    return re.compile(_START + "(?:" + "|".join(parts) + ")"), group_types
+
+
+def _max_width(patterns: Dict[str, List[str]]) -> int:
+    """Longest possible match over all patterns; rejects unbounded ones."""
+    width = 0
+    for label, pats in patterns.items():
+        for pat in pats:
+            hi = _sre_parse.parse(pat).getwidth()[1]
+            if hi >= _sre_parse.MAXREPEAT:
+                raise ValueError(f"unbounded privacy pattern for {label!r}: {pat}")
+            width = max(width, hi)
+    return width
+
+
+_COMBINED, _GROUP_TYPES = _compile(SENSITIVE_PATTERNS)
+_PRIORITY = {label: i for i, label in enumerate(SENSITIVE_PATTERNS)}
+# each type's patterns on their own, for matches hidden inside other findings
+_BY_TYPE = {label: re.compile("|".join(f"(?:{p})" for p in pats)) for label, pats in SENSITIVE_PATTERNS.items()}
+MAX_MATCH = _max_width(SENSITIVE_PATTERNS)
+
+
+def scan_findings(text: str, budget_ms: Optional[float] = None, chunk: int = SCAN_CHUNK):
+    """
+    -> (findings, complete). Findings are {"type", "start", "end"} in order of
+    position; complete is False when the budget ran out before the end of text.
+    """
+    deadline = time.perf_counter() + (SCAN_BUDGET_MS if budget_ms is None else budget_ms) / 1000.0
+    findings: List[Dict[str, Any]] = []
+    n, pos = len(text), 0
+    while pos < n:
+        if time.perf_counter() > deadline:
+            return findings, False
+        chunk_end = min(n, pos + chunk)
+        # a match starting before chunk_end ends by chunk_end + MAX_MATCH, and
+        # its trailing \b / lookahead sees one more character
+        for m in _COMBINED.finditer(text, pos, min(n, chunk_end + MAX_MATCH + 1)):
+            if m.start() >= chunk_end:
+                break
+            findings.append({"type": _GROUP_TYPES[m.lastgroup], "start": m.start(), "end": m.end()})
+        pos = max(chunk_end, findings[-1]["end"] if findings else 0)
+    return findings, True
+
+
+def find_all(text: str) -> List[Dict[str, Any]]:
+    """Every finding in text as {"type", "start", "end"}, in order of position."""
+    return scan_findings(text, budget_ms=float("inf"))[0]
+
+
+def top_type(text: str, findings: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    First type in table order with a match anywhere in the scanned text. Every
+    position outside a finding was tried by the combined scan (where the first
+    pattern in table order wins), so only matches starting strictly inside a
+    finding can outrank the findings' own types.
+    """
+    if not findings:
+        return None
+    best = min((f["type"] for f in findings), key=_PRIORITY.__getitem__)
+    for label in list(SENSITIVE_PATTERNS)[:_PRIORITY[best]]:
+        rx = _BY_TYPE[label]
+        for f in findings:
+            # a match starting inside the finding ends within MAX_MATCH of it
+            m = rx.search(text, f["start"] + 1, min(len(text), f["end"] + MAX_MATCH + 1))
+            if m is not None and m.start() < f["end"]:
+                return label
+    return best
+
+
+def redact(text: str, findings: List[Dict[str, Any]]) -> str:
+    """Replace each finding's span with a [TYPE] placeholder."""
+    out, pos = [], 0
+    for f in findings:
+        out.append(text[pos:f["start"]])
+        out.append("[" + f["type"].upper().replace(" ", "_") + "]")
+        pos = f["end"]
+    out.append(text[pos:])
+    return "".join(out)
+
+
+def scan(text: str, budget_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Scan once -> {"flagged", "type", "findings", "redacted", "complete"}; "type"
+    is the highest-priority type (table order) matching anywhere in the text, as
+    the endpoint always reported, even when that match overlaps a finding of
+    another type. complete is False when the budget (default SCAN_BUDGET_MS) ran
+    out first: findings and redaction then cover only the scanned prefix, which is
+    empty when budget_ms <= 0.
+    """
+    findings, complete = scan_findings(text, budget_ms=budget_ms)
+    result: Dict[str, Any] = {
+        "flagged": bool(findings), "findings": findings, "redacted": redact(text, findings), "complete": complete,
+    }
+    if findings:
+        result["type"] = top_type(text, findings)
+    return result
@@ -0,0 +1,193 @@
+# backend/app/core/transformer_backend.py
+"""
+Transformer serving backend.
+Loads what training/finetune_transformer.py saves to experiments/transformer_model
+(save_pretrained model + tokenizer and label_binarizer.joblib) and scores
+batches with one padded forward pass per chunk under torch.inference_mode.
+
+torch/transformers are imported only when the model is loaded, and the model
+is only warmed up at startup when INFERENCE_BACKEND selects it (transformer or
+cascade). If the directory has no weights the loader returns None and serving
+stays on TF-IDF.
+
+training/export_transformer.py validates CPU-friendly variants of the weights
+(dynamic int8 PyTorch, quantized from the fp32 weights at load; ONNX and int8
+ONNX graphs) and writes export_manifest.json with their measured latency and
+whether they stayed within tolerance of fp32. With
+TRANSFORMER_RUNTIME=auto the loader serves the fastest variant that passed and
+whose runtime is installed (ONNX needs onnxruntime), as long as the manifest
+was built from the current weights; otherwise it serves fp32.
+
+Configured via env:
+ - TRANSFORMER_MODEL_DIR: artifact directory (default experiments/transformer_model)
+ - TRANSFORMER_MAX_LENGTH: tokens per message, longer messages are truncated (default 128)
+ - TRANSFORMER_CHUNK_SIZE: max messages per forward pass (default 64)
+ - TRANSFORMER_RUNTIME: auto (default), fp32, int8, onnx or onnx_int8
+"""
+import importlib.util
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import joblib
+import numpy as np
+
+from .model_registry import registry
+from . import models_api
+from .models_api import LABELS
+
+MODEL_DIR = Path(os.getenv("TRANSFORMER_MODEL_DIR", str(models_api.TRANS_DIR)))
+MAX_LENGTH = int(os.getenv("TRANSFORMER_MAX_LENGTH", "128"))
+CHUNK_SIZE = int(os.getenv("TRANSFORMER_CHUNK_SIZE", "64"))
+
+RUNTIME = os.getenv("TRANSFORMER_RUNTIME", "auto").lower()
+
+WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin")
+MANIFEST_FILE = "export_manifest.json"
+# runtime -> exported artifact file; fp32 and int8 both load the save_pretrained weights
+RUNTIME_FILES = {"onnx": "model.onnx", "onnx_int8": "model_int8.onnx"}
+
+
+def weights_path(model_dir: Path = MODEL_DIR) -> Optional[Path]:
+    for name in WEIGHT_FILES:
+        if (model_dir / name).exists():
+            return model_dir / name
+    return None
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of the Linear layers, in place (weights int8,
+    activations quantized on the fly). Deterministic given the fp32 weights.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _runtime_available(runtime: str) -> bool:
+    return not runtime.startswith("onnx") or importlib.util.find_spec("onnxruntime") is not None
+
+
+def read_manifest(model_dir: Path = MODEL_DIR) -> Optional[dict]:
+    path = model_dir / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def choose_runtime(model_dir: Path, source_version: str, requested: str = RUNTIME) -> str:
+    """The runtime to serve: the requested one, or with "auto" the fastest validated export."""
+    if requested != "auto":
+        return requested
+    manifest = read_manifest(model_dir)
+    if not manifest or manifest.get("source_version") != source_version:
+        return "fp32"
+    candidates = [
+        (info["latency_ms"], name)
+        for name, info in manifest.get("artifacts", {}).items()
+        if info.get("passed") and _runtime_available(name)
+        and (name not in RUNTIME_FILES or (model_dir / RUNTIME_FILES[name]).exists())
+    ]
+    return min(candidates)[1] if candidates else "fp32"
+
+
+class TransformerModel:
+    """A fine-tuned sequence classifier (torch module or ONNX session), its tokenizer and version tag."""
+
+    def __init__(self, model, tokenizer, label_order: List[str], version: str,
+                 max_length: int = MAX_LENGTH, chunk_size: int = CHUNK_SIZE, runtime: str = "fp32"):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.version = version
+        self.runtime = runtime
+        self.max_length = max_length
+        self.chunk_size = max(1, chunk_size)
+        # model output column for each entry of LABELS
+        self._columns = [label_order.index(l) for l in LABELS]
+
+    def _logits(self, chunk: List[str]) -> np.ndarray:
+        # pad to the longest message in the chunk, not to max_length
+        if self.runtime.startswith("onnx"):
+            enc = self.tokenizer(chunk, padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors="np")
+            feed = {i.name: enc[i.name].astype(np.int64) for i in self.model.get_inputs()}
+            return self.model.run(["logits"], feed)[0]
+        import torch
+        enc = self.tokenizer(chunk, padding=True, truncation=True,
+                             max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            return self.model(**enc).logits.float().numpy()
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """(n_texts x n_labels) sigmoid probabilities, columns ordered as LABELS."""
+        out = np.zeros((len(texts), len(LABELS)), dtype=np.float64)
+        for start in range(0, len(texts), self.chunk_size):
+            chunk = texts[start:start + self.chunk_size]
+            probs = 1.0 / (1.0 + np.exp(-self._logits(chunk).astype(np.float64)))
+            out[start:start + len(chunk)] = probs[:, self._columns]
+        return out
+
+
+def _load_weights(model_dir: Path, runtime: str):
+    if runtime.startswith("onnx"):
+        import onnxruntime as ort
+        return ort.InferenceSession(str(model_dir / RUNTIME_FILES[runtime]), providers=["CPUExecutionProvider"])
+    if runtime not in ("fp32", "int8"):
+        raise ValueError(f"unknown TRANSFORMER_RUNTIME '{runtime}'")
+    from transformers import AutoModelForSequenceClassification
+    model = AutoModelForSequenceClassification.from_pretrained(str(model_dir))
+    model.eval()
+    return quantize_int8(model) if runtime == "int8" else model
+
+
+def load_transformer(model_dir: Path = MODEL_DIR, runtime: str = RUNTIME) -> Optional[TransformerModel]:
+    """Load a saved model directory (in the chosen runtime); None if it has no weights."""
+    weights = weights_path(model_dir)
+    if weights is None:
+        return None
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+    source_version = models_api._file_version(weights)
+    runtime = choose_runtime(model_dir, source_version, runtime)
+    model = _load_weights(model_dir, runtime)
+    mlb_path = model_dir / "label_binarizer.joblib"
+    label_order = [str(c) for c in joblib.load(str(mlb_path)).classes_] if mlb_path.exists() else list(LABELS)
+    version = "transformer-" + source_version + ("" if runtime == "fp32" else "-" + runtime)
+    return TransformerModel(model, tokenizer, label_order, version, runtime=runtime)
+
+
+def _validate_transformer(model: TransformerModel):
+    """Smoke prediction run on a freshly loaded model before it is swapped in."""
+    probs = model.predict_proba(["hey, are you coming later?", "i want to end it all"])
+    if probs.shape != (2, len(LABELS)) or not np.all(np.isfinite(probs)):
+        raise ValueError(f"smoke prediction returned shape {probs.shape} / non-finite values")
+
+
+registry.register("transformer", load_transformer, validate=_validate_transformer,
+                  warm=models_api.INFERENCE_BACKEND != "tfidf")
+
+
+def predict_model_versioned(texts: List[str]):
+    """Transformer probabilities alone -> (probs, version). None when no transformer is available."""
+    model = registry.get("transformer")
+    if model is None:
+        return None
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, len(LABELS)), dtype=np.float64), model.version
+    return model.predict_proba(texts), model.version
+
+
+def predict_batch_versioned(texts: List[str]):
+    """
+    Transformer probabilities maxed with the keyword heuristics, as the TF-IDF
+    path does -> (probs, version). None when no transformer is available.
+    """
+    result = predict_model_versioned(texts)
+    if result is None:
+        return None
+    probs, version = result
+    return np.maximum(probs, models_api._keyword_probs_batch(list(texts))), version
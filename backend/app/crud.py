@@ -1,84 +1,242 @@
 # backend/app/crud.py
-from typing import List, Dict, Any
-from datetime import datetime
-from sqlalchemy import select, delete
+from typing import List, Dict, Any, AsyncIterator, Optional, Sequence, Tuple
+from datetime import datetime, timedelta, timezone
+import base64
+import json
+from sqlalchemy import select, delete, insert, text, tuple_
 from sqlalchemy.exc import SQLAlchemyError
-from .db import AsyncSessionLocal
-from .models_db import RiskHistory
+from .db import AsyncSessionLocal, engine
+from .core.models_api import LABELS, RISK_LEVELS
+from .models_db import RiskHistory, risk_rollup_day, risk_rollup_delta, risk_rollup_hour
+from .rollups import aggregate_range, apply_rollups, floor_to, utc
+from .services.forecast_cache import forecast_cache
+from .services.history_store import history_store
+from .services.trend import trend_store
 
-async def insert_prediction(record: Dict[str, Any]) -> int:
-    async with AsyncSessionLocal() as session:
-        async with session.begin():
-            ts = record.get("timestamp")
-            if isinstance(ts, str):
-                try:
-                    ts = datetime.fromisoformat(ts)
-                except Exception:
-                    from datetime import timezone
-                    ts = datetime.now(timezone.utc)
-            elif ts is None:
-                from datetime import timezone
-                ts = datetime.now(timezone.utc)
-            obj = RiskHistory(
-                timestamp=ts,
-                message=record.get("message"),
-                sender=record.get("sender"),
-                risk_level=record.get("risk_level") or "low",
-                risk_score=float(record.get("risk_score", 0.0)),
-                label_probs=record.get("label_probs"),
-                meta=record.get("meta"),
-            )
-            session.add(obj)
+def _coerce_timestamp(ts):
+    if isinstance(ts, str):
         try:
-            await session.commit()
-            await session.refresh(obj)
-            return int(obj.id)
-        except SQLAlchemyError:
-            await session.rollback()
-            raise
+            ts = datetime.fromisoformat(ts)
+        except Exception:
+            return datetime.now(timezone.utc)
+    elif ts is None:
+        return datetime.now(timezone.utc)
+    # stored in UTC, so rollup buckets and SQLite's tz-less text agree
+    return utc(ts)
+
+def _row_values(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "timestamp": _coerce_timestamp(record.get("timestamp")),
+        "message": record.get("message"),
+        "sender": record.get("sender"),
+        "subject_id": record.get("subject_id"),
+        "risk_level": record.get("risk_level") or "low",
+        "risk_score": float(record.get("risk_score", 0.0)),
+        "label_probs": record.get("label_probs"),
+        "meta": record.get("meta"),
+    }
+
+async def insert_prediction(record: Dict[str, Any]) -> int:
+    values = _row_values(record)
+    with trend_store.writing([values]):
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                obj = RiskHistory(**values)
+                session.add(obj)
+                await apply_rollups(session, [values])
+            try:
+                await session.commit()
+                await session.refresh(obj)
+            except SQLAlchemyError:
+                await session.rollback()
+                raise
+        values["id"] = obj.id
+        history_store.append_rows([values])
+        trend_store.observe([values])
+    forecast_cache.bump([values["subject_id"]])
+    return int(obj.id)
+
+async def insert_predictions(records: List[Dict[str, Any]]) -> int:
+    """Insert many records in one transaction (executemany); returns the row count."""
+    if not records:
+        return 0
+    values = [_row_values(r) for r in records]
+    with trend_store.writing(values):
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                ids = (await session.scalars(
+                    insert(RiskHistory).returning(RiskHistory.id, sort_by_parameter_order=True), values)).all()
+                await apply_rollups(session, values)
+        for v, row_id in zip(values, ids):
+            v["id"] = row_id
+        history_store.append_rows(values)
+        trend_store.observe(values)
+    forecast_cache.bump(v["subject_id"] for v in values)
+    return len(records)
 
-async def get_history(limit: int = 500) -> List[Dict[str, Any]]:
+# columns /api/history can project; id and timestamp are always selected (they form the cursor)
+HISTORY_COLUMNS = ("id", "timestamp", "subject_id", "message", "sender", "risk_level", "risk_score", "label_probs", "meta")
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for the row (timestamp, id)."""
+    raw = json.dumps([timestamp.isoformat(), int(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(ts), int(row_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+def history_select(columns: Sequence[str] = HISTORY_COLUMNS, after: Optional[str] = None, order: str = "desc",
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    subject_id: Optional[str] = None):
+    """
+    Core SELECT of the given columns, ordered by (timestamp, id) and starting just
+    past the cursor `after` -- a range scan on ix_risk_history_timestamp_id, or on
+    ix_risk_history_subject_timestamp_id when restricted to one subject_id.
+    since/until bound the timestamp (inclusive / exclusive); naive values are UTC.
+    """
+    unknown = set(columns) - set(HISTORY_COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown columns: {sorted(unknown)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    t = RiskHistory.__table__
+    names = ["id", "timestamp"] + [c for c in HISTORY_COLUMNS if c in columns and c not in ("id", "timestamp")]
+    key = tuple_(t.c.timestamp, t.c.id)
+    q = select(*(t.c[n] for n in names))
+    if after is not None:
+        q = q.where(key > tuple_(*decode_cursor(after)) if order == "asc" else key < tuple_(*decode_cursor(after)))
+    if since is not None:
+        q = q.where(t.c.timestamp >= utc(since))
+    if until is not None:
+        q = q.where(t.c.timestamp < utc(until))
+    if subject_id is not None:
+        q = q.where(t.c.subject_id == subject_id)
+    if order == "asc":
+        return q.order_by(t.c.timestamp.asc(), t.c.id.asc())
+    return q.order_by(t.c.timestamp.desc(), t.c.id.desc())
+
+def _history_row(row) -> Dict[str, Any]:
+    out = dict(row)
+    if "timestamp" in out:
+        # aware UTC, as in get_stats' timeline (SQLite returns stored UTC values naive)
+        out["timestamp"] = utc(out["timestamp"]).isoformat() if out["timestamp"] else None
+    if "risk_score" in out:
+        out["risk_score"] = float(out["risk_score"]) if out["risk_score"] is not None else 0.0
+    return out
+
+async def get_history_page(columns: Sequence[str] = HISTORY_COLUMNS, limit: int = 100, after: Optional[str] = None,
+                           order: str = "desc", since: Optional[datetime] = None, until: Optional[datetime] = None,
+                           subject_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One keyset page -> (rows, next_cursor); next_cursor is None on the last page."""
+    q = history_select(columns, after, order, since, until, subject_id).limit(limit + 1)
     async with AsyncSessionLocal() as session:
-        q = select(RiskHistory).order_by(RiskHistory.timestamp.desc()).limit(limit)
-        result = await session.execute(q)
-        rows = result.scalars().all()
-        out = []
-        for r in reversed(rows):
-            out.append({
-                "id": int(r.id),
-                "timestamp": r.timestamp.isoformat() if r.timestamp else None,
-                "message": r.message,
-                "sender": r.sender,
-                "risk_level": r.risk_level,
-                "risk_score": float(r.risk_score) if r.risk_score is not None else 0.0,
-                "label_probs": r.label_probs,
-                "meta": r.meta,
-            })
-        return out
-
-async def get_recent(limit: int = 100) -> List[Dict[str, Any]]:
+        rows = (await session.execute(q)).mappings().all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"]) if more and rows else None
+    return [_history_row(r) for r in rows], next_cursor
+
+async def iter_history(columns: Sequence[str] = HISTORY_COLUMNS, after: Optional[str] = None, order: str = "asc",
+                       since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       subject_id: Optional[str] = None, batch_size: int = 1000) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Every matching row, streamed through a server-side cursor (asyncpg) or chunked
+    fetches (aiosqlite), batch_size rows in memory at a time.
+    """
+    q = history_select(columns, after, order, since, until, subject_id).execution_options(yield_per=batch_size)
     async with AsyncSessionLocal() as session:
-        q = select(RiskHistory).order_by(RiskHistory.timestamp.desc()).limit(limit)
-        result = await session.execute(q)
-        rows = result.scalars().all()
-        return [{
-            "id": int(r.id),
-            "timestamp": r.timestamp.isoformat() if r.timestamp else None,
-            "message": r.message,
-            "sender": r.sender,
-            "risk_level": r.risk_level,
-            "risk_score": float(r.risk_score) if r.risk_score is not None else 0.0,
-            "label_probs": r.label_probs,
-            "meta": r.meta,
-        } for r in rows]
+        result = await session.stream(q)
+        async for row in result.mappings():
+            yield _history_row(row)
+
+async def get_history(limit: int = 500, subject_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """The most recent `limit` rows (of one subject, if given), oldest first."""
+    rows, _ = await get_history_page(limit=limit, order="desc", subject_id=subject_id)
+    rows.reverse()
+    return rows
+
+async def get_recent(limit: int = 100, subject_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """The most recent `limit` rows (of one subject, if given), newest first."""
+    return (await get_history_page(limit=limit, order="desc", subject_id=subject_id))[0]
+
+# days covered by daily_risk_averages when no `from` is given
+STATS_DAILY_DAYS = 7
+# most recent predictions returned as risk_score_timeline
+STATS_TIMELINE_ROWS = 60
+
+async def get_stats(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    subject_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    /api/stats aggregates over every prediction in [since, until), read from the
+    hour/day rollups (app/rollups.py): counts per risk level, overall and per-label
+    averages (over the rows that have label_probs), daily averages and the latest
+    STATS_TIMELINE_ROWS scores. Daily averages cover [since, until), or the last
+    STATS_DAILY_DAYS days (UTC, today included) when since is None. Scores are
+    returned as percentages. With subject_id, only that subject's predictions,
+    aggregated from one range scan of its rows, or from the in-memory history
+    store when it holds all of them.
+    """
+    # SQLite compares timestamps as tz-less text, so bounds must be in UTC like the rows
+    since = utc(since) if since is not None else None
+    until = utc(until) if until is not None else None
+    days = await history_store.aggregate(subject_id, since, until) if subject_id is not None else None
+    if days is None:
+        days = await aggregate_range(since, until, subject_id=subject_id)
+    daily_since = since if since is not None else (
+        floor_to(until or datetime.now(timezone.utc), "day") - timedelta(days=STATS_DAILY_DAYS - 1))
+    timeline = await history_store.timeline(subject_id, STATS_TIMELINE_ROWS, since, until)
+    if timeline is None:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                history_select(["risk_score", "risk_level"], order="desc", since=since, until=until, subject_id=subject_id)
+                .limit(STATS_TIMELINE_ROWS))).mappings().all()
+        timeline = [
+            {"timestamp": utc(r["timestamp"]).isoformat() if r["timestamp"] else None,
+             "score": float(r["risk_score"]) * 100, "level": r["risk_level"]}
+            for r in reversed(rows)
+        ]
+
+    total = {}
+    for agg in days.values():
+        for k, v in agg.items():
+            total[k] = total.get(k, 0) + v
+    n = int(total.get("n", 0))
+    labeled = total.get("n_labeled", 0)
+    return {
+        "risk_level_distribution": {lv: int(total[f"n_{lv}"]) for lv in RISK_LEVELS if total.get(f"n_{lv}")},
+        "risk_score_timeline": timeline,
+        "label_distribution": {label: total[f"sum_{label}"] / labeled * 100 for label in LABELS} if labeled else {},
+        "daily_risk_averages": {d.date().isoformat(): agg["score_sum"] / agg["n"] * 100
+                                for d, agg in sorted(days.items()) if agg["n"] and d >= floor_to(daily_since, "day")},
+        "total_predictions": n,
+        "average_risk_score": round(total["score_sum"] / n * 100, 2) if n else 0.0,
+    }
 
 async def delete_all() -> int:
+    """
+    Empty risk_history and its rollups. PostgreSQL truncates (every partition, no
+    per-row work or dead tuples left behind); SQLite's unqualified DELETE is
+    already its truncate optimization.
+    """
+    tables = [RiskHistory.__table__, risk_rollup_hour, risk_rollup_day, risk_rollup_delta]
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            await session.execute(delete(RiskHistory))
+            if engine.dialect.name == "postgresql":
+                await session.execute(text("TRUNCATE " + ", ".join(t.name for t in tables)))
+            else:
+                for t in tables:
+                    await session.execute(delete(t))
         try:
             await session.commit()
         except SQLAlchemyError:
             await session.rollback()
             raise
+    history_store.clear()
+    trend_store.clear()
+    forecast_cache.clear()
     return -1
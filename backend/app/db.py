@@ -1,7 +1,9 @@
 # backend/app/db.py
 import os
 from dotenv import load_dotenv
+from sqlalchemy import exists, inspect, select, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 here = os.path.dirname(__file__)
@@ -16,8 +18,39 @@ engine = create_async_engine(DATABASE_URL, echo=False, future=True)
 AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
+ROLLUP_TABLES = ("risk_rollup_hour", "risk_rollup_day")
+
+def _create_all(sync_conn) -> bool:
+    """Create or upgrade the schema; True if the rollups need backfilling from risk_history."""
+    if sync_conn.dialect.name == "postgresql":
+        # risk_history is partitioned by month there; create_all then skips it
+        from .partitions import create_partitioned
+        create_partitioned(sync_conn)
+    Base.metadata.create_all(sync_conn)
+    # create_all skips tables that already exist; add their new (nullable) columns and indexes
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        have = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in have and column.nullable:
+                ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+    # rollup tables created (or left empty) on a database that already has history
+    tables = Base.metadata.tables
+    if not all(name in tables for name in ("risk_history",) + ROLLUP_TABLES):
+        return False
+    if not sync_conn.execute(select(exists().select_from(tables["risk_history"]))).scalar():
+        return False
+    return any(not sync_conn.execute(select(exists().select_from(tables[name]))).scalar()
+               for name in ROLLUP_TABLES)
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        backfill = await conn.run_sync(_create_all)
+    if backfill:
+        from .rollups import rebuild_rollups
+        await rebuild_rollups()
 def get_session() -> AsyncSession:
     return AsyncSessionLocal()
@@ -1,12 +1,23 @@
 # backend/app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
 import os
 
 from .db import init_db
-from .routes import predict, forecast, privacy, stats
+from .partitions import start_maintenance
+from .rollups import start_compactor
+from .routes import predict, forecast, privacy, stats, metrics, sessions, admin, analyze, history
+from .core.model_registry import registry, WARMUP_MODE
+from .services.forecast_cache import forecast_cache
+from .services.history_store import history_store
+from .services.inference_executor import shutdown_executor
+from .services.model_manager import start_watcher
+from .services.prediction_writer import prediction_writer
 
-app = FastAPI(title="Helmit AI Predictive Safety MVP", version="1.0")
+# 2.0: /api/forecast's `recent` counts days with predictions, no longer predictions
+app = FastAPI(title="Helmit AI Predictive Safety MVP", version="2.0")
 
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 app.add_middleware(CORSMiddleware, allow_origins=origins, allow_methods=["*"], allow_headers=["*"])
@@ -17,12 +28,48 @@ async def on_startup():
         await init_db()
     except Exception:
         pass
+    if WARMUP_MODE == "background":
+        # load model artifacts off the event loop; /ready reports progress
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(registry.warm_up))
+    # hot-reload models when their artifacts in experiments/ change
+    app.state.model_watcher = start_watcher()
+    # PERSIST_MODE=write_behind: batch prediction inserts in the background
+    prediction_writer.start()
+    # fold inserts' rollup deltas into the hour/day rollups
+    app.state.rollup_compactor = start_compactor()
+    # monthly partitions ahead of time, retention/archival of expired months
+    app.state.history_maintenance = start_maintenance()
+    # recent predictions of the most active subjects, in memory
+    app.state.history_store_warmup = history_store.start()
+    # FORECAST_REFRESH_INTERVAL_S: recompute cached forecasts of written subjects
+    app.state.forecast_refresh = forecast_cache.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for name in ("model_watcher", "rollup_compactor", "history_maintenance", "history_store_warmup", "forecast_refresh"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    # flush queued prediction records before exiting
+    await prediction_writer.close()
+    shutdown_executor()
 
 app.include_router(predict.router)
 app.include_router(forecast.router)
 app.include_router(privacy.router)
 app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(sessions.router)
+app.include_router(admin.router)
+app.include_router(analyze.router)
+app.include_router(history.router)
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    ok = registry.ready()
+    body = {"ready": ok, "warmup": WARMUP_MODE, "models": registry.status()}
+    return JSONResponse(body, status_code=200 if ok else 503)
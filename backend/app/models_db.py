@@ -1,6 +1,10 @@
 # backend/app/models_db.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func, Index, Table
 from .db import Base
+from .core.models_api import LABELS, RISK_LEVELS
+
+# longest subject_id (monitored child / device) accepted and stored
+SUBJECT_ID_LENGTH = 64
 
 class RiskHistory(Base):
     __tablename__ = "risk_history"
@@ -8,11 +12,37 @@ class RiskHistory(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     message = Column(String(length=2000), nullable=True)
     sender = Column(String(length=64), nullable=True)
+    subject_id = Column(String(length=SUBJECT_ID_LENGTH), nullable=True)  # None: not tied to a subject
     risk_level = Column(String(length=32), nullable=False, index=True)
     risk_score = Column(Float, nullable=False, index=True)
     label_probs = Column(JSON, nullable=True)
     meta = Column(JSON, nullable=True)
     def __repr__(self):
         return f"<RiskHistory id={self.id} risk={self.risk_level} score={self.risk_score}>"
-Index('ix_risk_history_timestamp', RiskHistory.timestamp)
+# keyset pagination key: (timestamp, id) cursors are a single range scan on this index
+Index('ix_risk_history_timestamp_id', RiskHistory.timestamp, RiskHistory.id)
 Index('ix_risk_history_level_score', RiskHistory.risk_level, RiskHistory.risk_score)
+# per-subject reads: one range scan over that subject's rows, in keyset order
+Index('ix_risk_history_subject_timestamp_id', RiskHistory.subject_id, RiskHistory.timestamp, RiskHistory.id)
+
+def _rollup_table(name: str, *key: Column) -> Table:
+    """One row per UTC bucket of risk_history (by default): see app/rollups.py."""
+    return Table(
+        name, Base.metadata,
+        *(key or [Column("bucket", DateTime(timezone=True), primary_key=True)]),
+        Column("n", Integer, nullable=False, default=0),
+        Column("score_sum", Float, nullable=False, default=0.0),
+        Column("score_max", Float, nullable=False, default=0.0),
+        *[Column(f"n_{level}", Integer, nullable=False, default=0) for level in RISK_LEVELS],
+        Column("n_labeled", Integer, nullable=False, default=0),  # rows with label_probs
+        *[Column(f"sum_{label}", Float, nullable=False, default=0.0) for label in LABELS],
+    )
+
+risk_rollup_hour = _rollup_table("risk_rollup_hour")
+risk_rollup_day = _rollup_table("risk_rollup_day")
+# hour-bucket deltas of committed inserts, not yet folded into the two tables above
+risk_rollup_delta = _rollup_table(
+    "risk_rollup_delta",
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("bucket", DateTime(timezone=True), nullable=False, index=True),
+)
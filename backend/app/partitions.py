@@ -0,0 +1,342 @@
+# backend/app/partitions.py
+"""
+Monthly partitioning, retention and archival of risk_history.
+
+On PostgreSQL, risk_history is created PARTITION BY RANGE (timestamp) with one
+partition per UTC month (risk_history_pYYYYMM) plus risk_history_default for
+rows outside every month partition (backfills, clock skew). Its primary key is
+(id, timestamp), as PostgreSQL requires the partition key in it; ids still come
+from one sequence. ensure_months() creates the partitions from the current
+month to PARTITION_MONTHS_AHEAD months ahead and moves rows that landed in the
+default partition into their own month. An existing unpartitioned table is
+left as is (and logged) until `python -m app.partitions --migrate` converts it.
+
+Retention (HISTORY_RETENTION_DAYS, 0 = keep everything) expires whole months
+once their end is older than the cutoff: each month is first written to
+HISTORY_ARCHIVE_DIR as a zstd-compressed Parquet file (risk_history_YYYY_MM.parquet,
+needs pyarrow; set HISTORY_ARCHIVE_DIR= to drop without archiving), then its
+partition is dropped. Nothing is dropped if archiving fails or the archive's
+row count does not match the partition's. SQLite has no partitions; there,
+expired months are archived the same way and deleted by timestamp range.
+
+The month's rollups (app/rollups.py) are deleted in the same transaction as its
+rows, so /api/stats counts the retained rows only, globally as per subject.
+
+Maintenance (ensure + retention) runs every HISTORY_MAINTENANCE_INTERVAL_S
+seconds (default 3600, 0 disables) in the API process, or on demand:
+
+  cd backend
+  python -m app.partitions --ensure --retention [--retention_days 365] [--archive_dir ../archive]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, delete, func, inspect, select, text
+
+from .crud import history_select
+from .db import AsyncSessionLocal, engine, project_root
+from .models_db import RiskHistory
+from .rollups import drop_rollups, utc
+from .services.forecast_cache import forecast_cache
+from .services.history_store import history_store
+from .services.trend import trend_store
+
+log = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", os.path.join(project_root, "archive"))
+MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+MAINTENANCE_INTERVAL_S = float(os.getenv("HISTORY_MAINTENANCE_INTERVAL_S", "3600"))
+ARCHIVE_BATCH = 10000  # rows per Parquet row group
+
+PARENT = RiskHistory.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+_MONTH_PARTITION = re.compile(rf"^{PARENT}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(ts: datetime) -> datetime:
+    return utc(ts).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, n: int) -> datetime:
+    years, m = divmod(month.month - 1 + n, 12)
+    return month.replace(year=month.year + years, month=m + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT}_p{month:%Y%m}"
+
+
+def partitioned_table() -> Table:
+    """risk_history as created on PostgreSQL: same columns, PK (id, timestamp), partitioned by month."""
+    columns = []
+    for c in RiskHistory.__table__.columns:
+        col = c._copy()
+        if c.name == "timestamp":
+            col.primary_key = True
+            col.nullable = False
+        elif c.name == "id":
+            col.autoincrement = True  # still SERIAL in a composite key
+        columns.append(col)
+    return Table(PARENT, MetaData(), *columns, postgresql_partition_by="RANGE (timestamp)")
+
+
+# ---- PostgreSQL DDL (sync, on a Connection; run through conn.run_sync) ----
+
+def _relkind(conn, name: str) -> Optional[str]:
+    return conn.execute(text("SELECT relkind::text FROM pg_class WHERE relname = :n AND relkind IN ('r', 'p')"),
+                        {"n": name}).scalar()
+
+
+def _create_parent(conn) -> None:
+    partitioned_table().create(conn)
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+
+
+def create_partitioned(conn) -> None:
+    """Called by db.init_db before create_all: the partitioned risk_history and its upcoming months."""
+    kind = _relkind(conn, PARENT)
+    if kind == "r":
+        log.warning("%s is not partitioned; run `python -m app.partitions --migrate` to convert it", PARENT)
+        return
+    if kind is None:
+        _create_parent(conn)
+    ensure_months(conn)
+
+
+def month_partitions(conn) -> List[datetime]:
+    """Months that have a partition, oldest first."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :parent"), {"parent": PARENT}).scalars()
+    months = []
+    for name in names:
+        m = _MONTH_PARTITION.match(name)
+        if m:
+            months.append(datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=timezone.utc))
+    return sorted(months)
+
+
+def create_month(conn, month: datetime) -> int:
+    """
+    Attach the partition for `month`, first moving that month's rows out of the
+    default partition (which could not be attached over them). Returns rows moved.
+    """
+    name, lo, hi = partition_name(month), month, add_months(month, 1)
+    bounds = {"lo": lo, "hi": hi}
+    in_month = 'WHERE "timestamp" >= :lo AND "timestamp" < :hi'
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)"))
+    moved = conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} {in_month}"), bounds).rowcount
+    if moved:
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} {in_month}"), bounds)
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+                      f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"))
+    return moved
+
+
+def ensure_months(conn, months_ahead: int = MONTHS_AHEAD, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Partitions for this month .. months_ahead, and for every month found in the default partition."""
+    if _relkind(conn, PARENT) != "p":
+        return {"partitioned": False, "created": [], "moved": 0}
+    have = set(month_partitions(conn))
+    current = month_start(now or datetime.now(timezone.utc))
+    wanted = {add_months(current, i) for i in range(months_ahead + 1)}
+    stray = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') FROM {DEFAULT_PARTITION}")).scalars()
+    wanted.update(m.replace(tzinfo=timezone.utc) for m in stray)
+    created, moved = [], 0
+    for month in sorted(wanted - have):
+        moved += create_month(conn, month)
+        created.append(f"{month:%Y-%m}")
+    return {"partitioned": True, "created": created, "moved": moved}
+
+
+def migrate(conn) -> Dict[str, Any]:
+    """Convert an unpartitioned risk_history in place: new partitioned table, rows copied, ids kept."""
+    if _relkind(conn, PARENT) != "r":
+        return {"migrated": False, "rows": 0}
+    old = f"{PARENT}_unpartitioned"
+    old_columns = {c["name"] for c in inspect(conn).get_columns(PARENT)}
+    conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {old}"))
+    conn.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {PARENT}_pkey TO {old}_pkey"))
+    conn.execute(text(f"ALTER SEQUENCE IF EXISTS {PARENT}_id_seq RENAME TO {old}_id_seq"))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    _create_parent(conn)
+    for index in RiskHistory.__table__.indexes:
+        index.create(conn, checkfirst=True)
+    first = conn.execute(text(f'SELECT min("timestamp") FROM {old}')).scalar()
+    if first is not None:
+        month, current = month_start(first), month_start(datetime.now(timezone.utc))
+        while month <= current:
+            create_month(conn, month)
+            month = add_months(month, 1)
+    ensure_months(conn)
+    cols = ", ".join(f'"{c.name}"' for c in RiskHistory.__table__.columns if c.name in old_columns)
+    rows = conn.execute(text(f"INSERT INTO {PARENT} ({cols}) SELECT {cols} FROM {old}")).rowcount
+    conn.execute(text(f"SELECT setval('{PARENT}_id_seq', GREATEST((SELECT max(id) FROM {PARENT}), 1))"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    return {"migrated": True, "rows": rows}
+
+
+# ---- retention ----
+
+async def archive_month(month: datetime, directory: str) -> Dict[str, Any]:
+    """Write the month's rows to <directory>/risk_history_YYYY_MM.parquet (zstd) -> {"rows", "file"}."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("archiving risk_history needs pyarrow (or set HISTORY_ARCHIVE_DIR= to skip it)") from e
+    schema = pa.schema([
+        ("id", pa.int64()), ("timestamp", pa.timestamp("us", tz="UTC")), ("subject_id", pa.string()), ("message", pa.string()),
+        ("sender", pa.string()), ("risk_level", pa.string()), ("risk_score", pa.float64()),
+        ("label_probs", pa.string()), ("meta", pa.string()),  # JSON text
+    ])
+    path = Path(directory) / f"{PARENT}_{month:%Y_%m}.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    q = history_select(order="asc", since=month, until=add_months(month, 1)).execution_options(yield_per=ARCHIVE_BATCH)
+    rows = 0
+    writer = pq.ParquetWriter(tmp, schema, compression="zstd")
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(q)
+            async for chunk in result.mappings().partitions(ARCHIVE_BATCH):
+                columns = {name: [r[name] for r in chunk] for name in schema.names}
+                columns["timestamp"] = [utc(ts) for ts in columns["timestamp"]]
+                for name in ("label_probs", "meta"):
+                    columns[name] = [None if v is None else json.dumps(v) for v in columns[name]]
+                await asyncio.to_thread(writer.write_table, pa.Table.from_pydict(columns, schema))
+                rows += len(chunk)
+    finally:
+        writer.close()
+    os.replace(tmp, path)
+    return {"rows": rows, "file": str(path)}
+
+
+def _drop_month(conn, month: datetime, partitioned: bool, expected_rows: Optional[int]) -> int:
+    """Drop one expired month (its partition, or a range DELETE when unpartitioned) and its rollups -> rows removed."""
+    lo, hi = month, add_months(month, 1)
+    t = RiskHistory.__table__
+    partition = partition_name(month) if partitioned else None
+    if partition is not None:
+        conn.execute(text(f"LOCK TABLE {partition} IN ACCESS EXCLUSIVE MODE"))
+        rows = conn.execute(text(f"SELECT count(*) FROM {partition}")).scalar_one()
+    else:
+        rows = conn.execute(select(func.count()).select_from(t).where(t.c.timestamp >= lo, t.c.timestamp < hi)).scalar_one()
+    if expected_rows is not None and rows != expected_rows:
+        raise RuntimeError(f"{month:%Y-%m} has {rows} rows but {expected_rows} were archived; not dropped")
+    if partition is not None:
+        conn.execute(text(f"DROP TABLE {partition}"))
+    else:
+        conn.execute(delete(t).where(t.c.timestamp >= lo, t.c.timestamp < hi))
+    drop_rollups(conn, lo, hi)
+    return rows
+
+
+async def _expired_months(cutoff: datetime) -> Tuple[List[datetime], bool]:
+    """-> (months ending by cutoff, oldest first; whether they are partitions)"""
+    async with engine.begin() as conn:
+        partitioned = engine.dialect.name == "postgresql" and await conn.run_sync(_relkind, PARENT) == "p"
+        if partitioned:
+            await conn.run_sync(ensure_months)  # stray default-partition rows into their months first
+            months = await conn.run_sync(month_partitions)
+        else:
+            t = RiskHistory.__table__
+            first = (await conn.execute(select(func.min(t.c.timestamp)))).scalar()
+            months = []
+            month = month_start(first) if first is not None else cutoff
+            while add_months(month, 1) <= cutoff:
+                months.append(month)
+                month = add_months(month, 1)
+    return [m for m in months if add_months(m, 1) <= cutoff], partitioned
+
+
+async def enforce_retention(retention_days: int = RETENTION_DAYS, archive_dir: Optional[str] = ARCHIVE_DIR,
+                            now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Archive and drop every month that ended before now - retention_days (0 = no
+    retention). Months are handled oldest first; a failure stops the run with
+    everything not yet dropped left in place.
+    """
+    if retention_days <= 0:
+        return {"cutoff": None, "expired": []}
+    cutoff = utc(now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    expired = []
+    months, partitioned = await _expired_months(cutoff)
+    for month in months:
+        archived = await archive_month(month, archive_dir) if archive_dir else {"rows": None, "file": None}
+        async with engine.begin() as conn:
+            rows = await conn.run_sync(_drop_month, month, partitioned, archived["rows"])
+        history_store.drop_before(add_months(month, 1))
+        trend_store.clear()
+        forecast_cache.clear()
+        log.info("expired risk_history %s: %d rows dropped, archive %s", f"{month:%Y-%m}", rows, archived["file"])
+        expired.append({"month": f"{month:%Y-%m}", "rows": rows, "archive": archived["file"]})
+    return {"cutoff": cutoff.isoformat(), "expired": expired}
+
+
+async def run_maintenance() -> Dict[str, Any]:
+    """ensure_months (PostgreSQL) then enforce_retention, with the configured settings."""
+    report: Dict[str, Any] = {}
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            report["partitions"] = await conn.run_sync(ensure_months)
+    report["retention"] = await enforce_retention()
+    return report
+
+
+async def _maintain(interval_s: float):
+    while True:
+        try:
+            await run_maintenance()
+        except Exception:
+            log.exception("risk_history maintenance failed; retrying in %.0f s", interval_s)
+        await asyncio.sleep(interval_s)
+
+
+def start_maintenance() -> Optional[asyncio.Task]:
+    """Run maintenance now and then every HISTORY_MAINTENANCE_INTERVAL_S; None when disabled."""
+    if MAINTENANCE_INTERVAL_S <= 0:
+        return None
+    return asyncio.create_task(_maintain(MAINTENANCE_INTERVAL_S))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance, retention and archival of risk_history")
+    parser.add_argument("--migrate", action="store_true", help="convert an unpartitioned PostgreSQL table")
+    parser.add_argument("--ensure", action="store_true", help="create upcoming month partitions (PostgreSQL)")
+    parser.add_argument("--retention", action="store_true", help="archive and drop expired months")
+    parser.add_argument("--retention_days", type=int, default=RETENTION_DAYS)
+    parser.add_argument("--archive_dir", default=ARCHIVE_DIR, help="empty to drop without archiving")
+    args = parser.parse_args()
+    if not (args.migrate or args.ensure or args.retention):
+        parser.error("nothing to do (use --migrate, --ensure and/or --retention)")
+
+    async def run():
+        from .db import init_db
+        report: Dict[str, Any] = {}
+        if args.migrate and engine.dialect.name == "postgresql":
+            async with engine.begin() as conn:
+                report["migrate"] = await conn.run_sync(migrate)
+        await init_db()
+        if args.ensure and engine.dialect.name == "postgresql":
+            async with engine.begin() as conn:
+                report["partitions"] = await conn.run_sync(ensure_months)
+        if args.retention:
+            report["retention"] = await enforce_retention(args.retention_days, args.archive_dir or None)
+        return report
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# backend/app/rollups.py
+"""
+Risk rollups.
+
+risk_rollup_hour and risk_rollup_day hold one row per UTC bucket of
+risk_history: prediction count, sum and max of risk_score, count per risk level
+and, over the rows that have label_probs, the sum of each label's probability.
+
+crud's insert functions do not update those rows themselves: concurrent writers
+would all wait on the lock of the current hour's and day's row until commit.
+Instead each insert appends its per-hour deltas to risk_rollup_delta (plain
+INSERTs, one row per hour bucket of the batch) in its own transaction, and
+compact_rollups() moves them into the hour and day tables, one upsert per
+bucket, every ROLLUP_COMPACT_INTERVAL_S seconds (default 5) in the API process.
+Reads take the rollup rows and the pending deltas of a range in one statement,
+so they are exact whether or not the deltas were compacted yet.
+
+aggregate_range() reads any [since, until) exactly while touching at most a few
+hundred rows: raw rows only for the partial hours at either end, hour buckets up
+to the day boundaries and day buckets in between. Its cost is proportional to
+the number of buckets, not of predictions.
+
+init_db backfills the rollups from risk_history when either table is empty
+while risk_history is not (a database upgraded to the rollups, or tables
+dropped). Rows written without crud (imports, restores, manual SQL) are
+otherwise not in the rollups; rebuild them from risk_history with:
+
+  cd backend
+  python -m app.rollups --rebuild [--from 2025-01-01] [--to 2025-02-01]
+
+--compact folds the pending deltas right away. Upserts use INSERT ... ON
+CONFLICT, as PostgreSQL and SQLite spell it.
+
+Retention (app/partitions.py) deletes the rollups of every month it drops, in
+the same transaction, so global totals and per-subject ones both cover the
+retained rows only.
+
+Rollups are global. Per-subject aggregates (subject_id given) are computed from
+that subject's rows with one range scan of ix_risk_history_subject_timestamp_id,
+which costs the same however many other subjects there are.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, case, delete, func, insert, literal_column, select, type_coerce, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .core.models_api import LABELS, RISK_LEVELS
+from .db import AsyncSessionLocal, engine
+from .models_db import RiskHistory, risk_rollup_day, risk_rollup_delta, risk_rollup_hour
+
+log = logging.getLogger(__name__)
+
+COMPACT_INTERVAL_S = float(os.getenv("ROLLUP_COMPACT_INTERVAL_S", "5"))
+
+ROLLUPS = {"hour": risk_rollup_hour, "day": risk_rollup_day}
+STEP = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# additive columns; score_max is merged with max()
+SUM_COLUMNS = (["n", "score_sum"] + [f"n_{level}" for level in RISK_LEVELS]
+               + ["n_labeled"] + [f"sum_{label}" for label in LABELS])
+AGG_COLUMNS = SUM_COLUMNS + ["score_max"]
+
+
+def utc(ts: datetime) -> datetime:
+    """Aware UTC datetime; naive values are taken to be UTC already."""
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def floor_to(ts: datetime, unit: str) -> datetime:
+    ts = utc(ts).replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if unit == "day" else ts
+
+
+def _empty() -> Dict[str, float]:
+    return {c: 0 for c in AGG_COLUMNS}
+
+
+def _merge(into: Dict[str, float], agg: Dict[str, Any]) -> None:
+    for c in SUM_COLUMNS:
+        into[c] += agg[c] or 0
+    into["score_max"] = max(into["score_max"], agg["score_max"] or 0.0)
+
+
+def bucket_deltas(values: List[Dict[str, Any]], unit: str) -> Dict[datetime, Dict[str, float]]:
+    """Aggregate crud row values (as written to risk_history) per bucket."""
+    out: Dict[datetime, Dict[str, float]] = {}
+    for v in values:
+        agg = out.setdefault(floor_to(v["timestamp"], unit), _empty())
+        score = float(v["risk_score"])
+        agg["n"] += 1
+        agg["score_sum"] += score
+        agg["score_max"] = max(agg["score_max"], score)
+        if v["risk_level"] in RISK_LEVELS:
+            agg[f"n_{v['risk_level']}"] += 1
+        probs = v.get("label_probs")
+        if isinstance(probs, dict) and probs.get(LABELS[0]) is not None:
+            agg["n_labeled"] += 1
+            for label in LABELS:
+                agg[f"sum_{label}"] += float(probs.get(label) or 0.0)
+    return out
+
+
+def _upsert(table):
+    ins = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+    stmt = ins(table)
+    greatest = func.greatest if engine.dialect.name == "postgresql" else func.max
+    set_ = {c: table.c[c] + stmt.excluded[c] for c in SUM_COLUMNS}
+    set_["score_max"] = greatest(table.c.score_max, stmt.excluded.score_max)
+    return stmt.on_conflict_do_update(index_elements=[table.c.bucket], set_=set_)
+
+
+async def apply_rollups(session, values: List[Dict[str, Any]]) -> None:
+    """Record the rollup deltas of rows being inserted into risk_history (caller's transaction)."""
+    if not values:
+        return
+    rows = [{"bucket": b, **agg} for b, agg in sorted(bucket_deltas(values, "hour").items())]
+    await session.execute(insert(risk_rollup_delta), rows)
+
+
+async def compact_rollups() -> int:
+    """Fold every pending delta into the hour and day rollups -> deltas folded."""
+    d = risk_rollup_delta
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            # a concurrent compactor blocks on these rows and then skips them
+            deltas = (await session.execute(
+                delete(d).returning(d.c.bucket, *(d.c[c] for c in AGG_COLUMNS)))).mappings().all()
+            for unit, table in ROLLUPS.items():
+                buckets: Dict[datetime, Dict[str, float]] = {}
+                for row in deltas:
+                    _merge(buckets.setdefault(floor_to(row["bucket"], unit), _empty()), row)
+                if buckets:
+                    # sorted: concurrent compactors lock bucket rows in the same order
+                    await session.execute(_upsert(table), [{"bucket": b, **agg} for b, agg in sorted(buckets.items())])
+    return len(deltas)
+
+
+async def _compact(interval_s: float):
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await compact_rollups()
+        except Exception:
+            log.exception("rollup compaction failed; retrying in %.0f s", interval_s)
+
+
+def start_compactor() -> Optional[asyncio.Task]:
+    """Compact the rollups every ROLLUP_COMPACT_INTERVAL_S; None when disabled."""
+    if COMPACT_INTERVAL_S <= 0:
+        return None
+    return asyncio.create_task(_compact(COMPACT_INTERVAL_S))
+
+
+def _bucket_expr(ts, unit: str):
+    """SQL: the UTC bucket start of a risk_history timestamp, typed as DateTime."""
+    if engine.dialect.name == "postgresql":
+        utc_ts = func.timezone(literal_column("'UTC'"), ts)
+        return func.timezone(literal_column("'UTC'"), func.date_trunc(literal_column(f"'{unit}'"), utc_ts))
+    # SQLite stores timestamps as ISO text in this format
+    fmt = "%Y-%m-%d %H:00:00.000000" if unit == "hour" else "%Y-%m-%d 00:00:00.000000"
+    return type_coerce(func.strftime(fmt, ts), DateTime(timezone=True))
+
+
+def _raw_aggregates(t) -> list:
+    """SQL aggregates of risk_history rows, labelled as rollup columns."""
+    def total(expr):
+        return func.coalesce(func.sum(expr), 0)
+    labeled = t.c.label_probs[LABELS[0]].as_float().isnot(None)
+    return [
+        func.count().label("n"),
+        total(t.c.risk_score).label("score_sum"),
+        *[total(case((t.c.risk_level == level, 1), else_=0)).label(f"n_{level}") for level in RISK_LEVELS],
+        total(case((labeled, 1), else_=0)).label("n_labeled"),
+        *[total(t.c.label_probs[label].as_float()).label(f"sum_{label}") for label in LABELS],
+        func.coalesce(func.max(t.c.risk_score), 0.0).label("score_max"),
+    ]
+
+
+def _bounds(col, since: Optional[datetime], until: Optional[datetime]) -> list:
+    out = []
+    if since is not None:
+        out.append(col >= since)
+    if until is not None:
+        out.append(col < until)
+    return out
+
+
+def segments(since: Optional[datetime], until: Optional[datetime]) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """
+    Split [since, until) (None = unbounded) into ("raw" | "hour" | "day", start, end)
+    pieces: raw rows for partial hours, hour buckets for partial days, day buckets.
+    """
+    a = utc(since) if since is not None else None
+    b = utc(until) if until is not None else None
+    if a is not None and b is not None and a >= b:
+        return []
+    head: list = []
+    tail: list = []
+    for unit, finer in (("hour", "raw"), ("day", "hour")):
+        if a is not None and a != floor_to(a, unit):
+            end = floor_to(a, unit) + STEP[unit]
+            if b is not None and b <= end:
+                return head + [(finer, a, b)] + tail
+            head.append((finer, a, end))
+            a = end
+        if b is not None and b != floor_to(b, unit):
+            start = floor_to(b, unit)
+            if a is not None and start <= a:
+                return head + [(finer, a, b)] + tail
+            tail.insert(0, (finer, start, b))
+            b = start
+    if a is None or b is None or a < b:
+        head.append(("day", a, b))
+    return head + tail
+
+
+async def aggregate_range(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                          use_rollups: bool = True, subject_id: Optional[str] = None) -> Dict[datetime, Dict[str, float]]:
+    """
+    Rollup columns for [since, until), per UTC day, for every prediction or only
+    subject_id's. use_rollups=False scans risk_history for the whole range
+    instead (reference / benchmark path; always the case for one subject).
+    """
+    t = RiskHistory.__table__
+    since = utc(since) if since is not None else None
+    until = utc(until) if until is not None else None
+    if subject_id is not None:
+        use_rollups = False
+    pieces = segments(since, until) if use_rollups else [("raw", since, until)]
+    days: Dict[datetime, Dict[str, float]] = {}
+    async with AsyncSessionLocal() as session:
+        for kind, a, b in pieces:
+            if kind == "raw":
+                day = _bucket_expr(t.c.timestamp, "day")
+                q = (select(day.label("bucket"), *_raw_aggregates(t))
+                     .where(*_bounds(t.c.timestamp, a, b)).group_by(day))
+                if subject_id is not None:
+                    q = q.where(t.c.subject_id == subject_id)
+            else:
+                # rollup rows and pending deltas in one statement, one snapshot
+                table, d = ROLLUPS[kind], risk_rollup_delta
+                q = union_all(
+                    select(*(table.c[c] for c in ["bucket"] + AGG_COLUMNS)).where(*_bounds(table.c.bucket, a, b)),
+                    select(*(d.c[c] for c in ["bucket"] + AGG_COLUMNS)).where(*_bounds(d.c.bucket, a, b)))
+            for row in (await session.execute(q)).mappings():
+                _merge(days.setdefault(floor_to(row["bucket"], "day"), _empty()), row)
+    return days
+
+
+async def daily_totals(limit: int, until: Optional[datetime] = None,
+                       subject_id: Optional[str] = None) -> List[Tuple[datetime, float, int]]:
+    """
+    (day, sum of risk_score, predictions) of the latest `limit` days that have
+    predictions (of subject_id, if given), oldest first.
+    """
+    if subject_id is None:
+        t, d = risk_rollup_day, risk_rollup_delta
+        delta_day = _bucket_expr(d.c.bucket, "day")
+        u = union_all(
+            select(t.c.bucket.label("bucket"), t.c.score_sum, t.c.n).where(*_bounds(t.c.bucket, None, until)),
+            select(delta_day.label("bucket"), d.c.score_sum, d.c.n).where(*_bounds(delta_day, None, until)),
+        ).subquery()
+        n = func.sum(u.c.n)
+        q = (select(u.c.bucket, func.sum(u.c.score_sum), n).group_by(u.c.bucket).having(n > 0)
+             .order_by(u.c.bucket.desc()).limit(limit))
+    else:
+        t = RiskHistory.__table__
+        day = _bucket_expr(t.c.timestamp, "day")
+        q = (select(day, func.sum(t.c.risk_score), func.count())
+             .where(t.c.subject_id == subject_id, *_bounds(t.c.timestamp, None, until))
+             .group_by(day).order_by(day.desc()).limit(limit))
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(q)).all()
+    return [(utc(b), float(s), int(n)) for b, s, n in reversed(rows)]
+
+
+async def daily_scores(limit: int, until: Optional[datetime] = None,
+                       subject_id: Optional[str] = None) -> List[Tuple[datetime, float]]:
+    """
+    (day, mean risk_score) of the latest `limit` days that have predictions (of
+    subject_id, if given), oldest first.
+    """
+    return [(day, s / n) for day, s, n in await daily_totals(limit, until, subject_id)]
+
+
+def drop_rollups(conn, since: Optional[datetime], until: Optional[datetime]) -> None:
+    """Delete the pending deltas, then the hour and day buckets, of [since, until) (sync, on a Connection)."""
+    # deltas first: a compactor holding them commits its upserts before this gets past them
+    for table in (risk_rollup_delta, *ROLLUPS.values()):
+        conn.execute(delete(table).where(*_bounds(table.c.bucket, since, until)))
+
+
+async def rebuild_rollups(since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Recompute every bucket overlapping [since, until) from risk_history (bounds are
+    widened to whole days), dropping the pending deltas there. Returns the number
+    of buckets written per table.
+    """
+    since = floor_to(since, "day") if since is not None else None
+    if until is not None:
+        until = floor_to(until, "day") + (STEP["day"] if until != floor_to(until, "day") else timedelta(0))
+    t = RiskHistory.__table__
+    written = {}
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(delete(risk_rollup_delta).where(*_bounds(risk_rollup_delta.c.bucket, since, until)))
+            for unit, table in ROLLUPS.items():
+                await session.execute(delete(table).where(*_bounds(table.c.bucket, since, until)))
+                bucket = _bucket_expr(t.c.timestamp, unit)
+                q = (select(bucket.label("bucket"), *_raw_aggregates(t))
+                     .where(*_bounds(t.c.timestamp, since, until)).group_by(bucket))
+                await session.execute(insert(table).from_select(["bucket"] + AGG_COLUMNS, q))
+                written[unit] = (await session.execute(
+                    select(func.count()).select_from(table).where(*_bounds(table.c.bucket, since, until)))).scalar_one()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the risk_history rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from risk_history")
+    parser.add_argument("--compact", action="store_true", help="fold pending deltas into the rollups")
+    parser.add_argument("--from", dest="since", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--to", dest="until", type=datetime.fromisoformat, default=None)
+    args = parser.parse_args()
+    if not (args.rebuild or args.compact):
+        parser.error("nothing to do (use --rebuild or --compact)")
+
+    async def run():
+        from .db import init_db
+        try:
+            await init_db()
+        except Exception:
+            pass  # as on app startup
+        if args.rebuild:
+            written = await rebuild_rollups(args.since, args.until)
+            print(f"rebuilt rollups: {written['hour']} hour buckets, {written['day']} day buckets")
+        else:
+            print(f"compacted {await compact_rollups()} rollup deltas")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
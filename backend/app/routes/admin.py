@@ -0,0 +1,36 @@
+# backend/app/routes/admin.py
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+import asyncio
+import hmac
+import os
+
+# Use relative imports since we're in the app package
+from ..core.model_registry import registry
+from ..services.model_manager import reload_model
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# admin calls must send it in the X-Admin-Token header; unset, the admin API is disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled (ADMIN_TOKEN not set)")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/models", dependencies=[Depends(require_admin)])
+def list_models():
+    """Loaded models, their active versions and the outcome of the last reload"""
+    return registry.status()
+
+@router.post("/models/{name}/reload", dependencies=[Depends(require_admin)])
+async def reload(name: str):
+    """Load, validate and swap in the model's artifacts from disk; the old model serves until the swap"""
+    if name not in registry.names():
+        raise HTTPException(status_code=404, detail=f"Unknown model '{name}'")
+    report = await asyncio.to_thread(reload_model, name)
+    if not report["swapped"]:
+        raise HTTPException(status_code=422, detail=report)
+    return report
@@ -0,0 +1,61 @@
+# backend/app/routes/analyze.py
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# Use relative imports since we're in the app package
+from ..core.privacy_scanner import MAX_CHARS
+from ..models_db import SUBJECT_ID_LENGTH
+from ..services.inference_executor import InferenceTimeout
+from ..services.message_pipeline import MAX_MESSAGES, analyze_messages
+from ..services.prediction_writer import prediction_writer
+
+router = APIRouter(prefix="/api/analyze", tags=["analyze"])
+
+class AnalyzeMsg(BaseModel):
+    text: str = Field(..., max_length=MAX_CHARS)
+    sender: str = "other"
+
+class AnalyzeIn(BaseModel):
+    messages: list[AnalyzeMsg] = Field(..., max_length=MAX_MESSAGES)  # longer lists are rejected with 422
+    subject_id: Optional[str] = Field(None, max_length=SUBJECT_ID_LENGTH)
+
+@router.post("")
+async def analyze(payload: AnalyzeIn, debug: bool = False, persist: bool = False):
+    """
+    Privacy check and risk prediction in one request: each message is normalized
+    once and goes through privacy, keyword, model and risk stages. debug=true adds
+    per-stage timings; persist=true stores the last message like /api/predict.
+    """
+    messages = payload.messages
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    try:
+        out = await analyze_messages([m.text for m in messages])
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    summary = out["summary"]
+    _id = None
+    if persist:
+        rec = {
+            "message": messages[-1].text,
+            "sender": messages[-1].sender,
+            "subject_id": payload.subject_id,
+            "risk_level": summary["risk"]["level"],
+            "risk_score": summary["risk"]["score"],
+            "label_probs": summary["agg_label_scores"],
+            "meta": {"model_version": out["model_version"]},
+        }
+        try:
+            _id = await prediction_writer.submit(rec)
+        except Exception:
+            _id = None
+    body = {
+        "id": _id,
+        "model_version": out["model_version"],
+        "summary": summary,
+        "per_message": [{"sender": m.sender, **res} for m, res in zip(messages, out["messages"])],
+    }
+    if debug:
+        body["timings_ms"] = out["timings_ms"]
+    return body
@@ -1,59 +1,70 @@
 # backend/app/routes/forecast.py
-from fastapi import APIRouter, HTTPException
-import os, joblib, numpy as np
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 # Use relative imports since we're in the app package
-from ..crud import get_history
+from ..models_db import SUBJECT_ID_LENGTH
+from ..services.forecast_cache import forecast_cache
+from ..services.forecast_engine import forecast_steps
+from ..services.inference_executor import InferenceTimeout
 
 router = APIRouter(prefix="/api/forecast", tags=["forecast"])
 
-EXP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "experiments"))
-MODEL_PATH = os.path.join(EXP_DIR, "forecast_model.pt")
-PREPROC_PATH = os.path.join(EXP_DIR, "forecast_preproc.joblib")
-
-def score_to_level(s: float) -> str:
-    s = float(s)
-    if s < 0.25:
-        return "safe"
-    if s < 0.45:
-        return "medium"
-    if s < 0.7:
-        return "high"
-    return "critical"
-
-def linear_extrapolate(series, days=3):
-    series = np.array(series)
-    if len(series) < 2:
-        return [float(series[-1]) if len(series)>0 else 0.0]*days
-    x = np.arange(len(series))
-    coeffs = np.polyfit(x, series, 1)
-    slope, intercept = coeffs[0], coeffs[1]
-    preds = [float(np.clip(intercept + slope*(len(series)-1+d), 0,1)) for d in range(1, days+1)]
-    return preds
+# subjects per /api/forecast/batch request
+MAX_BATCH_SUBJECTS = 1000
+
+class ForecastBatchIn(BaseModel):
+    subject_ids: List[str] = Field(..., max_length=MAX_BATCH_SUBJECTS)
+    days: int = 3
+    recent: int = 60  # days with predictions, as /api/forecast
+
+def _empty_forecast(days: int) -> dict:
+    return {
+        "forecast": [{"step": i+1, "score": 0.0, "risk_level": "safe"} for i in range(days)],
+        "daily_risk_pct": [0] * days
+    }
+
+def _forecast_out(preds: List[float]) -> dict:
+    # also return simple daily risk pct for UI convenience
+    return {"forecast": forecast_steps(preds), "daily_risk_pct": [int(round(p*100)) for p in preds]}
 
 @router.get("")
-async def forecast(days: int = 3, recent: int = 60):
+async def forecast(days: int = 3,
+                   recent: int = Query(60, description="days with predictions fitted (before API 2.0: predictions)"),
+                   subject_id: Optional[str] = Query(None, max_length=SUBJECT_ID_LENGTH)):
+    """
+    Forecast the mean daily risk score from the last `recent` days with predictions
+    (day rollups), or from one subject's (in-memory history store when it holds
+    them), with the LSTM forecaster or linear extrapolation when none is loaded.
+    Served from the forecast cache until the subject gets a new prediction.
+
+    Breaking change in API 2.0: `recent` used to be the number of latest
+    predictions fitted one point each; it is now a number of days.
+    """
     try:
-        history = await get_history(limit=recent)
+        preds = await forecast_cache.get(subject_id, days, recent)
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         # Return empty forecast instead of crashing
-        return {
-            "forecast": [{"step": i+1, "score": 0.0, "risk_level": "safe"} for i in range(days)],
-            "daily_risk_pct": [0] * days,
-            "error": f"Database error: {str(e)}"
-        }
-    if not history:
+        return {**_empty_forecast(days), "error": f"Database error: {str(e)}"}
+    if preds is None:
         # Return default safe forecast if no history
-        return {
-            "forecast": [{"step": i+1, "score": 0.0, "risk_level": "safe"} for i in range(days)],
-            "daily_risk_pct": [0] * days
-        }
-    series = [float(h.get("risk_score", 0.0)) for h in history if h.get("risk_score") is not None]
-    preds = linear_extrapolate(series, days=days)
-    out = []
-    for i,p in enumerate(preds):
-        out.append({"step": i+1, "score": float(p), "risk_level": score_to_level(p)})
-    # also return simple daily risk pct for UI convenience
-    daily_risk_pct = [int(round(p*100)) for p in preds]
-    return {"forecast": out, "daily_risk_pct": daily_risk_pct}
+        return _empty_forecast(days)
+    return _forecast_out(preds)
+
+@router.post("/batch")
+async def forecast_subjects(payload: ForecastBatchIn):
+    """
+    Forecasts for many subjects in one LSTM forward pass, keyed by subject_id
+    (e.g. a nightly job forecasting every subject); cached ones are not recomputed.
+    """
+    ids = list(dict.fromkeys(payload.subject_ids))
+    if any(len(s) > SUBJECT_ID_LENGTH for s in ids):
+        raise HTTPException(status_code=422, detail=f"subject_id longer than {SUBJECT_ID_LENGTH}")
+    try:
+        preds = await forecast_cache.get_many(ids, payload.days, payload.recent)
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {s: _forecast_out(p) if p is not None else _empty_forecast(payload.days) for s, p in zip(ids, preds)}
@@ -0,0 +1,62 @@
+# backend/app/routes/history.py
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+import json
+
+# Use relative imports since we're in the app package
+from ..crud import HISTORY_COLUMNS, get_history_page, iter_history, history_select
+from ..models_db import SUBJECT_ID_LENGTH
+
+router = APIRouter(prefix="/api/history", tags=["history"])
+
+MAX_PAGE = 1000
+
+def _columns(columns: Optional[str]):
+    return HISTORY_COLUMNS if not columns else [c.strip() for c in columns.split(",") if c.strip()]
+
+@router.get("")
+async def history_page(
+    limit: int = Query(100, ge=1, le=MAX_PAGE),
+    cursor: Optional[str] = None,
+    order: str = "desc",
+    columns: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+    subject_id: Optional[str] = Query(None, max_length=SUBJECT_ID_LENGTH),
+):
+    """
+    One page of prediction history, newest first by default. Pass the returned
+    next_cursor back as ?cursor= for the following page (null on the last page).
+    columns: comma-separated subset of HISTORY_COLUMNS; id and timestamp are always
+    included. from/to bound the timestamp (inclusive / exclusive); subject_id
+    restricts it to one monitored subject.
+    """
+    try:
+        items, next_cursor = await get_history_page(_columns(columns), limit, cursor, order, since, until, subject_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/export")
+async def history_export(
+    cursor: Optional[str] = None,
+    order: str = "asc",
+    columns: Optional[str] = None,
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+    subject_id: Optional[str] = Query(None, max_length=SUBJECT_ID_LENGTH),
+):
+    """Every matching row as NDJSON, streamed from the database in constant memory."""
+    cols = _columns(columns)
+    try:
+        history_select(cols, cursor, order, since, until, subject_id)  # validate before the response starts
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines():
+        async for row in iter_history(cols, cursor, order, since, until, subject_id):
+            yield json.dumps(row) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,29 @@
+# backend/app/routes/metrics.py
+from fastapi import APIRouter
+
+# Use relative imports since we're in the app package
+from ..core.prediction_cache import prediction_cache
+from ..services.ai_inference import cascade_stats, transformer_batcher
+from ..services.forecast_cache import forecast_cache
+from ..services.history_store import history_store
+from ..services.inference_executor import executor_stats
+from ..services.prediction_writer import prediction_writer
+from ..services.session_store import session_store
+from ..services.trend import trend_store
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+@router.get("")
+def get_metrics():
+    """Runtime counters of the serving subsystems"""
+    return {
+        "inference_executor": executor_stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "transformer_batcher": transformer_batcher.stats(),
+        "cascade": cascade_stats(),
+        "sessions": session_store.stats(),
+        "prediction_writer": prediction_writer.stats(),
+        "history_store": history_store.stats(),
+        "forecast_cache": forecast_cache.stats(),
+        "trend": trend_store.stats(),
+    }
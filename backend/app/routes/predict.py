@@ -1,20 +1,36 @@
 # backend/app/routes/predict.py
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional
+import asyncio
+import json
+import os
 
 # Use relative imports since we're in the app package
 from ..db import get_session
-from ..core.models_api import predict_multilabel_single, map_probs_to_risk
-from ..crud import insert_prediction
+from ..core.models_api import probs_row_to_dict, map_probs_to_risk, risk_level_for
+from ..models_db import SUBJECT_ID_LENGTH
+from ..services.ai_inference import predict_multilabel_with_version_async
+from ..services.inference_executor import InferenceTimeout
+from ..services.prediction_writer import prediction_writer
 
 router = APIRouter(prefix="/api/predict", tags=["predict"])
 
+# /stream: messages scored per micro-batch, and the largest accepted NDJSON line
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "256"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
 class MsgIn(BaseModel):
     text: str
     sender: str = "other"
 
 class ConversationIn(BaseModel):
     messages: list[MsgIn]
+    subject_id: Optional[str] = Field(None, max_length=SUBJECT_ID_LENGTH)  # monitored child / device
+
+class StreamMsgIn(MsgIn):
+    subject_id: Optional[str] = Field(None, max_length=SUBJECT_ID_LENGTH)
 
 @router.post("")
 async def predict_single(payload: ConversationIn):
@@ -22,26 +38,191 @@ async def predict_single(payload: ConversationIn):
     messages = payload.messages
     if not messages:
         raise HTTPException(status_code=400, detail="No messages provided")
-    per_message = []
-    aggregated = {}
-    for m in messages:
-        t = m.text
-        probs = predict_multilabel_single(t)
-        per_message.append({"sender": m.sender, "text": t, "labels": probs})
-        # aggregate by max
-        for k, v in probs.items():
-            aggregated[k] = max(aggregated.get(k, 0.0), v)
+    # score the whole conversation in one batch, then aggregate by column-wise max
+    try:
+        probs, version = await predict_multilabel_with_version_async([m.text for m in messages])
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    per_message = [
+        {"sender": m.sender, "text": m.text, "labels": probs_row_to_dict(row)}
+        for m, row in zip(messages, probs)
+    ]
+    aggregated = probs_row_to_dict(probs.max(axis=0))
     risk = map_probs_to_risk(aggregated)
-    # persist last message as record
+    # persist last message as record (queued when PERSIST_MODE=write_behind; id is then null)
     rec = {
         "message": messages[-1].text,
         "sender": messages[-1].sender,
-        "risk_level": ("high" if risk["risk_score"]>=0.7 else "medium" if risk["risk_score"]>=0.45 else "low"),
+        "subject_id": payload.subject_id,
+        "risk_level": risk_level_for(risk["risk_score"]),
         "risk_score": float(risk["risk_score"]),
         "label_probs": aggregated,
+        "meta": {"model_version": version},
     }
     try:
-        _id = await insert_prediction(rec)
+        _id = await prediction_writer.submit(rec)
     except Exception:
         _id = None
-    return {"id": _id, "summary": {"agg_label_scores": aggregated, "risk": {"level": rec["risk_level"], "score": rec["risk_score"]}}, "per_message": per_message}
+    return {"id": _id, "model_version": version, "summary": {"agg_label_scores": aggregated, "risk": {"level": rec["risk_level"], "score": rec["risk_score"]}}, "per_message": per_message}
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator itself reads the request body.
+    The stock response may listen for a disconnect on receive(), which would
+    steal the request chunks; until body_read is set it gets a receive() that
+    only waits (a disconnect then surfaces as ClientDisconnect from
+    request.stream()), afterwards the real one.
+    """
+
+    def __init__(self, content, body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_read = body_read
+
+    async def __call__(self, scope, receive, send):
+        async def receive_after_body():
+            await self.body_read.wait()
+            return await receive()
+
+        await super().__call__(scope, receive_after_body, send)
+
+async def _ndjson_lines(request: Request, max_line_bytes: int):
+    """
+    Yield (line_no, raw_line) from the request body as it arrives; raw_line is None
+    when the line exceeded max_line_bytes (its bytes are dropped, not buffered).
+    """
+    buf = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                if not oversized:
+                    buf += chunk[start:]
+                    if len(buf) > max_line_bytes:
+                        oversized = True
+                        buf.clear()
+                break
+            line_no += 1
+            if not oversized:
+                buf += chunk[start:nl]
+            yield line_no, (None if oversized or len(buf) > max_line_bytes else bytes(buf))
+            buf.clear()
+            oversized = False
+            start = nl + 1
+    if buf or oversized:
+        yield line_no + 1, (None if oversized else bytes(buf))
+
+def _parse_stream_line(raw: bytes):
+    """Return ("message", StreamMsgIn) or ("conversation", (id, ConversationIn))."""
+    obj = json.loads(raw)
+    if not isinstance(obj, dict):
+        raise ValueError("each line must be a JSON object")
+    if "messages" in obj:
+        conv = ConversationIn.model_validate(obj)
+        if not conv.messages:
+            raise ValueError("No messages provided")
+        return "conversation", (obj.get("id"), conv)
+    return "message", StreamMsgIn.model_validate(obj)
+
+async def _score_stream_batch(items, persist: bool):
+    """
+    Score one micro-batch of lines; returns (result dicts in line order, persisted count).
+    items are (line_no, "message" | "conversation" | "error", parsed line or error message).
+    """
+    texts = []
+    for _, kind, obj in items:
+        if kind == "message":
+            texts.append(obj.text)
+        elif kind == "conversation":
+            texts.extend(m.text for m in obj[1].messages)
+    try:
+        probs, version = await predict_multilabel_with_version_async(texts) if texts else (None, None)
+    except InferenceTimeout as e:
+        return [{"line": line_no, "error": obj if kind == "error" else str(e)} for line_no, kind, obj in items], 0
+
+    results, records = [], []
+    offset = 0
+    for line_no, kind, obj in items:
+        if kind == "error":
+            results.append({"line": line_no, "error": obj})
+            continue
+        if kind == "message":
+            block, last, subject_id = probs[offset:offset + 1], obj, obj.subject_id
+        else:
+            block, last, subject_id = probs[offset:offset + len(obj[1].messages)], obj[1].messages[-1], obj[1].subject_id
+        offset += len(block)
+        aggregated = probs_row_to_dict(block.max(axis=0))
+        risk = map_probs_to_risk(aggregated)
+        level = risk_level_for(risk["risk_score"])
+        if kind == "message":
+            res = {"line": line_no, "model_version": version, "sender": obj.sender, "labels": aggregated,
+                   "risk": {"level": level, "score": float(risk["risk_score"])}}
+        else:
+            res = {"line": line_no, "id": obj[0], "model_version": version,
+                   "summary": {"agg_label_scores": aggregated, "risk": {"level": level, "score": float(risk["risk_score"])}},
+                   "per_message": [{"sender": m.sender, "labels": probs_row_to_dict(row)}
+                                   for m, row in zip(obj[1].messages, block)]}
+        results.append(res)
+        records.append({"message": last.text, "sender": last.sender, "subject_id": subject_id, "risk_level": level,
+                        "risk_score": float(risk["risk_score"]), "label_probs": aggregated,
+                        "meta": {"model_version": version}})
+    persisted = 0
+    if persist:
+        try:
+            persisted = await prediction_writer.submit_many(records)
+        except Exception:
+            persisted = 0
+    return results, persisted
+
+@router.post("/stream")
+async def predict_stream(request: Request, persist: bool = False, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Bulk scoring over NDJSON: each input line is a message {"text", "sender", "subject_id"?}
+    or a conversation {"id"?, "subject_id"?, "messages": [...]}. Lines are scored in micro-batches of
+    about batch_size messages and one NDJSON result per line is streamed back, in
+    input order, as each batch completes (lines that fail to parse included, as
+    {"line", "error"}), followed by a final {"done": true, ...} line. Memory stays
+    bounded by the batch size and STREAM_MAX_LINE_BYTES, whatever the input size.
+    Results start flowing before the upload ends, so large uploads need a client
+    that reads the response while sending (e.g. curl -T - or an async client).
+    """
+    batch_size = max(1, min(batch_size, 10_000))
+    body_read = asyncio.Event()
+
+    async def results():
+        stats = {"lines": 0, "scored": 0, "errors": 0, "persisted": 0}
+        items, n_texts = [], 0
+
+        async def flush():
+            nonlocal items, n_texts
+            out, persisted = await _score_stream_batch(items, persist)
+            stats["persisted"] += persisted
+            for res in out:
+                stats["errors" if "error" in res else "scored"] += 1
+            items, n_texts = [], 0
+            return "".join(json.dumps(r) + "\n" for r in out)
+
+        async for line_no, raw in _ndjson_lines(request, STREAM_MAX_LINE_BYTES):
+            if raw is not None and not raw.strip():
+                continue
+            stats["lines"] += 1
+            try:
+                if raw is None:
+                    raise ValueError(f"line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+                kind, obj = _parse_stream_line(raw)
+            except (ValueError, ValidationError) as e:
+                items.append((line_no, "error", str(e)))
+            else:
+                items.append((line_no, kind, obj))
+                n_texts += 1 if kind == "message" else len(obj[1].messages)
+            if n_texts >= batch_size or len(items) >= batch_size:
+                yield await flush()
+        body_read.set()
+        if items:
+            yield await flush()
+        yield json.dumps({"done": True, **stats}) + "\n"
+
+    return _DuplexStreamingResponse(results(), body_read, media_type="application/x-ndjson")
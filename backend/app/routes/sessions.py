@@ -0,0 +1,86 @@
+# backend/app/routes/sessions.py
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# Use relative imports since we're in the app package
+from ..core.models_api import probs_row_to_dict
+from ..models_db import SUBJECT_ID_LENGTH
+from ..services.ai_inference import predict_multilabel_with_version_async
+from ..services.inference_executor import InferenceTimeout
+from ..services.prediction_writer import prediction_writer
+from ..services.session_store import session_store
+from .predict import MsgIn, risk_level_for
+
+router = APIRouter(prefix="/api/sessions", tags=["sessions"])
+
+class AppendIn(BaseModel):
+    messages: list[MsgIn]
+    subject_id: Optional[str] = Field(None, max_length=SUBJECT_ID_LENGTH)
+
+def _summary_out(session):
+    s = session.summary()
+    return {
+        "session_id": s["session_id"],
+        "n_messages": s["n_messages"],
+        "summary": {"agg_label_scores": s["agg_label_scores"], "risk": {"level": risk_level_for(s["risk_score"]), "score": s["risk_score"]}},
+    }
+
+@router.post("")
+async def create_session():
+    """Start a live conversation; append messages to it instead of reposting the chat"""
+    return _summary_out(session_store.create())
+
+@router.get("/{session_id}")
+async def get_session(session_id: str, include_messages: bool = False):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    out = _summary_out(session)
+    if include_messages:
+        # cached per-message scores (the most recent SESSION_MAX_MESSAGES, text cut to SESSION_MAX_TEXT_CHARS)
+        out["per_message"] = list(session.recent)
+    return out
+
+@router.post("/{session_id}/messages")
+async def append_messages(session_id: str, payload: AppendIn):
+    """Score only the appended messages and fold them into the running aggregate"""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    messages = payload.messages
+    if not messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+    try:
+        probs, version = await predict_multilabel_with_version_async([m.text for m in messages])
+    except InferenceTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    scored = [
+        {"sender": m.sender, "text": m.text, "labels": probs_row_to_dict(row)}
+        for m, row in zip(messages, probs)
+    ]
+    session_store.append_scored(session, scored)
+    out = _summary_out(session)
+    # persist last message with the conversation-so-far aggregate, as /api/predict does
+    rec = {
+        "message": messages[-1].text,
+        "sender": messages[-1].sender,
+        "subject_id": payload.subject_id,
+        "risk_level": out["summary"]["risk"]["level"],
+        "risk_score": out["summary"]["risk"]["score"],
+        "label_probs": out["summary"]["agg_label_scores"],
+        "meta": {"session_id": session.id, "n_messages": session.n_messages, "model_version": version},
+    }
+    try:
+        out["id"] = await prediction_writer.submit(rec)
+    except Exception:
+        out["id"] = None
+    out["model_version"] = version
+    out["per_message"] = scored
+    return out
+
+@router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": True}
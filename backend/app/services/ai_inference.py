@@ -6,13 +6,231 @@ This wraps core.models_api so other app parts don't need to know internals.
 
 Place at: predictive-safety/backend/app/services/ai_inference.py
 """
-from typing import Dict, Any, List
-from app.core import models_api
+import asyncio
+import os
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from app.core import models_api, transformer_backend
+from app.core.model_registry import registry
+from app.core.prediction_cache import prediction_cache, make_key
+from app.utils import normalize_text
+from app.services.inference_executor import run_inference
+from app.services.micro_batcher import MicroBatcher
+
+# coalesces concurrent requests into one transformer forward pass; the keyword
+# heuristics are maxed in per request (see _score_plan)
+transformer_batcher = MicroBatcher(transformer_backend.predict_model_versioned)
+
+# INFERENCE_BACKEND=cascade: keywords + TF-IDF score every message and only those
+# with a TF-IDF probability inside [CASCADE_LOW, CASCADE_HIGH] for some label go
+# on to the transformer; a keyword hit >= CASCADE_HIGH settles a message outright
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", "0.2"))
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", "0.8"))
+TIERS = ("keywords", "tfidf", "transformer")
+_cascade_counts = {tier: 0 for tier in TIERS}
+_cascade_counts["transformer_unavailable"] = 0
+
+
+def _transformer_version() -> Optional[str]:
+    model = registry.get("transformer")
+    return model.version if model is not None else None
+
+
+def _active_version() -> str:
+    """Version of the model new requests are scored with (loads it on first use)."""
+    backend = models_api.INFERENCE_BACKEND
+    if backend in ("transformer", "cascade"):
+        t_version = _transformer_version()
+        if t_version is not None:
+            if backend == "transformer":
+                return t_version
+            return f"cascade-{models_api.model_version()}+{t_version}"
+    return models_api.model_version()
+
+
+def _models_loaded() -> bool:
+    if models_api.INFERENCE_BACKEND != "tfidf" and not registry.is_loaded("transformer"):
+        return False
+    return registry.is_loaded("tfidf")
+
+
+def cascade_route(model_probs: np.ndarray, keyword_probs: np.ndarray,
+                  low: float = CASCADE_LOW, high: float = CASCADE_HIGH) -> np.ndarray:
+    """Index into TIERS of the tier that settles each message."""
+    route = np.full(len(model_probs), TIERS.index("tfidf"))
+    route[((model_probs >= low) & (model_probs <= high)).any(axis=1)] = TIERS.index("transformer")
+    route[(keyword_probs >= high).any(axis=1)] = TIERS.index("keywords")
+    return route
+
+
+def _cascade_first_tier(texts: List[str], hits: Optional[np.ndarray] = None):
+    """
+    Runs in the executor: tier-1 probs, the route of each message, the keyword
+    probs and the TF-IDF version.
+    """
+    model_probs, keyword_probs, version = models_api.score_tiers(texts, hits)
+    return (np.maximum(model_probs, keyword_probs), cascade_route(model_probs, keyword_probs),
+            keyword_probs, version)
+
+
+def _cascade_merge(probs, route, keyword_probs, escalated_idx, escalated, tfidf_version: str):
+    """Overwrite escalated rows with transformer scores and count what each tier settled."""
+    if not len(escalated_idx):
+        t_version = _transformer_version() or "none"
+    elif escalated is None:
+        # transformer went away between lookup and scoring: keep the tier-1 scores
+        route[escalated_idx] = TIERS.index("tfidf")
+        _cascade_counts["transformer_unavailable"] += len(escalated_idx)
+        t_version = "none"
+    else:
+        probs[escalated_idx] = np.maximum(escalated[0], keyword_probs[escalated_idx])
+        t_version = escalated[1]
+    for i, tier in enumerate(TIERS):
+        _cascade_counts[tier] += int((route == i).sum())
+    return probs, f"cascade-{tfidf_version}+{t_version}"
+
+
+def cascade_stats() -> Dict[str, Any]:
+    """Messages settled by each cascade tier, as counts and fractions of traffic."""
+    total = sum(_cascade_counts[t] for t in TIERS)
+    return {
+        "enabled": models_api.INFERENCE_BACKEND == "cascade",
+        "band": [CASCADE_LOW, CASCADE_HIGH],
+        "messages": total,
+        "counts": dict(_cascade_counts),
+        "fractions": {t: round(_cascade_counts[t] / total, 4) if total else 0.0 for t in TIERS},
+    }
+
+
+def _split_cached(texts: List[str], version: str, prenormalized: bool = False):
+    """
+    Normalize texts (unless the caller already did) and fill rows already in the
+    prediction cache. Returns (out, pending) where pending maps each uncached
+    normalized text to the row indices waiting for it.
+    """
+    normalized = list(texts) if prenormalized else [normalize_text(t) for t in texts]
+    out = np.zeros((len(normalized), len(models_api.LABELS)), dtype=np.float64)
+    pending: Dict[str, List[int]] = {}
+    if not prediction_cache.enabled:
+        for i, t in enumerate(normalized):
+            pending.setdefault(t, []).append(i)
+        return out, pending
+    keys = [make_key(t, version) for t in normalized]
+    for i, row in enumerate(prediction_cache.get_many(keys)):
+        if row is None:
+            pending.setdefault(normalized[i], []).append(i)
+        else:
+            out[i] = row
+    return out, pending
+
+
+def _fill_scored(out: np.ndarray, pending: Dict[str, List[int]], probs: np.ndarray, version: str) -> np.ndarray:
+    for row, idxs in zip(probs, pending.values()):
+        out[idxs] = row
+    if prediction_cache.enabled:
+        # cached under the version that actually scored them (may differ from the
+        # lookup version if a hot reload happened in between)
+        prediction_cache.put_many([make_key(t, version) for t in pending], probs)
+    return out
+
+
+def _pending_hits(pending: Dict[str, List[int]], hits: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Rows of a caller's keyword hit matrix for the uncached texts, in pending order."""
+    return hits[[idxs[0] for idxs in pending.values()]] if hits is not None else None
+
+
+def _score_plan(texts: List[str], version: str, hits: Optional[np.ndarray] = None):
+    """
+    How uncached texts are scored under `version`, shared by the sync and async
+    entry points: a generator that yields (fn, texts) steps, is sent each step's
+    result and returns (probs, version). The sync path calls each fn directly;
+    the async one runs it in the inference executor, or through the
+    micro-batcher when fn is the transformer. hits: the texts' keyword rule
+    matches when the caller already has them; otherwise a step computes them.
+    """
+    if version.startswith("cascade-"):
+        probs, route, keyword_probs, tfidf_version = yield partial(_cascade_first_tier, hits=hits), texts
+        idx = np.flatnonzero(route == TIERS.index("transformer"))
+        escalated = (yield transformer_batcher.fn, [texts[i] for i in idx]) if len(idx) else None
+        return _cascade_merge(probs, route, keyword_probs, idx, escalated, tfidf_version)
+    if version.startswith("transformer-"):
+        result = yield transformer_batcher.fn, texts
+        if result is not None:
+            # given hits only need the boost table applied, no executor round trip
+            keyword_probs = (models_api._keyword_probs_batch(texts, hits) if hits is not None
+                             else (yield models_api._keyword_probs_batch, texts))
+            return np.maximum(result[0], keyword_probs), result[1]
+    return (yield partial(models_api.predict_multilabel_batch_versioned, hits=hits), texts)
 
 
 def predict_multilabel_for_text(text: str) -> Dict[str, float]:
     """Return dict label->prob for a single text."""
-    return models_api.predict_multilabel_single(text)
+    return models_api.probs_row_to_dict(predict_multilabel_for_texts([text])[0])
+
+
+def predict_multilabel_with_version(texts: List[str], prenormalized: bool = False,
+                                    keyword_hits: Optional[np.ndarray] = None) -> Tuple[np.ndarray, str]:
+    """
+    Batch-score texts on the calling thread; cache hits are not rescored.
+    prenormalized=True: texts are already utils.normalize_text output.
+    keyword_hits: keyword_rules match matrix of texts, not recomputed when given.
+    Returns (probs, model_version).
+    """
+    version = _active_version()
+    out, pending = _split_cached(texts, version, prenormalized)
+    if not pending:
+        return out, version
+    plan = _score_plan(list(pending), version, _pending_hits(pending, keyword_hits))
+    try:
+        fn, args = next(plan)
+        while True:
+            fn, args = plan.send(fn(args))
+    except StopIteration as done:
+        probs, version = done.value
+    return _fill_scored(out, pending, probs, version), version
+
+
+def predict_multilabel_for_texts(texts: List[str]) -> np.ndarray:
+    """Return an (n_texts x n_labels) prob array for many texts, scored in one batch."""
+    return predict_multilabel_with_version(texts)[0]
+
+
+async def predict_multilabel_with_version_async(texts: List[str], prenormalized: bool = False,
+                                                keyword_hits: Optional[np.ndarray] = None) -> Tuple[np.ndarray, str]:
+    """
+    Batch-score texts in the inference executor, off the event loop; cache hits skip
+    the executor. With the transformer backend, uncached texts go through the
+    micro-batcher together with those of concurrent requests; in cascade mode
+    only the escalated ones do. prenormalized=True: texts are already
+    utils.normalize_text output. keyword_hits: keyword_rules match matrix of
+    texts, not recomputed when given. Returns (probs, model_version).
+    """
+    if _models_loaded():
+        version = _active_version()
+    else:
+        # first use: load the model in a worker thread rather than on the event loop
+        version = await asyncio.to_thread(_active_version)
+    out, pending = _split_cached(texts, version, prenormalized)
+    if not pending:
+        return out, version
+    plan = _score_plan(list(pending), version, _pending_hits(pending, keyword_hits))
+    try:
+        fn, args = next(plan)
+        while True:
+            if fn is transformer_batcher.fn:
+                result = await transformer_batcher.submit(args)
+            else:
+                result = await run_inference(fn, args)
+            fn, args = plan.send(result)
+    except StopIteration as done:
+        probs, version = done.value
+    return _fill_scored(out, pending, probs, version), version
+
+
+async def predict_multilabel_for_texts_async(texts: List[str]) -> np.ndarray:
+    """Batch-score texts in the inference executor, off the event loop. Cache hits skip the executor."""
+    return (await predict_multilabel_with_version_async(texts))[0]
 
 
 def aggregate_labels_max(list_of_label_dicts: List[Dict[str, float]]) -> Dict[str, float]:
@@ -0,0 +1,303 @@
+# backend/app/services/forecast_cache.py
+"""
+Cache of /api/forecast results.
+
+Entries are keyed by (subject_id, days, recent, forecaster version) and record
+the subject's write version they were computed at. crud's insert functions bump
+the version of every subject they write (and of None, the all-subjects
+forecast) after commit, so an entry is served only while no prediction for its
+subject has been inserted since -- a dashboard polling an idle subject gets its
+forecast from memory, and the first read after a write recomputes it.
+
+With FORECAST_REFRESH_INTERVAL_S set, a background task recomputes, every
+interval, the cached forecasts of subjects written since the last run (one
+batched forecaster call per `days`), so reads after writes stay hits without
+computing on the request path. FORECAST_MAX_STALE_S additionally lets reads be
+served the previous forecast of a written subject for that long while the
+refresh is pending, instead of recomputing it themselves.
+
+Concurrent misses for the same key share one computation. Versions only track
+this process's inserts, so with several API workers (or any other writer) the
+cache would keep serving forecasts that other processes' writes made stale. It
+is therefore off by default; set FORECAST_CACHE_SIZE only when a single
+process writes.
+
+Configured via env:
+ - FORECAST_CACHE_SIZE: max entries (default 0: cache disabled; e.g. 4096)
+ - FORECAST_REFRESH_INTERVAL_S: background refresh period (default 0 = off)
+ - FORECAST_MAX_STALE_S: how stale a served forecast may be while its refresh is pending
+   (default 0 = never; needs the background refresh)
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.forecast_engine import forecast_batch, model_version
+from app.services.inference_executor import run_inference
+from app.services.trend import load_daily_totals, trend_store
+
+log = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "0"))
+REFRESH_INTERVAL_S = float(os.getenv("FORECAST_REFRESH_INTERVAL_S", "0"))
+MAX_STALE_S = float(os.getenv("FORECAST_MAX_STALE_S", "0"))
+
+Key = Tuple[Optional[str], int, int, Optional[str]]
+
+
+async def daily_series(subject_id: Optional[str], recent: int) -> List[float]:
+    """Mean daily risk_score of the latest `recent` days with predictions, oldest first."""
+    return [s / n for _, s, n in await load_daily_totals(subject_id, recent)]
+
+
+async def compute_forecasts(requests: List[Tuple[Optional[str], int, int]]) -> List[Optional[List[float]]]:
+    """
+    Forecasts for (subject_id, days, recent) requests, one forecaster call per
+    distinct `days`; None for subjects without predictions. Without a forecaster,
+    subjects' incremental trend estimates (services/trend.py) are used instead.
+    """
+    out: List[Optional[List[float]]] = [None] * len(requests)
+    if model_version() == "linear":
+        for i, (subject_id, days, recent) in enumerate(requests):
+            out[i] = await trend_store.extrapolate(subject_id, days, recent)
+    series = [await daily_series(subject_id, recent) if out[i] is None else []
+              for i, (subject_id, _, recent) in enumerate(requests)]
+    for days in sorted({r[1] for r in requests}):
+        idx = [i for i, r in enumerate(requests) if r[1] == days and series[i]]
+        if idx:
+            preds = await run_inference(forecast_batch, [series[i] for i in idx], days, trend_store.halflife)
+            for i, p in zip(idx, preds):
+                out[i] = p
+    return out
+
+
+class _Entry:
+    __slots__ = ("value", "version", "computed_at")
+
+    def __init__(self, value: Optional[List[float]], version: int, computed_at: float):
+        self.value = value
+        self.version = version
+        self.computed_at = computed_at
+
+
+class ForecastCache:
+    def __init__(self, max_entries: int = CACHE_SIZE, refresh_interval_s: float = REFRESH_INTERVAL_S,
+                 max_stale_s: float = MAX_STALE_S):
+        self.max_entries = max_entries
+        self.refresh_interval_s = refresh_interval_s
+        self.max_stale_s = max_stale_s if refresh_interval_s > 0 else 0.0
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._versions: Dict[Optional[str], int] = {}  # subject -> inserts seen (None: all subjects)
+        self._dirty: Dict[Optional[str], float] = {}  # subject -> time of its first insert since the last refresh
+        self._inflight: Dict[Key, asyncio.Future] = {}
+        self._generation = 0  # bumped by clear(): results computed before it are dropped
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.refreshes = 0
+        self.refreshed = 0
+        self.refreshed_subjects = 0
+        self.refresh_errors = 0
+        self.refresh_lag_s_total = 0.0
+        self.refresh_lag_s_max = 0.0
+        self.stale_s_total = 0.0
+        self.stale_s_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # ---- invalidation ----
+
+    def bump(self, subject_ids: Iterable[Optional[str]]) -> None:
+        """Record committed inserts for these subjects (crud, after commit)."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        for s in {None, *subject_ids}:
+            self._versions[s] = self._versions.get(s, 0) + 1
+            self._dirty.setdefault(s, now)
+            self.invalidations += 1
+        if len(self._versions) > 2 * self.max_entries + 1000:
+            self._prune_versions()
+
+    def _prune_versions(self) -> None:
+        # a subject with nothing cached or computing can restart from version 0
+        live = {k[0] for k in self._entries} | {k[0] for k in self._inflight}
+        self._versions = {s: v for s, v in self._versions.items() if s in live}
+        self._dirty = {s: t for s, t in self._dirty.items() if s in live}
+
+    def clear(self) -> None:
+        """Drop every entry (history deleted or expired)."""
+        self._entries.clear()
+        self._versions.clear()
+        self._dirty.clear()
+        self._generation += 1
+
+    # ---- reads ----
+
+    def _lookup(self, key: Key, now: float) -> Tuple[bool, Optional[List[float]]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.version == self._versions.get(key[0], 0):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return True, entry.value
+        dirty_since = self._dirty.get(key[0])
+        if self.max_stale_s > 0 and dirty_since is not None and now - dirty_since <= self.max_stale_s:
+            stale = now - dirty_since
+            self.stale_hits += 1
+            self.stale_s_total += stale
+            self.stale_s_max = max(self.stale_s_max, stale)
+            self._entries.move_to_end(key)
+            return True, entry.value
+        return False, None
+
+    def _store(self, key: Key, value: Optional[List[float]], version: int, generation: int) -> None:
+        if generation != self._generation:
+            return
+        self._entries[key] = _Entry(value, version, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_many(self, subject_ids: List[Optional[str]], days: int = 3,
+                       recent: int = 60) -> List[Optional[List[float]]]:
+        """Forecast per subject (None: no predictions), from the cache or computed in one batch."""
+        if not self.enabled:
+            return await compute_forecasts([(s, days, recent) for s in subject_ids])
+        now = time.monotonic()
+        version = model_version()
+        out: List[Optional[List[float]]] = [None] * len(subject_ids)
+        waiting: Dict[int, asyncio.Future] = {}
+        todo: Dict[Optional[str], List[int]] = {}
+        for i, s in enumerate(subject_ids):
+            key = (s, days, recent, version)
+            found, value = self._lookup(key, now)
+            if found:
+                out[i] = value
+            elif key in self._inflight:
+                self.misses += 1
+                waiting[i] = self._inflight[key]
+            else:
+                if s not in todo:
+                    self.misses += 1
+                todo.setdefault(s, []).append(i)
+        if todo:
+            subjects = list(todo)
+            keys = [(s, days, recent, version) for s in subjects]
+            versions = [self._versions.get(s, 0) for s in subjects]  # before computing: later inserts invalidate
+            generation = self._generation
+            futures = [asyncio.get_running_loop().create_future() for _ in keys]
+            for key, fut in zip(keys, futures):
+                self._inflight[key] = fut
+            try:
+                values = await compute_forecasts([(s, days, recent) for s in subjects])
+            except asyncio.CancelledError:
+                for fut in futures:
+                    fut.cancel()
+                raise
+            except Exception as e:
+                for fut in futures:
+                    fut.set_exception(e)
+                    fut.exception()  # retrieved: waiters get it, nobody else has to
+                raise
+            finally:
+                for key in keys:
+                    self._inflight.pop(key, None)
+            stored_version = model_version()  # the forecaster is loaded by now
+            for s, fut, value, v in zip(subjects, futures, values, versions):
+                fut.set_result(value)
+                self._store((s, days, recent, stored_version), value, v, generation)
+                for i in todo[s]:
+                    out[i] = value
+        for i, fut in waiting.items():
+            out[i] = await asyncio.shield(fut)
+        return out
+
+    async def get(self, subject_id: Optional[str], days: int = 3, recent: int = 60) -> Optional[List[float]]:
+        return (await self.get_many([subject_id], days, recent))[0]
+
+    # ---- background refresh ----
+
+    async def refresh(self) -> int:
+        """Recompute the cached forecasts of subjects written since the last run -> entries refreshed."""
+        dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        version = model_version()
+        groups: Dict[Tuple[int, int], List[Optional[str]]] = {}
+        for (s, days, recent, v), entry in list(self._entries.items()):
+            if s in dirty and v == version and entry.version != self._versions.get(s, 0):
+                groups.setdefault((days, recent), []).append(s)
+        refreshed = 0
+        lags = {}
+        for (days, recent), subjects in groups.items():
+            versions = [self._versions.get(s, 0) for s in subjects]
+            generation = self._generation
+            values = await compute_forecasts([(s, days, recent) for s in subjects])
+            for s, value, v in zip(subjects, values, versions):
+                key = (s, days, recent, version)
+                if key in self._entries:  # not evicted meanwhile
+                    self._store(key, value, v, generation)
+                    refreshed += 1
+                    lags[s] = time.monotonic() - dirty[s]
+        # write -> refreshed forecast delay, per refreshed subject
+        self.refresh_lag_s_total += sum(lags.values())
+        self.refresh_lag_s_max = max([self.refresh_lag_s_max, *lags.values()])
+        self.refreshed_subjects += len(lags)
+        self.refreshes += 1
+        self.refreshed += refreshed
+        return refreshed
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Run refresh() every FORECAST_REFRESH_INTERVAL_S on the running loop; None when off."""
+        if not self.enabled or self.refresh_interval_s <= 0:
+            return None
+
+        async def run():
+            while True:
+                await asyncio.sleep(self.refresh_interval_s)
+                try:
+                    await self.refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self.refresh_errors += 1
+                    log.exception("forecast refresh failed")
+
+        return asyncio.get_running_loop().create_task(run())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_served_s_avg": round(self.stale_s_total / self.stale_hits, 3) if self.stale_hits else 0.0,
+            "stale_served_s_max": round(self.stale_s_max, 3),
+            "refresh_interval_s": self.refresh_interval_s,
+            "max_stale_s": self.max_stale_s,
+            "refreshes": self.refreshes,
+            "refreshed": self.refreshed,
+            "refresh_errors": self.refresh_errors,
+            "refresh_lag_s_avg": round(self.refresh_lag_s_total / self.refreshed_subjects, 3) if self.refreshed_subjects else 0.0,
+            "refresh_lag_s_max": round(self.refresh_lag_s_max, 3),
+            "dirty_subjects": len(self._dirty),
+        }
+
+
+forecast_cache = ForecastCache()
@@ -1,58 +1,163 @@
 # backend/app/services/forecast_engine.py
 """
 Forecast engine service.
-Wraps loading of forecasting artifacts and exposes a single `forecast(days)` function.
+Wraps loading of forecasting artifacts and exposes `forecast_batch(series, days)`,
+which forecasts many subjects' daily score series at once.
 Place at: predictive-safety/backend/app/services/forecast_engine.py
+
+Forecasts are linear extrapolations of the series unless FORECAST_MODEL=lstm
+opts in to the trained LSTM (experiments/forecast_model.pt). Even then, the
+LSTM is only used:
+ - if it beats both a last-value and a linear forecast on the held-out tail of
+   its training data (data/risk_history.csv), checked on load and on every
+   reload; a model that fails the check is not served;
+ - for series of at least seq_len days. Shorter series are extrapolated
+   linearly rather than padded with days of zero risk.
+
+Configured via env:
+ - FORECAST_MODEL: "linear" (default) or "lstm"
 """
+import csv
 import os
+import hashlib
 import joblib
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from app.core.model_registry import registry
+
+FORECAST_MODEL = os.getenv("FORECAST_MODEL", "linear").lower()
 
 BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 EXP_DIR = os.path.join(BASE, "experiments")
 MODEL_PATH = os.path.join(EXP_DIR, "forecast_model.pt")
 PREPROC_PATH = os.path.join(EXP_DIR, "forecast_preproc.joblib")
+# training series; its last HOLDOUT_FRACTION of windows is train_forecast.py's validation split
+HOLDOUT_CSV = os.path.join(BASE, "data", "risk_history.csv")
+HOLDOUT_FRACTION = 0.15
+
+
+def _build_lstm_class():
+    import torch
+
+    # reconstruct LSTM same as training
+    class LSTMForecaster(torch.nn.Module):
+        def __init__(self, input_dim, hidden_dim=128, num_layers=2, horizon=3, n_classes=1, dropout=0.2):
+            super().__init__()
+            self.lstm = torch.nn.LSTM(input_dim, hidden_dim, num_layers, batch_first=True, dropout=dropout)
+            self.head = torch.nn.Sequential(
+                torch.nn.Linear(hidden_dim, max(16, hidden_dim // 2)),
+                torch.nn.ReLU(),
+                torch.nn.Linear(max(16, hidden_dim // 2), horizon * n_classes)
+            )
+            self.horizon = horizon
+            self.n_classes = n_classes
+        def forward(self, x):
+            out, _ = self.lstm(x)
+            last = out[:, -1, :]
+            logits = self.head(last)
+            logits = logits.view(-1, self.horizon, self.n_classes)
+            return logits
+
+    return LSTMForecaster
+
+
+class ForecastModel:
+    """A loaded LSTM forecaster, its preprocessing artifact and version tag."""
+
+    def __init__(self, model, preproc, version: str):
+        self.model = model
+        self.preproc = preproc
+        self.version = version
+
+
+def load_artifacts() -> Optional[ForecastModel]:
+    """Load the LSTM forecaster, unchecked; torch is only imported here, on first use."""
+    if not os.path.exists(PREPROC_PATH) or not os.path.exists(MODEL_PATH):
+        return None
+    import torch
+    preproc = joblib.load(PREPROC_PATH)
+    state = torch.load(MODEL_PATH, map_location=torch.device("cpu"))
+    meta = state.get("meta", {})
+    input_dim = int(preproc.get("feat_dim", 1)) if isinstance(preproc, dict) else 1
+    hidden_dim = int(meta.get("hidden_dim", 128))
+    num_layers = int(meta.get("num_layers", 2))
+    horizon = int(meta.get("horizon", 3))
+    n_classes = int(meta.get("n_classes", 1)) if meta.get("n_classes") else 1
+    model = _build_lstm_class()(input_dim=input_dim, hidden_dim=hidden_dim, num_layers=num_layers, horizon=horizon, n_classes=n_classes)
+    model.load_state_dict(state["model_state_dict"])
+    model.eval()
+    with open(MODEL_PATH, "rb") as f:
+        version = "lstm-" + hashlib.sha256(f.read()).hexdigest()[:12]
+    return ForecastModel(model, preproc, version)
+
+
+def _load_forecaster() -> Optional[ForecastModel]:
+    loaded = load_artifacts()
+    if loaded is not None:
+        # a model that fails the check is not served (the registry records the error)
+        _validate_forecaster(loaded)
+    return loaded
+
+
+def holdout_errors(loaded: ForecastModel, path: str = HOLDOUT_CSV) -> Optional[Dict[str, float]]:
+    """
+    Mean squared error of the LSTM, a last-value and a linear forecast of the
+    next `horizon` scores over the held-out windows of the training series (the
+    last HOLDOUT_FRACTION of its seq_len windows); None without them.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="") as f:
+        y = np.array([float(r["risk_score"]) for r in csv.DictReader(f) if r.get("risk_score") not in (None, "")])
+    preproc = loaded.preproc if isinstance(loaded.preproc, dict) else {}
+    seq_len = int(preproc.get("seq_len", 10))
+    horizon = int(preproc.get("horizon", 3))
+    n = len(y) - seq_len - horizon + 1
+    starts = range(int(n * (1 - HOLDOUT_FRACTION)), n)
+    if not starts:
+        return None
+    windows = [y[i:i + seq_len].tolist() for i in starts]
+    target = np.array([y[i + seq_len:i + seq_len + horizon] for i in starts])
+    forecasts = {
+        "lstm": _lstm_forecast(loaded, windows, horizon),
+        "last_value": np.array([[w[-1]] * horizon for w in windows]),
+        "linear": np.array([linear_extrapolate(w, horizon) for w in windows]),
+    }
+    return {name: float(((p - target) ** 2).mean()) for name, p in forecasts.items()}
 
-_model = None
-_preproc = None
-
-try:
-    if os.path.exists(PREPROC_PATH):
-        _preproc = joblib.load(PREPROC_PATH)
-    if os.path.exists(MODEL_PATH):
-        import torch
-        state = torch.load(MODEL_PATH, map_location=torch.device("cpu"))
-        meta = state.get("meta", {})
-        # reconstruct LSTM same as training
-        class LSTMForecaster(torch.nn.Module):
-            def __init__(self, input_dim, hidden_dim=128, num_layers=2, horizon=3, n_classes=1, dropout=0.2):
-                super().__init__()
-                self.lstm = torch.nn.LSTM(input_dim, hidden_dim, num_layers, batch_first=True, dropout=dropout)
-                self.head = torch.nn.Sequential(
-                    torch.nn.Linear(hidden_dim, max(16, hidden_dim // 2)),
-                    torch.nn.ReLU(),
-                    torch.nn.Linear(max(16, hidden_dim // 2), horizon * n_classes)
-                )
-                self.horizon = horizon
-                self.n_classes = n_classes
-            def forward(self, x):
-                out, _ = self.lstm(x)
-                last = out[:, -1, :]
-                logits = self.head(last)
-                logits = logits.view(-1, self.horizon, self.n_classes)
-                return logits
-
-        input_dim = int(_preproc.get("feat_dim", 1)) if isinstance(_preproc, dict) else 1
-        hidden_dim = int(meta.get("hidden_dim", 128))
-        num_layers = int(meta.get("num_layers", 2))
-        horizon = int(meta.get("horizon", 3))
-        n_classes = int(meta.get("n_classes", 1)) if meta.get("n_classes") else 1
-        _model = LSTMForecaster(input_dim=input_dim, hidden_dim=hidden_dim, num_layers=num_layers, horizon=horizon, n_classes=n_classes)
-        _model.load_state_dict(state["model_state_dict"]) 
-        _model.eval()
-except Exception:
-    _model = None
+
+def _validate_forecaster(loaded: ForecastModel):
+    """Reject a forecaster that is unusable or forecasts worse than the baselines."""
+    import torch
+    preproc = loaded.preproc if isinstance(loaded.preproc, dict) else {}
+    seq = torch.zeros(1, int(preproc.get("seq_len", 10)), int(preproc.get("feat_dim", 1)))
+    with torch.no_grad():
+        out = loaded.model(seq)
+    if not torch.isfinite(out).all():
+        raise ValueError("smoke forecast returned non-finite values")
+    errors = holdout_errors(loaded)
+    if errors is not None and errors["lstm"] >= min(errors["last_value"], errors["linear"]):
+        raise ValueError("held-out MSE %.4f does not beat last-value %.4f / linear %.4f"
+                         % (errors["lstm"], errors["last_value"], errors["linear"]))
+
+
+registry.register("forecast_lstm", _load_forecaster, validate=_validate_forecaster,
+                  warm=FORECAST_MODEL == "lstm")
+
+
+def _forecaster() -> Optional[ForecastModel]:
+    return registry.get("forecast_lstm") if FORECAST_MODEL == "lstm" else None
+
+
+def model_version() -> Optional[str]:
+    """Version of the forecaster serving forecasts ("linear" without one); None until loaded."""
+    if FORECAST_MODEL != "lstm":
+        return "linear"
+    if not registry.is_loaded("forecast_lstm"):
+        return None
+    loaded = registry.get("forecast_lstm")
+    return loaded.version if loaded is not None else "linear"
 
 
 def score_to_level(s: float) -> str:
@@ -66,62 +171,95 @@ def score_to_level(s: float) -> str:
     return "critical"
 
 
-def linear_extrapolate(series: List[float], days: int = 3) -> List[float]:
+def linear_extrapolate(series: List[float], days: int = 3, halflife: float = 0.0) -> List[float]:
+    """
+    Least-squares line through the series, extrapolated `days` steps and clipped
+    to [0, 1]. halflife > 0 weights each point by 0.5 ** (age / halflife), newest
+    age 0. services/trend.py maintains the same fit incrementally.
+    """
     if len(series) < 2:
-        return [float(series[-1]) if series else 0.0] * days
+        return [float(series[-1]) if len(series) else 0.0] * days
     x = np.arange(len(series))
     y = np.array(series)
-    coeffs = np.polyfit(x, y, deg=1)
+    w = np.sqrt(0.5 ** ((len(series) - 1 - x) / halflife)) if halflife > 0 else None
+    coeffs = np.polyfit(x, y, deg=1, w=w)
     slope, intercept = coeffs[0], coeffs[1]
-    preds = [float(intercept + slope * (len(series) - 1 + d)) for d in range(1, days + 1)]
-    preds = [max(0.0, min(1.0, p)) for p in preds]
-    return preds
+    preds = intercept + slope * (len(series) - 1 + np.arange(1, days + 1))
+    return np.clip(preds, 0.0, 1.0).tolist()
 
 
-def forecast_from_history(history: List[Dict[str, Any]], days: int = 3) -> List[Dict[str, Any]]:
-    series = [float(h.get("risk_score", 0.0)) for h in history if h.get("risk_score") is not None]
-    if not series:
-        return [{"step": i+1, "score": 0.0, "risk_level": score_to_level(0.0)} for i in range(days)]
-
-    # model-based
-    if _model is not None and _preproc is not None:
+def _lstm_forecast(loaded: ForecastModel, series: List[List[float]], days: int) -> np.ndarray:
+    """
+    (len(series), days) forecasts of many series with one forward pass per
+    `horizon` steps: each series' last seq_len values (every series needs that
+    many) form a row of one (N, seq_len, 1) batch; beyond the model's horizon
+    its own predictions are fed back in.
+    """
+    import torch
+    preproc = loaded.preproc if isinstance(loaded.preproc, dict) else {}
+    seq_len = int(preproc.get("seq_len", 10))
+    if int(preproc.get("feat_dim", 1)) != 1:
+        raise ValueError("only single-feature forecasters are supported")
+    scaler = preproc.get("scaler")
+    if any(len(vals) < seq_len for vals in series):
+        raise ValueError(f"series shorter than seq_len={seq_len}")
+    x = np.array([vals[-seq_len:] for vals in series], np.float32)
+    if scaler is not None:
+        # the model was trained on scaled scores
+        x = scaler.transform(x.reshape(-1, 1)).reshape(x.shape).astype(np.float32)
+    steps = []
+    while sum(s.shape[1] for s in steps) < days:
+        with torch.no_grad():
+            out = loaded.model(torch.from_numpy(x[:, :, None])).cpu().numpy()
+        if out.ndim == 3 and out.shape[-1] > 1:
+            probs = np.exp(out) / np.sum(np.exp(out), axis=-1, keepdims=True)
+            out = (probs * np.arange(probs.shape[-1])).sum(axis=-1)
+        out = out.reshape(len(series), -1).astype(np.float32)
+        steps.append(out)
+        x = np.concatenate([x, out], axis=1)[:, -seq_len:]
+    preds = np.concatenate(steps, axis=1)[:, :days]
+    if scaler is not None:
         try:
-            import torch
-            seq_len = int(_preproc.get("seq_len", 10))
-            feat_dim = int(_preproc.get("feat_dim", 1))
-            last_seq = _preproc.get("last_seq") if isinstance(_preproc, dict) else None
-            if last_seq is not None:
-                seq = np.array(last_seq).reshape(1, seq_len, feat_dim).astype(np.float32)
-            else:
-                vals = series[-seq_len:]
-                if len(vals) < seq_len:
-                    vals = [0.0] * (seq_len - len(vals)) + vals
-                seq = np.array(vals).reshape(1, seq_len, 1).astype(np.float32)
-            inp = torch.tensor(seq, dtype=torch.float32)
-            with torch.no_grad():
-                out = _model(inp).cpu().numpy()
-            if out.ndim == 3 and out.shape[-1] == 1:
-                preds = out.flatten().tolist()[:days]
-            elif out.ndim == 3 and out.shape[-1] > 1:
-                probs = np.exp(out) / np.sum(np.exp(out), axis=-1, keepdims=True)
-                class_idx = np.arange(probs.shape[-1])
-                preds = (probs * class_idx).sum(axis=-1).flatten().tolist()[:days]
-            else:
-                preds = out.flatten().tolist()[:days]
-            if isinstance(_preproc, dict) and _preproc.get("scaler") is not None:
-                try:
-                    scaler = _preproc["scaler"]
-                    denorm = [float(scaler.inverse_transform([[p]])[0][0]) for p in preds]
-                    preds = [max(0.0, min(1.0, float(d))) for d in denorm]
-                except Exception:
-                    preds = [max(0.0, min(1.0, float(p))) for p in preds]
-            else:
-                preds = [max(0.0, min(1.0, float(p))) for p in preds]
-            out = [{"step": i+1, "score": float(p), "risk_level": score_to_level(p)} for i, p in enumerate(preds[:days])]
-            return out
+            preds = scaler.inverse_transform(preds.reshape(-1, 1)).reshape(preds.shape)
         except Exception:
             pass
+    return np.clip(preds, 0.0, 1.0)
+
+
+def forecast_batch(series: List[List[float]], days: int = 3, halflife: float = 0.0) -> List[List[float]]:
+    """
+    Forecast the next `days` daily scores of many series at once (e.g. one per
+    subject): series of at least seq_len days with the LSTM when one is served
+    (one batch), the rest -- or all, without a forecaster or if it fails -- by
+    linear extrapolation (weighted with `halflife`). Empty series forecast 0.0.
+    """
+    out = [[0.0] * days for _ in series]
+    if days <= 0:
+        return out
+    pending = [i for i, s in enumerate(series) if len(s)]
+    loaded = _forecaster() if pending else None
+    if loaded is not None:
+        preproc = loaded.preproc if isinstance(loaded.preproc, dict) else {}
+        seq_len = int(preproc.get("seq_len", 10))
+        long = [i for i in pending if len(series[i]) >= seq_len]
+        if long:
+            try:
+                preds = _lstm_forecast(loaded, [list(series[i]) for i in long], days).tolist()
+            except Exception:
+                preds = None
+            if preds is not None:
+                for i, p in zip(long, preds):
+                    out[i] = [float(v) for v in p]
+                pending = [i for i in pending if len(series[i]) < seq_len]
+    for i in pending:
+        out[i] = [float(v) for v in linear_extrapolate(list(series[i]), days, halflife)]
+    return out
+
 
-    # fallback
-    preds = linear_extrapolate(series, days)
+def forecast_steps(preds: List[float]) -> List[Dict[str, Any]]:
     return [{"step": i+1, "score": float(p), "risk_level": score_to_level(p)} for i, p in enumerate(preds)]
+
+
+def forecast_from_history(history: List[Dict[str, Any]], days: int = 3) -> List[Dict[str, Any]]:
+    series = [float(h.get("risk_score", 0.0)) for h in history if h.get("risk_score") is not None]
+    return forecast_steps(forecast_batch([series], days)[0])
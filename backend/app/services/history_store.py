@@ -0,0 +1,408 @@
+# backend/app/services/history_store.py
+"""
+In-process store of the most recent predictions per subject.
+
+Each subject's last HISTORY_STORE_SIZE predictions are kept in fixed-size NumPy
+ring buffers (timestamp, risk_score, risk level, label probabilities), so
+per-subject stats and forecast reads are array arithmetic on a few KB instead
+of a database range scan and JSON decoding of every row. One more ring (key
+None) holds the latest predictions of all subjects, for the global stats
+timeline.
+
+A subject's ring is loaded from the database on its first read (its latest rows,
+one index range scan), and a startup task preloads the most recently active
+subjects. After that crud's insert functions append every committed row to the
+rings already loaded (write-through). Rings keep each row's id, so a row a load
+already read from the database is not appended again when its write-through
+arrives later. At most HISTORY_STORE_SUBJECTS rings are kept, least recently
+used evicted first.
+
+A ring only answers when it provably holds every row the query needs: all rows
+newer than its covered_after timestamp (the newest row it ever dropped or did
+not load) are in it. Otherwise the read returns None and the caller queries the
+database, so results do not depend on what is cached. Label probabilities are
+stored as float32, the precision the models produce them in.
+
+The store only sees inserts made by its own process, so with several API
+workers (or any other writer) it would serve stale results. It is therefore
+off by default; set HISTORY_STORE_SIZE only when a single process writes.
+
+Configured via env:
+ - HISTORY_STORE_SIZE: predictions kept per subject (default 0: store disabled; e.g. 1024)
+ - HISTORY_STORE_SUBJECTS: max subjects kept (default 2000)
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.models_api import LABELS, RISK_LEVELS
+from app.db import AsyncSessionLocal
+from app.models_db import RiskHistory
+from app.rollups import AGG_COLUMNS, utc
+
+log = logging.getLogger(__name__)
+
+STORE_SIZE = int(os.getenv("HISTORY_STORE_SIZE", "0"))
+STORE_SUBJECTS = int(os.getenv("HISTORY_STORE_SUBJECTS", "2000"))
+WARM_BATCH = 20  # subjects per query when preloading
+
+_US = 1_000_000
+_DAY_US = 86400 * _US
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NEVER = np.iinfo(np.int64).min  # covered_after of a ring that holds all of its subject's rows
+_LEVEL_INDEX = {level: i for i, level in enumerate(RISK_LEVELS)}
+_NO_LABELS = [float("nan")] * len(LABELS)
+
+
+def _to_us(ts: datetime) -> int:
+    delta = utc(ts) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * _US + delta.microseconds
+
+
+def _from_us(us: int) -> datetime:
+    return datetime.fromtimestamp(us // _US, timezone.utc).replace(microsecond=int(us % _US))
+
+
+def _row(row_id, timestamp, risk_score, risk_level, label_probs) -> Optional[Tuple[int, int, float, int, List[float]]]:
+    """One prediction as ring values; None if it cannot be represented (unknown risk level)."""
+    level = _LEVEL_INDEX.get(risk_level)
+    if level is None:
+        return None
+    if isinstance(label_probs, dict) and label_probs.get(LABELS[0]) is not None:
+        labels = [float(label_probs.get(label) or 0.0) for label in LABELS]
+    else:
+        labels = _NO_LABELS  # NaN: no label_probs, as rollups' n_labeled
+    return int(row_id), _to_us(timestamp), float(risk_score), level, labels
+
+
+class Ring:
+    """The last `capacity` predictions of one subject, in insertion order."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ids = np.zeros(capacity, np.int64)  # risk_history.id
+        self.ts = np.zeros(capacity, np.int64)  # microseconds since the epoch, UTC
+        self.score = np.zeros(capacity, np.float64)
+        self.level = np.zeros(capacity, np.int8)  # index into RISK_LEVELS
+        self.labels = np.zeros((capacity, len(LABELS)), np.float32)
+        self.size = 0
+        self.head = 0
+        self.covered_after = _NEVER
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.ts.nbytes + self.score.nbytes + self.level.nbytes + self.labels.nbytes
+
+    def append(self, row: Tuple[int, int, float, int, List[float]]) -> None:
+        i = self.head
+        if self.size == self.capacity:
+            self.covered_after = max(self.covered_after, int(self.ts[i]))
+        else:
+            self.size += 1
+        self.ids[i], self.ts[i], self.score[i], self.level[i], self.labels[i] = row
+        self.head = (i + 1) % self.capacity
+
+    def _order(self):
+        return np.roll(np.arange(self.size), -self.head) if self.size == self.capacity else slice(0, self.size)
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(ts, score, level, labels) of the rows held, oldest insert first."""
+        order = self._order()
+        return self.ts[order], self.score[order], self.level[order], self.labels[order]
+
+    def holds(self, row_id: int) -> bool:
+        return bool((self.ids[:self.size] == row_id).any())
+
+    def covers(self, since_us: Optional[int]) -> bool:
+        """Whether every row at or after since_us (None: every row) is held."""
+        if since_us is None:
+            return self.covered_after == _NEVER
+        return since_us > self.covered_after
+
+    def drop_before(self, cutoff_us: int) -> None:
+        order = self._order()
+        ids, ts, score, level, labels = (a[order] for a in (self.ids, self.ts, self.score, self.level, self.labels))
+        keep = ts >= cutoff_us
+        covered_after = self.covered_after
+        self.size = self.head = 0
+        for row in zip(ids[keep], ts[keep], score[keep], level[keep], labels[keep]):
+            self.append(row)
+        self.covered_after = covered_after
+
+
+def _bounds_us(since: Optional[datetime], until: Optional[datetime]) -> Tuple[Optional[int], Optional[int]]:
+    return (_to_us(since) if since is not None else None), (_to_us(until) if until is not None else None)
+
+
+def _in_range(ts: np.ndarray, lo: Optional[int], hi: Optional[int]) -> np.ndarray:
+    mask = np.ones(len(ts), bool)
+    if lo is not None:
+        mask &= ts >= lo
+    if hi is not None:
+        mask &= ts < hi
+    return mask
+
+
+class HistoryStore:
+    def __init__(self, capacity: int = STORE_SIZE, max_subjects: int = STORE_SUBJECTS):
+        self.capacity = max(0, capacity)
+        self.max_subjects = max(1, max_subjects)
+        self.enabled = self.capacity > 0
+        self._rings: "OrderedDict[Optional[str], Ring]" = OrderedDict()
+        self._loading: Dict[Optional[str], List[Tuple]] = {}  # key -> rows appended while it loads
+        self.hits = 0
+        self.misses = 0  # reads a ring could not answer (not loaded yet, or not covering the range)
+        self.loads = 0
+        self.evictions = 0
+
+    # ---- writes ----
+
+    def append_rows(self, values: Sequence[Dict[str, Any]]) -> None:
+        """Write-through of committed risk_history rows (crud's row values, with their "id")."""
+        if not self.enabled:
+            return
+        for v in values:
+            row = _row(v["id"], v["timestamp"], v["risk_score"], v["risk_level"], v.get("label_probs"))
+            for key in (None, v.get("subject_id")) if v.get("subject_id") is not None else (None,):
+                if key in self._loading:
+                    self._loading[key].append(row)
+                elif key in self._rings:
+                    ring = self._rings[key]
+                    if row is None:
+                        del self._rings[key]  # reloaded from the database on its next read
+                    elif row[1] > ring.covered_after and not ring.holds(row[0]):
+                        # a load that ran after the commit may already hold the row;
+                        # one at or before covered_after is outside what the ring covers
+                        ring.append(row)
+
+    def clear(self) -> None:
+        self._rings.clear()
+        for pending in self._loading.values():
+            pending.clear()
+
+    def drop_before(self, cutoff: datetime) -> None:
+        """Forget rows older than cutoff (after retention removed them from the database)."""
+        cutoff_us = _to_us(cutoff)
+        for ring in self._rings.values():
+            ring.drop_before(cutoff_us)
+
+    # ---- loading ----
+
+    def _query(self, keys: List[Optional[str]]):
+        t = RiskHistory.__table__
+        cols = (t.c.id, t.c.timestamp, t.c.risk_score, t.c.risk_level, t.c.label_probs)
+        if keys == [None]:
+            return select(*cols).order_by(t.c.timestamp.desc(), t.c.id.desc()).limit(self.capacity + 1)
+        if len(keys) == 1:
+            return (select(t.c.subject_id, *cols).where(t.c.subject_id == keys[0])
+                    .order_by(t.c.timestamp.desc(), t.c.id.desc()).limit(self.capacity + 1))
+        # latest capacity + 1 rows of each subject, one range scan per subject
+        rn = func.row_number().over(partition_by=t.c.subject_id, order_by=(t.c.timestamp.desc(), t.c.id.desc()))
+        inner = select(t.c.subject_id, *cols, rn.label("rn")).where(t.c.subject_id.in_(keys)).subquery()
+        return select(*(inner.c[c.name] for c in (t.c.subject_id, *cols))).where(inner.c.rn <= self.capacity + 1)
+
+    async def _load(self, keys: List[Optional[str]]) -> None:
+        keys = [k for k in keys if k not in self._rings and k not in self._loading]
+        if not keys:
+            return
+        for key in keys:
+            self._loading[key] = []
+        try:
+            async with AsyncSessionLocal() as session:
+                result = (await session.execute(self._query(keys))).mappings().all()
+            rows: Dict[Optional[str], List] = {key: [] for key in keys}
+            for r in result:
+                rows[r.get("subject_id") if keys != [None] else None].append(r)
+            for key in keys:
+                ring = self._build(rows[key], self._loading[key])
+                if ring is not None:
+                    self._rings[key] = ring
+                    self.loads += 1
+        finally:
+            for key in keys:
+                self._loading.pop(key, None)
+        while len(self._rings) > self.max_subjects + 1:  # + the global ring
+            oldest = next(k for k in self._rings if k is not None)
+            del self._rings[oldest]
+            self.evictions += 1
+
+    def _build(self, db_rows: List, pending: List[Tuple]) -> Optional[Ring]:
+        db_rows = sorted(db_rows, key=lambda r: utc(r["timestamp"]))  # oldest first
+        seen = {r["id"] for r in db_rows}
+        covered_after = _NEVER
+        if len(db_rows) > self.capacity:
+            covered_after = _to_us(db_rows[0]["timestamp"])  # newest row not loaded
+            db_rows = db_rows[1:]
+        rows = [_row(r["id"], r["timestamp"], r["risk_score"], r["risk_level"], r["label_probs"]) for r in db_rows]
+        # committed during the load; skip the ones the query already saw
+        rows += [row for row in pending if row is None or row[0] not in seen]
+        if any(row is None for row in rows):
+            return None
+        if len(rows) > self.capacity:
+            covered_after = max(covered_after, max(row[1] for row in rows[:-self.capacity]))
+            rows = rows[-self.capacity:]
+        ring = Ring(self.capacity)
+        k = len(rows)
+        if k:
+            ids, ts, score, level, labels = zip(*rows)
+            ring.ids[:k], ring.ts[:k], ring.score[:k], ring.level[:k], ring.labels[:k] = ids, ts, score, level, labels
+        ring.size, ring.head = k, k % self.capacity
+        ring.covered_after = covered_after
+        return ring
+
+    async def ring(self, key: Optional[str]) -> Optional[Ring]:
+        """The ring of subject `key` (None: all subjects), loading it on first use."""
+        if not self.enabled:
+            return None
+        if key not in self._rings:
+            if key in self._loading:
+                return None  # another read is loading it; this one uses the database
+            await self._load([key])
+        ring = self._rings.get(key)
+        if ring is not None:
+            self._rings.move_to_end(key)
+        return ring
+
+    async def warm(self) -> int:
+        """Preload the global ring and the most recently active subjects -> rings loaded."""
+        if not self.enabled:
+            return 0
+        t = RiskHistory.__table__
+        last = func.max(t.c.timestamp)
+        async with AsyncSessionLocal() as session:
+            subjects = (await session.execute(
+                select(t.c.subject_id).where(t.c.subject_id.isnot(None)).group_by(t.c.subject_id)
+                .order_by(last.desc()).limit(self.max_subjects))).scalars().all()
+        await self._load([None])
+        # least recent first, so the LRU order ends with the most active
+        subjects = subjects[::-1]
+        for i in range(0, len(subjects), WARM_BATCH):
+            await self._load(subjects[i:i + WARM_BATCH])
+        return len(self._rings)
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Preload in the background on the running loop; None when disabled."""
+        if not self.enabled:
+            return None
+
+        async def run():
+            try:
+                n = await self.warm()
+                log.info("history store preloaded %d rings", n)
+            except Exception:
+                log.exception("history store preload failed; rings load on first read")
+
+        return asyncio.get_running_loop().create_task(run())
+
+    # ---- reads (None: not answerable from memory, query the database) ----
+
+    def _answer(self, result):
+        if not self.enabled:
+            return None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    async def aggregate(self, key: Optional[str], since: Optional[datetime] = None,
+                        until: Optional[datetime] = None) -> Optional[Dict[datetime, Dict[str, float]]]:
+        """rollups.aggregate_range(since, until, subject_id=key), from memory."""
+        ring = await self.ring(key)
+        lo, hi = _bounds_us(since, until)
+        if ring is None or not ring.covers(lo):
+            return self._answer(None)
+        ts, score, level, labels = ring.columns()
+        mask = _in_range(ts, lo, hi)
+        ts, score, level, labels = ts[mask], score[mask], level[mask], labels[mask]
+        days, inv = np.unique(ts // _DAY_US, return_inverse=True)
+        k = len(days)
+        agg = {"n": np.bincount(inv, minlength=k).astype(float),
+               "score_sum": np.bincount(inv, weights=score, minlength=k)}
+        for i, lv in enumerate(RISK_LEVELS):
+            agg[f"n_{lv}"] = np.bincount(inv, weights=level == i, minlength=k)
+        labeled = ~np.isnan(labels[:, 0])
+        agg["n_labeled"] = np.bincount(inv, weights=labeled, minlength=k)
+        for j, label in enumerate(LABELS):
+            agg[f"sum_{label}"] = np.bincount(inv[labeled], weights=labels[labeled, j].astype(np.float64), minlength=k)
+        score_max = np.zeros(k)
+        np.maximum.at(score_max, inv, score)
+        agg["score_max"] = score_max
+        out = {}
+        for d in range(k):
+            out[_from_us(int(days[d]) * _DAY_US)] = {c: float(agg[c][d]) for c in AGG_COLUMNS}
+        return self._answer(out)
+
+    async def timeline(self, key: Optional[str], limit: int, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Optional[List[Dict[str, Any]]]:
+        """The latest `limit` predictions in [since, until), oldest first, as get_stats' timeline."""
+        ring = await self.ring(key)
+        if ring is None:
+            return self._answer(None)
+        lo, hi = _bounds_us(since, until)
+        ts, score, level, _ = ring.columns()
+        mask = _in_range(ts, lo, hi)
+        ts, score, level = ts[mask], score[mask], level[mask]
+        order = np.argsort(ts, kind="stable")[-limit:] if limit > 0 else np.array([], np.int64)
+        # exact if the range is fully held, or the limit-th newest row is newer than anything missing
+        if not (ring.covers(lo) or (len(order) == limit and limit > 0 and ts[order[0]] > ring.covered_after)):
+            return self._answer(None)
+        return self._answer([
+            {"timestamp": _from_us(int(ts[i])).isoformat(), "score": float(score[i]) * 100, "level": RISK_LEVELS[level[i]]}
+            for i in order
+        ])
+
+    async def daily_totals(self, key: Optional[str], limit: int,
+                           until: Optional[datetime] = None) -> Optional[List[Tuple[datetime, float, int]]]:
+        """rollups.daily_totals(limit, until, subject_id=key), from memory."""
+        ring = await self.ring(key)
+        if ring is None:
+            return self._answer(None)
+        _, hi = _bounds_us(None, until)
+        ts, score, _, _ = ring.columns()
+        mask = _in_range(ts, None, hi)
+        days, inv = np.unique(ts[mask] // _DAY_US, return_inverse=True)
+        sums, counts = np.bincount(inv, weights=score[mask]), np.bincount(inv)
+        if not ring.covers(None):
+            # only days that start after the newest missing row are complete
+            full = days * _DAY_US > ring.covered_after
+            if full.sum() < limit:
+                return self._answer(None)
+            days, sums, counts = days[full], sums[full], counts[full]
+        start = max(0, len(days) - limit) if limit > 0 else len(days)
+        return self._answer([(_from_us(int(d) * _DAY_US), float(s), int(n))
+                             for d, s, n in zip(days[start:], sums[start:], counts[start:])])
+
+    async def daily_scores(self, key: Optional[str], limit: int,
+                           until: Optional[datetime] = None) -> Optional[List[Tuple[datetime, float]]]:
+        """rollups.daily_scores(limit, until, subject_id=key), from memory."""
+        totals = await self.daily_totals(key, limit, until)
+        return [(day, s / n) for day, s, n in totals] if totals is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        subjects = sum(1 for k in self._rings if k is not None)
+        nbytes = sum(r.nbytes for r in self._rings.values())
+        reads = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "subjects": subjects,
+            "max_subjects": self.max_subjects,
+            "rows": sum(r.size for r in self._rings.values()),
+            "bytes": nbytes,
+            "bytes_per_ring": Ring(self.capacity).nbytes if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / reads, 4) if reads else 0.0,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+history_store = HistoryStore()
@@ -0,0 +1,129 @@
+# backend/app/services/inference_executor.py
+"""
+Inference executor.
+Runs CPU-bound model calls off the asyncio event loop so a large conversation
+does not block /health, /api/privacy/check and other requests on the worker.
+
+Configured via env:
+ - INFERENCE_EXECUTOR: "thread" (default), "process", or "inline" (run on the loop)
+ - INFERENCE_WORKERS: pool size (default: min(4, cpu count))
+ - INFERENCE_TIMEOUT_S: per-call timeout in seconds (default 30, 0 disables)
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+EXECUTOR_KIND = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "30"))
+
+
+class InferenceTimeout(Exception):
+    """Raised when an inference call does not finish within its timeout."""
+
+
+_executor: Optional[Executor] = None
+_stats = {
+    "in_flight": 0,    # submitted and not yet finished (queued + running)
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "total_wait_ms": 0.0,
+    "total_run_ms": 0.0,
+}
+
+
+def get_executor() -> Optional[Executor]:
+    """Create the pool on first use; None in inline mode."""
+    global _executor
+    if EXECUTOR_KIND == "inline":
+        return None
+    if _executor is None:
+        if EXECUTOR_KIND == "process":
+            _executor = ProcessPoolExecutor(max_workers=WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="inference")
+    return _executor
+
+
+def _timed_call(fn: Callable, args: tuple, submitted: float):
+    # runs inside the worker; returns timings alongside the result so that
+    # accounting also works for process pools
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, started - submitted, time.perf_counter() - started
+
+
+async def run_inference(fn: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Run fn(*args) in the inference pool and await the result.
+    Raises InferenceTimeout if it does not complete within `timeout` seconds
+    (default INFERENCE_TIMEOUT_S). A timed-out call keeps its worker until it returns.
+    """
+    timeout = TIMEOUT_S if timeout is None else timeout
+    executor = get_executor()
+    if executor is None:
+        return fn(*args)
+
+    loop = asyncio.get_running_loop()
+    _stats["in_flight"] += 1
+    submitted = time.perf_counter()
+    fut = loop.run_in_executor(executor, _timed_call, fn, args, submitted)
+    # the pool keeps running a call whose awaiter timed out or was cancelled,
+    # so in-flight accounting follows the pool future, not the awaiter
+    fut.add_done_callback(_on_done)
+    try:
+        result, wait_s, run_s = await asyncio.wait_for(asyncio.shield(fut), timeout or None)
+    except asyncio.TimeoutError:
+        _stats["timed_out"] += 1
+        raise InferenceTimeout(f"inference did not finish within {timeout:.1f}s")
+    _stats["total_wait_ms"] += wait_s * 1000.0
+    _stats["total_run_ms"] += run_s * 1000.0
+    return result
+
+
+def _on_done(fut: asyncio.Future):
+    _stats["in_flight"] -= 1
+    if fut.cancelled() or fut.exception() is not None:
+        _stats["failed"] += 1
+    else:
+        _stats["completed"] += 1
+
+
+def executor_stats() -> Dict[str, Any]:
+    """Pool configuration, in-flight depth and cumulative timings."""
+    done = max(1, _stats["completed"])
+    return {
+        "kind": EXECUTOR_KIND,
+        "workers": WORKERS if EXECUTOR_KIND != "inline" else 0,
+        "timeout_s": TIMEOUT_S,
+        "in_flight": _stats["in_flight"],
+        "queue_depth": max(0, _stats["in_flight"] - WORKERS) if EXECUTOR_KIND != "inline" else 0,
+        "completed": _stats["completed"],
+        "failed": _stats["failed"],
+        "timed_out": _stats["timed_out"],
+        "avg_queue_wait_ms": round(_stats["total_wait_ms"] / done, 3),
+        "avg_run_ms": round(_stats["total_run_ms"] / done, 3),
+    }
+
+
+def recycle_executor():
+    """
+    Replace a process pool with a fresh one (e.g. after a model reload, since
+    workers hold their own copy of the models). Calls already submitted finish
+    on the old pool; thread pools share the parent's models and are kept.
+    """
+    global _executor
+    if EXECUTOR_KIND != "process" or _executor is None:
+        return
+    old, _executor = _executor, None
+    old.shutdown(wait=False)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
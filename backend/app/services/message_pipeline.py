@@ -0,0 +1,115 @@
+# backend/app/services/message_pipeline.py
+"""
+Per-message analysis pipeline behind /api/analyze.
+
+Every message is normalized once and all stages read that one representation,
+instead of the privacy check and the risk model each lowercasing and scanning
+the raw text on their own:
+
+  normalize  utils.fold_text (NFKC folding, invisible characters dropped) and
+             utils.normalize_text (whitespace collapsed), plus a lowercased copy
+  privacy    privacy_scanner findings and redaction, on the normalized text
+             (PAN is case-sensitive, so not on the lowercased copy)
+  keywords   keyword rule hits, on the lowercased copy
+  model      label probabilities from the active backend (cache, cascade,
+             transformer or TF-IDF), fed the normalized text and the keyword
+             hits, so the scorer does not match the rules again
+
+The folding is specific to /api/analyze: /api/predict scores and
+/api/privacy/check scans the text as sent, so a message that only matches once
+folded (full-width digits, a zero-width character inside a keyword) is flagged
+here and not there. Privacy spans index into each message's "normalized" text.
+  risk       risk score and level per message and for the whole batch
+
+Stages run over the whole batch at once; analyze_message wraps one message.
+The normalize, privacy and keyword stages are CPU-bound and run together in the
+inference executor, off the event loop. All messages of one request share a
+single SCAN_BUDGET_MS privacy budget; messages reached after it ran out come
+back with complete=False.
+"""
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.core.keyword_rules import KEYWORD_RULES, match_lowered_batch
+from app.core.models_api import LABELS, map_probs_to_risk, probs_row_to_dict, risk_level_for
+from app.core.privacy_scanner import SCAN_BUDGET_MS, scan
+from app.services.ai_inference import predict_multilabel_with_version_async
+from app.services.inference_executor import run_inference
+from app.utils import fold_text, normalize_text
+
+STAGES = ("normalize", "privacy", "keywords", "model", "risk")
+MAX_MESSAGES = int(os.getenv("ANALYZE_MAX_MESSAGES", "256"))  # most messages one /api/analyze request may carry
+
+
+def _risk(label_probs: Dict[str, float]) -> Dict[str, Any]:
+    score = float(map_probs_to_risk(label_probs)["risk_score"])
+    return {"level": risk_level_for(score), "score": score}
+
+
+def _text_stages(texts: List[str], budget_ms: float) -> Tuple[list, list, np.ndarray, Dict[str, float]]:
+    """
+    normalize, privacy and keywords over texts -> (normalized, privacy, keyword
+    hit matrix, timings_ms). The privacy scans draw on one budget of budget_ms
+    for the whole batch.
+    """
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    normalized = [normalize_text(fold_text(t)) for t in texts]
+    lowered = [t.lower() for t in normalized]
+    t1 = time.perf_counter()
+    timings["normalize"] = round((t1 - t0) * 1000.0, 3)
+
+    deadline = t1 + budget_ms / 1000.0
+    privacy = [scan(t, budget_ms=(deadline - time.perf_counter()) * 1000.0) for t in normalized]
+    t2 = time.perf_counter()
+    timings["privacy"] = round((t2 - t1) * 1000.0, 3)
+
+    hits = match_lowered_batch(lowered)
+    timings["keywords"] = round((time.perf_counter() - t2) * 1000.0, 3)
+    return normalized, privacy, hits, timings
+
+
+async def analyze_messages(texts: List[str]) -> Dict[str, Any]:
+    """
+    Run every stage over texts -> {"model_version", "messages", "summary", "timings_ms"}.
+    messages[i] holds text i's normalized form, privacy result, keyword rule hits,
+    label probabilities and risk; summary aggregates labels (max) and privacy over
+    the batch. timings_ms is the wall time of each stage, in STAGES order.
+    """
+    normalized, privacy, hits, timings = await run_inference(_text_stages, texts, SCAN_BUDGET_MS)
+    t0 = time.perf_counter()
+
+    def lap(stage: str):
+        nonlocal t0
+        now = time.perf_counter()
+        timings[stage] = round((now - t0) * 1000.0, 3)
+        t0 = now
+
+    probs, version = await predict_multilabel_with_version_async(normalized, prenormalized=True, keyword_hits=hits)
+    lap("model")
+
+    keywords = [[KEYWORD_RULES[j]["name"] for j in np.flatnonzero(row)] for row in hits]
+    messages = []
+    for text, found, rules, row in zip(normalized, privacy, keywords, probs):
+        labels = probs_row_to_dict(row)
+        messages.append({"normalized": text, "privacy": found, "keywords": rules,
+                         "labels": labels, "risk": _risk(labels)})
+    aggregated = probs_row_to_dict(probs.max(axis=0) if len(texts) else np.zeros(len(LABELS)))
+    flagged = [m["privacy"] for m in messages if m["privacy"]["flagged"]]
+    summary = {
+        "agg_label_scores": aggregated,
+        "risk": _risk(aggregated),
+        "privacy": {"flagged": bool(flagged), "types": sorted({f["type"] for p in flagged for f in p["findings"]}),
+                    "complete": all(p["complete"] for p in privacy)},
+    }
+    lap("risk")
+    return {"model_version": version, "messages": messages, "summary": summary, "timings_ms": timings}
+
+
+async def analyze_message(text: str) -> Dict[str, Any]:
+    """analyze_messages for a single message -> that message's result plus model_version and timings_ms."""
+    out = await analyze_messages([text])
+    return {**out["messages"][0], "model_version": out["model_version"], "timings_ms": out["timings_ms"]}
@@ -0,0 +1,115 @@
+# backend/app/services/micro_batcher.py
+"""
+Asyncio micro-batcher.
+Concurrent requests submit their messages to a queue; a collector task takes
+the first waiting request, keeps gathering more until MAX_BATCH messages are
+queued or MAX_WAIT_MS has passed, runs one batched call in the inference
+executor and fans each request's rows back to its awaiting future.
+
+While a batch runs, new requests queue up and form the next batch, so batches
+grow with load and a lone request waits at most MAX_WAIT_MS extra. A request
+is never split across batches.
+
+Configured via env:
+ - MICROBATCH_MAX_SIZE: messages per batch (default 32)
+ - MICROBATCH_MAX_WAIT_MS: how long the first request waits for company (default 5)
+"""
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.services.inference_executor import run_inference
+
+MAX_BATCH = int(os.getenv("MICROBATCH_MAX_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    def __init__(self, fn: Callable[[List[str]], Any], max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        """fn(texts) -> (probs, version) runs in the inference executor once per batch."""
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self.batches = 0
+        self.messages = 0
+        self.requests = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._collect())
+
+    async def submit(self, texts: List[str]):
+        """Queue texts for the next batch and await their (probs, version)."""
+        self._ensure_started()
+        fut = self._loop.create_future()
+        await self._queue.put((list(texts), fut))
+        return await fut
+
+    async def _gather(self):
+        first = await self._queue.get()
+        batch, n = [first], len(first[0])
+        deadline = self._loop.time() + self.max_wait_s
+        while n < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            batch.append(item)
+            n += len(item[0])
+        return batch
+
+    async def _collect(self):
+        while True:
+            batch = await self._gather()
+            # requests whose caller gave up while queued are dropped
+            batch = [(texts, fut) for texts, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            flat = [t for texts, _ in batch for t in texts]
+            try:
+                result = await run_inference(self.fn, flat)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.messages += len(flat)
+            self.requests += len(batch)
+            if result is None:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(None)
+                continue
+            probs, version = result
+            offset = 0
+            for texts, fut in batch:
+                rows = np.asarray(probs[offset:offset + len(texts)])
+                offset += len(texts)
+                if not fut.done():
+                    fut.set_result((rows, version))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "messages": self.messages,
+            "avg_batch_messages": round(self.messages / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,91 @@
+# backend/app/services/model_manager.py
+"""
+Model manager.
+Watches the artifacts in experiments/ and hot-reloads a model when its files
+change, so a retrained pipeline can be deployed without restarting the API.
+
+A change is acted on only once the file's (mtime, size) fingerprint has been
+stable for two consecutive polls, so a half-copied artifact is never loaded.
+The reload itself (load -> validate -> smoke prediction -> swap) runs in a
+worker thread through registry.reload(); in-flight requests finish on the
+model they already hold. If validation fails the old model stays live.
+
+MODEL_WATCH_INTERVAL_S env: poll interval in seconds (default 5, 0 disables).
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import models_api, transformer_backend
+from app.core.model_registry import registry
+from app.services import forecast_engine
+from app.services.inference_executor import recycle_executor
+
+log = logging.getLogger(__name__)
+
+WATCH_INTERVAL_S = float(os.getenv("MODEL_WATCH_INTERVAL_S", "5"))
+
+# registry name -> artifact files it is built from
+WATCHED: Dict[str, List[Path]] = {
+    "tfidf": [models_api.TFIDF_PIPE, models_api.TFIDF_COMPILED],
+    "forecast_lstm": [Path(forecast_engine.MODEL_PATH), Path(forecast_engine.PREPROC_PATH)],
+    "transformer": [transformer_backend.MODEL_DIR / f for f in transformer_backend.WEIGHT_FILES]
+                   + [transformer_backend.MODEL_DIR / "label_binarizer.joblib",
+                      transformer_backend.MODEL_DIR / transformer_backend.MANIFEST_FILE],
+}
+
+
+def _fingerprints(paths: List[Path]) -> Tuple[Optional[Tuple[int, int]], ...]:
+    return tuple(models_api.artifact_fingerprint(p) for p in paths)
+
+
+def reload_model(name: str) -> Dict[str, Any]:
+    """Reload one model now (blocking); returns the registry's reload report."""
+    report = registry.reload(name)
+    if report["swapped"]:
+        # process-pool workers hold their own copy of the models
+        recycle_executor()
+        log.info("reloaded model %s -> %s in %.0f ms", name, report["version"], report["ms"])
+    else:
+        log.warning("reload of model %s failed, keeping current: %s", name, report["error"])
+    return report
+
+
+class ArtifactWatcher:
+    def __init__(self, watched: Dict[str, List[Path]] = WATCHED, interval_s: float = WATCH_INTERVAL_S):
+        self.watched = watched
+        self.interval_s = interval_s
+        self._seen = {name: _fingerprints(paths) for name, paths in watched.items()}
+        self._pending: Dict[str, Tuple] = {}
+
+    def poll(self) -> List[str]:
+        """Return the models whose artifacts changed and have settled since the last poll."""
+        due = []
+        for name, paths in self.watched.items():
+            fp = _fingerprints(paths)
+            if fp == self._seen[name]:
+                self._pending.pop(name, None)
+            elif self._pending.get(name) == fp:
+                del self._pending[name]
+                self._seen[name] = fp
+                due.append(name)
+            else:
+                self._pending[name] = fp
+        return due
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            for name in self.poll():
+                # a model nobody has loaded yet will pick up the new files on first use
+                if registry.is_loaded(name):
+                    await asyncio.to_thread(reload_model, name)
+
+
+def start_watcher() -> Optional[asyncio.Task]:
+    """Start polling the artifacts in the background; None when disabled."""
+    if WATCH_INTERVAL_S <= 0:
+        return None
+    return asyncio.create_task(ArtifactWatcher().run())
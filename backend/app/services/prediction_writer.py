@@ -0,0 +1,178 @@
+# backend/app/services/prediction_writer.py
+"""
+Write-behind persistence for prediction records.
+
+With PERSIST_MODE=write_behind, routes hand their RiskHistory record to a
+bounded in-process queue and return without touching the database; a flusher
+task takes up to WRITE_BEHIND_BATCH records at a time (waiting at most
+WRITE_BEHIND_FLUSH_MS after the first) and writes them with one multi-row
+INSERT (crud.insert_predictions). When the queue is full, submit() waits for
+room, so a slow database pushes back on producers instead of growing memory.
+On shutdown, close() stops intake and flushes everything still queued.
+
+Records are timestamped when submitted, not when flushed. Row ids are not
+known at submit time, so routes report "id": null in this mode. Records queued
+when the process dies without a clean shutdown are lost.
+
+Configured via env:
+ - PERSIST_MODE: "sync" (default, insert on the request path) or "write_behind"
+ - WRITE_BEHIND_QUEUE_SIZE: max queued records (default 10000)
+ - WRITE_BEHIND_BATCH: max records per INSERT (default 500)
+ - WRITE_BEHIND_FLUSH_MS: max time a record waits for its batch to fill (default 200)
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.crud import insert_prediction, insert_predictions
+
+log = logging.getLogger(__name__)
+
+PERSIST_MODE = os.getenv("PERSIST_MODE", "sync").lower()
+QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+
+_STOP = object()
+
+
+class PredictionWriter:
+    def __init__(self, mode: str = PERSIST_MODE, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = BATCH_SIZE, flush_ms: float = FLUSH_MS):
+        self.mode = mode
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_s = max(0.0, flush_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.blocked = 0
+        self.flush_ms_total = 0.0
+        self.flush_ms_max = 0.0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the flusher on the running loop (no-op unless PERSIST_MODE=write_behind)."""
+        if self.mode != "write_behind" or self.running:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, record: Dict[str, Any]) -> Optional[int]:
+        """Persist one record: insert now and return its id, or queue it and return None."""
+        if not self.running or self._closing:
+            return await insert_prediction(record)
+        await self._put([record])
+        return None
+
+    async def submit_many(self, records: List[Dict[str, Any]]) -> int:
+        """Persist many records (one INSERT, or queued); returns how many were accepted."""
+        if not records:
+            return 0
+        if not self.running or self._closing:
+            return await insert_predictions(records)
+        await self._put(records)
+        return len(records)
+
+    async def _put(self, records: List[Dict[str, Any]]) -> None:
+        now = datetime.now(timezone.utc)
+        for record in records:
+            if record.get("timestamp") is None:
+                record = {**record, "timestamp": now}
+            if self._queue.full():
+                self.blocked += 1
+            await self._queue.put(record)  # backpressure: waits while the queue is full
+            self.submitted += 1
+
+    async def _gather(self):
+        """-> (batch, stop); stop once close()'s sentinel is reached."""
+        loop = asyncio.get_running_loop()
+        batch: List[Dict[str, Any]] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                if deadline is None:
+                    item = await self._queue.get()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            if deadline is None:
+                deadline = loop.time() + self.flush_s
+        return batch, False
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        t0 = time.perf_counter()
+        try:
+            await insert_predictions(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            log.exception("write-behind flush of %d prediction records failed; dropped", len(batch))
+        ms = (time.perf_counter() - t0) * 1000.0
+        self.flushes += 1
+        self.last_flush_ms = ms
+        self.flush_ms_total += ms
+        self.flush_ms_max = max(self.flush_ms_max, ms)
+
+    async def _run(self):
+        while True:
+            batch, stop = await self._gather()
+            if batch:
+                await self._flush(batch)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        """Stop intake, flush everything still queued, then stop the flusher."""
+        if self._task is None:
+            return
+        self._closing = True  # later submits insert directly
+        # queued behind every accepted record (and producers already waiting for room)
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            # accepted but not yet written: queued plus the batch being gathered/flushed
+            "pending": self.submitted - self.written - self.failed,
+            "batch_size": self.batch_size,
+            "flush_ms": self.flush_s * 1000.0,
+            "submitted": self.submitted,
+            "written": self.written,
+            "failed": self.failed,
+            "blocked_puts": self.blocked,
+            "flushes": self.flushes,
+            "avg_flush_ms": round(self.flush_ms_total / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.flush_ms_max, 3),
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+prediction_writer = PredictionWriter()
@@ -0,0 +1,151 @@
+# backend/app/services/session_store.py
+"""
+Conversation session store.
+Keeps running state per live conversation so that appending messages only
+scores the new ones: the max-pooled label aggregate is updated with
+aggregate_labels_max in O(new messages) instead of re-scoring the whole chat.
+
+Sessions idle longer than SESSION_TTL_S are evicted, and at most SESSION_MAX
+sessions (least recently used first) are kept; each session keeps only the
+last SESSION_MAX_MESSAGES per-message scores, with their text cut to
+SESSION_MAX_TEXT_CHARS. Least recently used sessions are also evicted while the
+cached messages of all sessions take more than about SESSION_MAX_BYTES.
+
+The session routes run on the event loop; the lock covers the store's callers
+in the threadpool (/api/metrics).
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from app.services.ai_inference import aggregate_labels_max, map_to_risk
+
+SESSION_TTL_S = float(os.getenv("SESSION_TTL_S", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+SESSION_MAX_TEXT_CHARS = int(os.getenv("SESSION_MAX_TEXT_CHARS", "2000"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+_MESSAGE_OVERHEAD = 512  # approximate bytes of one cached message besides its text (dicts, label scores)
+
+
+def _message_bytes(message: Dict[str, Any]) -> int:
+    return len(message["text"]) + _MESSAGE_OVERHEAD
+
+
+class ConversationSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created_at = time.time()
+        self.last_access = time.monotonic()
+        self.n_messages = 0
+        self.aggregate: Dict[str, float] = {}
+        self.recent: deque = deque(maxlen=SESSION_MAX_MESSAGES)
+        self.nbytes = 0  # approximate size of the cached messages
+
+    def append_scored(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Fold newly scored messages ({"sender", "text", "labels"}) into the running
+        state -> change in nbytes.
+        """
+        before = self.nbytes
+        self.aggregate = aggregate_labels_max([self.aggregate] + [m["labels"] for m in messages])
+        self.n_messages += len(messages)
+        for m in messages:
+            if len(m["text"]) > SESSION_MAX_TEXT_CHARS:
+                m = {**m, "text": m["text"][:SESSION_MAX_TEXT_CHARS], "truncated": True}
+            if len(self.recent) == self.recent.maxlen:
+                self.nbytes -= _message_bytes(self.recent[0])
+            self.recent.append(m)
+            self.nbytes += _message_bytes(m)
+        return self.nbytes - before
+
+    def summary(self) -> Dict[str, Any]:
+        risk = map_to_risk(self.aggregate) if self.aggregate else {"risk_score": 0.0}
+        return {
+            "session_id": self.id,
+            "n_messages": self.n_messages,
+            "agg_label_scores": dict(self.aggregate),
+            "risk_score": float(risk["risk_score"]),
+        }
+
+
+class SessionStore:
+    def __init__(self, ttl_s: float = SESSION_TTL_S, max_sessions: int = SESSION_MAX,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+
+    def _drop_oldest(self):
+        _, s = self._sessions.popitem(last=False)
+        self.nbytes -= s.nbytes
+
+    def _evict(self):
+        # sessions are kept in last-access order, so expired ones are at the front
+        now = time.monotonic()
+        while self._sessions:
+            s = next(iter(self._sessions.values()))
+            if now - s.last_access <= self.ttl_s:
+                break
+            self._drop_oldest()
+            self.evicted_idle += 1
+        # keep the most recently used session even if it alone is over max_bytes
+        while len(self._sessions) > self.max_sessions or (self.nbytes > self.max_bytes and len(self._sessions) > 1):
+            self._drop_oldest()
+            self.evicted_capacity += 1
+
+    def create(self) -> ConversationSession:
+        s = ConversationSession(uuid.uuid4().hex)
+        with self._lock:
+            self._sessions[s.id] = s
+            self._evict()
+        return s
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            self._evict()
+            s = self._sessions.get(session_id)
+            if s is not None:
+                s.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+            return s
+
+    def append_scored(self, session: ConversationSession, messages: List[Dict[str, Any]]):
+        """session.append_scored, keeping the store's byte total and bound."""
+        with self._lock:
+            delta = session.append_scored(messages)
+            if self._sessions.get(session.id) is session:  # not evicted or deleted meanwhile
+                self.nbytes += delta
+                self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            s = self._sessions.pop(session_id, None)
+            if s is None:
+                return False
+            self.nbytes -= s.nbytes
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict()
+            return {
+                "active": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_s": self.ttl_s,
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "evicted_idle": self.evicted_idle,
+                "evicted_capacity": self.evicted_capacity,
+            }
+
+
+session_store = SessionStore()
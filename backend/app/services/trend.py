@@ -0,0 +1,265 @@
+# backend/app/services/trend.py
+"""
+Incremental linear trend of each subject's daily risk score.
+
+The linear forecast fallback (no LSTM forecaster loaded) fits a least-squares
+line to the mean daily risk_score of the latest days with predictions and
+extrapolates it. A TrendWindow keeps the running sums (n, Σx, Σy, Σxy, Σx²) of
+the latest `window` days instead of refitting with np.polyfit on every
+forecast. x is counted back from the newest day (0, -1, -2, ...), so each
+change is a constant-time update of the sums:
+ - a new day shifts every x by one;
+ - dropping the oldest day subtracts its point;
+ - a prediction on the newest day only changes Σy.
+The fit is then a closed form, equal to polyfit on the same window up to
+rounding. The sums are recomputed from the window every `window` days, so
+rounding does not accumulate.
+
+With TREND_EW_HALFLIFE set, days in the window are instead weighted by
+0.5 ** (age / halflife), with age in days with predictions (newest = 0). This
+is exponentially weighted least squares, polyfit with w = sqrt(weight).
+Scaling the sums by the decay on each new day keeps it O(1).
+
+TrendStore holds one estimator per subject (None: all subjects). Each is seeded
+from the subject's daily totals on first use and updated by crud's inserts. A
+prediction for a day before the subject's newest day drops the estimator; the
+next forecast seeds it again. crud wraps each insert in writing(), from before
+its transaction until after observe(). A subject is not seeded while one of its
+inserts is in flight: the totals read may or may not include that insert, and
+observe() would then count it twice. Like the history store, it only sees this
+process's inserts and would go stale with several API workers, so it is off by
+default; set TREND_SUBJECTS only when a single process writes. While off, the
+linear fallback refits linear_extrapolate on the series on every forecast.
+
+Configured via env:
+ - TREND_WINDOW: days with predictions fitted (default 60, /api/forecast's default `recent`)
+ - TREND_EW_HALFLIFE: half-life in days with predictions (default 0 = unweighted least squares)
+ - TREND_SUBJECTS: max estimators kept (default 0: estimators disabled; e.g. 10000)
+"""
+import os
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.rollups import daily_totals, floor_to
+from app.services.history_store import history_store
+
+TREND_WINDOW = int(os.getenv("TREND_WINDOW", "60"))
+TREND_EW_HALFLIFE = float(os.getenv("TREND_EW_HALFLIFE", "0"))
+TREND_SUBJECTS = int(os.getenv("TREND_SUBJECTS", "0"))
+
+
+async def load_daily_totals(subject_id: Optional[str], limit: int) -> List[Tuple[datetime, float, int]]:
+    """(day, score sum, predictions) of the latest `limit` days with predictions, oldest first."""
+    totals = await history_store.daily_totals(subject_id, limit) if subject_id is not None else None
+    if totals is None:
+        totals = await daily_totals(limit, subject_id=subject_id)
+    return totals
+
+
+class _Sums:
+    """Weighted least-squares sums over points (x, y)."""
+    __slots__ = ("w", "x", "y", "xy", "xx")
+
+    def __init__(self):
+        self.w = self.x = self.y = self.xy = self.xx = 0.0
+
+    def add(self, x: float, y: float, w: float = 1.0) -> None:
+        self.w += w
+        self.x += w * x
+        self.y += w * y
+        self.xy += w * x * y
+        self.xx += w * x * x
+
+    def shift(self, c: float) -> None:
+        """Every x -> x - c."""
+        self.xx += c * (c * self.w - 2.0 * self.x)
+        self.xy -= c * self.y
+        self.x -= c * self.w
+
+    def scale(self, f: float) -> None:
+        self.w *= f
+        self.x *= f
+        self.y *= f
+        self.xy *= f
+        self.xx *= f
+
+    def line(self) -> Tuple[float, float]:
+        """(slope, intercept) of the least-squares line; needs two distinct x."""
+        slope = (self.w * self.xy - self.x * self.y) / (self.w * self.xx - self.x * self.x)
+        return slope, (self.y - slope * self.x) / self.w
+
+
+class TrendWindow:
+    """Least-squares trend of the mean daily score over the latest `window` days with predictions."""
+
+    def __init__(self, window: int = TREND_WINDOW, halflife: float = TREND_EW_HALFLIFE):
+        self.window = max(1, window)
+        self.decay = 0.5 ** (1.0 / halflife) if halflife > 0 else None
+        self.days: Deque[List[Any]] = deque()  # [day, score sum, predictions], oldest first
+        self.sums = _Sums()
+        self.ew = _Sums() if self.decay is not None else None
+        self._since_resum = 0
+
+    def seed(self, totals: Sequence[Tuple[datetime, float, int]]) -> None:
+        """Start over from (day, score sum, predictions) rows, oldest first."""
+        self.days.clear()
+        self.sums = _Sums()
+        self.ew = _Sums() if self.decay is not None else None
+        for day, s, n in totals:
+            self._append(day, float(s), int(n))
+
+    def add(self, day: datetime, score: float) -> bool:
+        """Fold in one prediction; False if its day is before the newest (reseed instead)."""
+        if self.days and day < self.days[-1][0]:
+            return False
+        if self.days and day == self.days[-1][0]:
+            newest = self.days[-1]
+            old = newest[1] / newest[2]
+            newest[1] += score
+            newest[2] += 1
+            # x = 0: only Σy (and Σwy) change
+            self.sums.y += newest[1] / newest[2] - old
+            if self.ew is not None:
+                self.ew.y += newest[1] / newest[2] - old
+        else:
+            self._append(day, score, 1)
+        return True
+
+    def _append(self, day: datetime, s: float, n: int) -> None:
+        y = s / n
+        self.days.append([day, s, n])
+        self.sums.shift(1.0)
+        self.sums.add(0.0, y)
+        if self.ew is not None:
+            self.ew.scale(self.decay)
+            self.ew.shift(1.0)
+            self.ew.add(0.0, y)
+        if len(self.days) > self.window:
+            _, s0, n0 = self.days.popleft()
+            self.sums.add(-float(self.window), s0 / n0, w=-1.0)
+            if self.ew is not None:
+                self.ew.add(-float(self.window), s0 / n0, w=-self.decay ** self.window)
+        self._since_resum += 1
+        if self._since_resum >= self.window:
+            self._resum()
+
+    def _resum(self) -> None:
+        sums = _Sums()
+        ew = _Sums() if self.decay is not None else None
+        last = len(self.days) - 1
+        for i, (_, s, n) in enumerate(self.days):
+            sums.add(float(i - last), s / n)
+            if ew is not None:
+                ew.add(float(i - last), s / n, w=self.decay ** (last - i))
+        self.sums, self.ew = sums, ew
+        self._since_resum = 0
+
+    def extrapolate(self, days: int = 3) -> List[float]:
+        """Scores of the next `days` days on the fitted line, clipped to [0, 1], as linear_extrapolate."""
+        if len(self.days) < 2:
+            last = self.days[-1][1] / self.days[-1][2] if self.days else 0.0
+            return [float(last)] * days
+        slope, intercept = (self.ew or self.sums).line()
+        return [min(1.0, max(0.0, intercept + slope * d)) for d in range(1, days + 1)]
+
+
+class TrendStore:
+    def __init__(self, window: int = TREND_WINDOW, halflife: float = TREND_EW_HALFLIFE,
+                 max_subjects: int = TREND_SUBJECTS):
+        self.window = window
+        self.halflife = halflife
+        self.max_subjects = max_subjects
+        self._trends: "OrderedDict[Optional[str], TrendWindow]" = OrderedDict()
+        self._seeding: Dict[Optional[str], int] = {}  # key -> inserts started while its totals load
+        self._writing: Dict[Optional[str], int] = {}  # key -> inserts in flight (inside writing())
+        self.hits = 0
+        self.seeds = 0
+        self.reseeds = 0  # estimators dropped by out-of-order predictions
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_subjects > 0
+
+    @contextmanager
+    def writing(self, values: Sequence[Dict[str, Any]]) -> Iterator[None]:
+        """Mark an insert of rows `values` in flight; observe() them inside once committed."""
+        keys = {key for v in values for key in (None, v.get("subject_id"))} if self.enabled else set()
+        for key in keys:
+            self._writing[key] = self._writing.get(key, 0) + 1
+            if key in self._seeding:
+                self._seeding[key] += 1
+        try:
+            yield
+        finally:
+            for key in keys:
+                self._writing[key] -= 1
+                if not self._writing[key]:
+                    del self._writing[key]
+
+    def observe(self, values: Sequence[Dict[str, Any]]) -> None:
+        """Fold in committed risk_history rows (crud's row values)."""
+        if not self.enabled:
+            return
+        for v in values:
+            day = floor_to(v["timestamp"], "day")
+            for key in {None, v.get("subject_id")}:
+                trend = self._trends.get(key)
+                if trend is not None and not trend.add(day, float(v["risk_score"])):
+                    del self._trends[key]
+                    self.reseeds += 1
+
+    def clear(self) -> None:
+        self._trends.clear()
+        for key in self._seeding:
+            self._seeding[key] += 1
+
+    async def extrapolate(self, key: Optional[str], days: int, recent: int) -> Optional[List[float]]:
+        """
+        Linear forecast of subject `key`'s latest `recent` days in O(1); None when
+        recent is not the estimators' window, the subject has no predictions, or
+        inserts were in flight during its seeding (use linear_extrapolate on the
+        series instead).
+        """
+        if not self.enabled or recent != self.window:
+            return None
+        trend = self._trends.get(key)
+        if trend is None:
+            if key in self._seeding or key in self._writing:
+                return None
+            self._seeding[key] = 0
+            try:
+                totals = await load_daily_totals(key, self.window)
+            finally:
+                raced = self._seeding.pop(key)
+            if raced:
+                return None
+            trend = TrendWindow(self.window, self.halflife)
+            trend.seed(totals)
+            self._trends[key] = trend
+            self.seeds += 1
+            while len(self._trends) > self.max_subjects:
+                self._trends.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+        self._trends.move_to_end(key)
+        return trend.extrapolate(days) if trend.days else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "ew_halflife": self.halflife,
+            "subjects": len(self._trends),
+            "max_subjects": self.max_subjects,
+            "hits": self.hits,
+            "seeds": self.seeds,
+            "reseeds": self.reseeds,
+            "evictions": self.evictions,
+        }
+
+
+trend_store = TrendStore()
@@ -1,7 +1,11 @@
 # backend/app/utils.py
 import re
+import unicodedata
 from typing import List, Dict, Any
 
+# zero-width and soft-hyphen characters: invisible, but they split keywords
+_INVISIBLE = re.compile("[\u00ad\u200b-\u200d\u2060\ufeff]")
+
 def normalize_text(text: str) -> str:
     if not text:
         return ""
@@ -9,6 +13,13 @@ def normalize_text(text: str) -> str:
     text = re.sub(r"\s+", " ", text)
     return text
 
+def fold_text(text: str) -> str:
+    # NFKC folds compatibility forms (full-width letters/digits, ligatures) to plain
+    # ones; only /api/analyze applies it, other endpoints see the text as sent
+    if not text:
+        return ""
+    return _INVISIBLE.sub("", unicodedata.normalize("NFKC", text))
+
 def map_risk_level(score: float) -> str:
     s = float(score)
     if s < 0.25:
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Evaluate the two-tier cascade: accuracy vs. compute against running the
+transformer on every message.
+
+Tier 1 (keywords + TF-IDF) scores all of --val; for each uncertainty band only
+the messages with a TF-IDF probability inside the band are escalated to the
+transformer. Reports micro/macro F1 (threshold 0.5), the fraction of messages
+each tier settled and scoring time, next to TF-IDF-only and transformer-only.
+
+The transformer is loaded from --model_dir. When that directory has no weights
+(the checked-in experiments/transformer_model has none), a small reference
+model is trained from scratch on --train with the repo tokenizer, so nothing is
+downloaded; its accuracy is then only indicative of the method.
+
+Usage:
+  cd backend
+  python benchmarks/bench_cascade.py --bands 0.3:0.7 0.2:0.8 0.1:0.9 0.05:0.95
+  python benchmarks/bench_cascade.py --model_dir experiments/transformer_model
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import models_api, transformer_backend  # noqa: E402
+from app.core.models_api import LABELS, TRANS_DIR  # noqa: E402
+from app.services.ai_inference import TIERS, cascade_route  # noqa: E402
+
+DATA_DIR = ROOT / "data"
+
+
+def train_reference_model(out_dir: Path, train_df: pd.DataFrame, epochs: int, dim: int, layers: int):
+    """Train a small DistilBERT-style classifier from random init and save it like finetune_transformer.py."""
+    import joblib
+    import torch
+    from sklearn.preprocessing import MultiLabelBinarizer
+    from transformers import AutoTokenizer, DistilBertConfig, DistilBertForSequenceClassification
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained(str(TRANS_DIR))
+    config = DistilBertConfig(vocab_size=tokenizer.vocab_size, dim=dim, hidden_dim=4 * dim, n_layers=layers,
+                              n_heads=4, num_labels=len(LABELS), problem_type="multi_label_classification")
+    model = DistilBertForSequenceClassification(config)
+    texts = train_df["text"].astype(str).tolist()
+    y = torch.tensor(train_df[LABELS].values, dtype=torch.float32)
+    opt = torch.optim.AdamW(model.parameters(), lr=1e-3)
+    model.train()
+    for epoch in range(epochs):
+        perm = torch.randperm(len(texts)).tolist()
+        for start in range(0, len(perm), 32):
+            idx = perm[start:start + 32]
+            enc = tokenizer([texts[i] for i in idx], padding=True, truncation=True, max_length=64, return_tensors="pt")
+            loss = model(**enc, labels=y[idx]).loss
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+        print(f"  reference model epoch {epoch + 1}/{epochs} loss {loss.item():.4f}")
+    model.save_pretrained(str(out_dir))
+    tokenizer.save_pretrained(str(out_dir))
+    joblib.dump(MultiLabelBinarizer(classes=LABELS).fit([LABELS]), out_dir / "label_binarizer.joblib")
+
+
+def f1s(y_true, probs):
+    pred = (probs >= 0.5).astype(int)
+    return (f1_score(y_true, pred, average="micro", zero_division=0),
+            f1_score(y_true, pred, average="macro", zero_division=0))
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--val", default=str(DATA_DIR / "val.csv"))
+    parser.add_argument("--train", default=str(DATA_DIR / "multi_label_dataset.csv"))
+    parser.add_argument("--model_dir", default=str(transformer_backend.MODEL_DIR))
+    parser.add_argument("--bands", nargs="+", default=["0.3:0.7", "0.2:0.8", "0.1:0.9", "0.05:0.95"])
+    parser.add_argument("--epochs", type=int, default=8)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--layers", type=int, default=2)
+    args = parser.parse_args()
+
+    val = pd.read_csv(args.val).dropna(subset=["text"])
+    texts = val["text"].astype(str).tolist()
+    y_true = val[LABELS].fillna(0).astype(int).values
+
+    model_dir = Path(args.model_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        if transformer_backend.weights_path(model_dir) is None:
+            print(f"no weights in {model_dir}; training a reference model on {args.train}")
+            train = pd.read_csv(args.train).dropna(subset=["text"])
+            train = train[~train["text"].astype(str).isin(set(texts))]
+            train[LABELS] = train[LABELS].fillna(0).astype(int)
+            model_dir = Path(tmp)
+            train_reference_model(model_dir, train, args.epochs, args.dim, args.layers)
+        model = transformer_backend.load_transformer(model_dir)
+
+    keyword_probs = models_api._keyword_probs_batch(texts)
+    models_api.score_tiers(texts[:2]), model.predict_proba(texts[:2])  # load + warm both tiers
+    (tfidf_probs, keyword_probs, _), t_tier1 = timed(models_api.score_tiers, texts)
+    tier1 = np.maximum(tfidf_probs, keyword_probs)
+    t_probs, t_all = timed(model.predict_proba, texts)
+    t_probs = np.maximum(t_probs, keyword_probs)
+
+    print(f"{len(texts)} messages from {args.val}")
+    print(f"{'mode':<22} {'micro F1':>8} {'macro F1':>8} {'kw':>6} {'tfidf':>6} {'transf':>6} {'ms':>8}")
+    print(f"{'tfidf + keywords':<22} {f1s(y_true, tier1)[0]:>8.4f} {f1s(y_true, tier1)[1]:>8.4f} "
+          f"{'':>6} {'100%':>6} {'0%':>6} {t_tier1:>8.1f}")
+    print(f"{'transformer (all)':<22} {f1s(y_true, t_probs)[0]:>8.4f} {f1s(y_true, t_probs)[1]:>8.4f} "
+          f"{'':>6} {'0%':>6} {'100%':>6} {t_all:>8.1f}")
+    for band in args.bands:
+        low, high = (float(x) for x in band.split(":"))
+        route = cascade_route(tfidf_probs, keyword_probs, low, high)
+        idx = np.flatnonzero(route == TIERS.index("transformer"))
+        probs = tier1.copy()
+        t_esc = 0.0
+        if len(idx):
+            esc, t_esc = timed(model.predict_proba, [texts[i] for i in idx])
+            probs[idx] = np.maximum(esc, keyword_probs[idx])
+        frac = [(route == i).mean() * 100 for i in range(len(TIERS))]
+        micro, macro = f1s(y_true, probs)
+        print(f"{'cascade ' + band:<22} {micro:>8.4f} {macro:>8.4f} {frac[0]:>5.0f}% {frac[1]:>5.0f}% "
+              f"{frac[2]:>5.0f}% {t_tier1 + t_esc:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
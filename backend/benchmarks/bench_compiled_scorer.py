@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: sklearn pipeline predict_proba vs. the compiled TF-IDF scorer.
+
+Checks that both paths agree to --tol on the dataset, then times batches of
+--sizes messages through each.
+
+Usage:
+  cd backend
+  python training/train_tfidf_multilabel.py --export_only   # if the compiled artifact is missing
+  python benchmarks/bench_compiled_scorer.py --sizes 1 10 100 1000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import models_api  # noqa: E402
+
+DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
+
+
+def time_it(fn, texts, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--tol", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(models_api.TFIDF_PIPE)
+    scorer = models_api.CompiledTfidfScorer(joblib.load(models_api.TFIDF_COMPILED))
+
+    corpus = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist()
+    err = np.abs(pipeline.predict_proba(corpus) - scorer.predict_proba(corpus)).max()
+    print(f"max |sklearn - compiled| over {len(corpus)} texts: {err:.2e}")
+    if err > args.tol:
+        raise SystemExit(f"compiled scorer differs by more than {args.tol}")
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for n in args.sizes:
+        texts = [corpus[i] for i in rng.integers(0, len(corpus), size=n)]
+        a = time_it(pipeline.predict_proba, texts, args.repeats)
+        b = time_it(scorer.predict_proba, texts, args.repeats)
+        print(f"{n:>6} {a:>11.3f} {b:>12.3f} {a / b:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark: latency of light endpoints while /api/predict is saturated.
+
+Starts the API with uvicorn once per executor mode, keeps --predict-clients
+concurrent clients posting --messages-message conversations to /api/predict,
+and meanwhile probes /health and /api/privacy/check, reporting p50/p99.
+
+Usage:
+  cd backend
+  DATABASE_URL=sqlite+aiosqlite:///./bench.db \\
+    python benchmarks/bench_executor_concurrency.py --modes inline thread --duration 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
+
+
+async def wait_up(base):
+    async with httpx.AsyncClient() as c:
+        for _ in range(200):
+            try:
+                if (await c.get(base + "/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(base, conversation, args):
+    stop = time.perf_counter() + args.duration
+    latencies = {"/health": [], "/api/privacy/check": []}
+    predicted = 0
+
+    async with httpx.AsyncClient(timeout=120) as c:
+        async def predict_client():
+            nonlocal predicted
+            while time.perf_counter() < stop:
+                await c.post(base + "/api/predict", json={"messages": conversation})
+                predicted += 1
+
+        async def probe():
+            while time.perf_counter() < stop:
+                for path in latencies:
+                    t0 = time.perf_counter()
+                    if path == "/health":
+                        await c.get(base + path)
+                    else:
+                        await c.post(base + path, json={"text": "my number is 9876543210"})
+                    latencies[path].append((time.perf_counter() - t0) * 1000.0)
+                await asyncio.sleep(args.probe_interval)
+
+        await asyncio.sleep(0.5)
+        await asyncio.gather(probe(), *[predict_client() for _ in range(args.predict_clients)])
+    return latencies, predicted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--predict-clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    corpus = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist()
+    rng = np.random.default_rng(0)
+    conversation = [{"text": corpus[i], "sender": "child"} for i in rng.integers(0, len(corpus), size=args.messages)]
+    base = f"http://127.0.0.1:{args.port}"
+
+    print(f"{'mode':>8} {'endpoint':>20} {'n':>6} {'p50 ms':>9} {'p99 ms':>9} {'predicts':>9}")
+    for mode in args.modes:
+        env = dict(os.environ, INFERENCE_EXECUTOR=mode, INFERENCE_WORKERS=str(args.workers))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=str(ROOT), env=env,
+        )
+        try:
+            asyncio.run(wait_up(base))
+            latencies, predicted = asyncio.run(run_load(base, conversation, args))
+        finally:
+            server.terminate()
+            server.wait()
+        for path, xs in latencies.items():
+            p50, p99 = np.percentile(xs, [50, 99]) if xs else (float("nan"), float("nan"))
+            print(f"{mode:>8} {path:>20} {len(xs):>6} {p50:>9.1f} {p99:>9.1f} {predicted:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: forecasting many subjects, one LSTM call per subject vs. one batched call.
+
+For each of --subjects counts, that many random daily score series (seq_len..--recent
+days long) are forecast --days days ahead with
+ - per subject:  the LSTM once per subject (N forward passes, what N
+                 /api/forecast?subject_id= requests cost)
+ - batched:      the LSTM on all series (one (N, seq_len, 1) forward pass per
+                 `horizon` days, as /api/forecast/batch does with FORECAST_MODEL=lstm)
+and the largest difference between the two results is reported. Also timed:
+de-scaling the predictions with one scaler.inverse_transform call per point (the
+previous engine) vs. one call for the whole array.
+
+Needs the forecaster artifacts in experiments/ (training/train_forecast.py). They
+are loaded without the held-out quality check the API applies: this measures
+inference cost, not forecast quality.
+
+Usage:
+  cd backend
+  python benchmarks/bench_forecast.py --subjects 1 10 100 1000 --days 7
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services.forecast_engine import _lstm_forecast, load_artifacts  # noqa: E402
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--recent", type=int, default=60)
+    args = parser.parse_args()
+
+    loaded = load_artifacts()
+    if loaded is None:
+        raise SystemExit("forecaster artifacts not found in experiments/")
+    preproc = loaded.preproc if isinstance(loaded.preproc, dict) else {}
+    scaler = preproc.get("scaler")
+    seq_len = int(preproc.get("seq_len", 10))
+    rng = random.Random(0)
+    _lstm_forecast(loaded, [[0.5] * seq_len], args.days)  # first call pays torch's one-time setup
+
+    print(f"{'subjects':>8} {'per subject ms':>15} {'batched ms':>11} {'speedup':>8} {'max diff':>9} "
+          f"{'inverse per point ms':>21} {'vectorized ms':>14}")
+    for n in args.subjects:
+        series = [[rng.random() for _ in range(rng.randint(seq_len, max(seq_len, args.recent)))] for _ in range(n)]
+        single, single_ms = timed(lambda: [_lstm_forecast(loaded, [s], args.days)[0] for s in series])
+        batched, batched_ms = timed(_lstm_forecast, loaded, series, args.days)
+        diff = float(np.abs(np.array(single) - np.array(batched)).max())
+        per_point_ms = vectorized_ms = float("nan")
+        if scaler is not None:
+            preds = np.array(batched)
+            _, per_point_ms = timed(lambda: [[scaler.inverse_transform([[p]])[0][0] for p in row] for row in preds])
+            _, vectorized_ms = timed(lambda: scaler.inverse_transform(preds.reshape(-1, 1)).reshape(preds.shape))
+        print(f"{n:>8} {single_ms:>15.1f} {batched_ms:>11.1f} {single_ms / batched_ms:>7.1f}x {diff:>9.1e} "
+              f"{per_point_ms:>21.1f} {vectorized_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/forecast?subject_id= under dashboard polling, with and without the forecast cache.
+
+risk_history is filled with --subjects subjects x --rows rows, then a workload
+of --reads forecast reads (random subjects, each read polling the same days /
+recent) is run with one inserted prediction for a random subject after every
+--read_ratio reads, in three configurations:
+ - off:      FORECAST_CACHE_SIZE=0, every read computes (series read + forecaster)
+ - cache:    write-invalidated cache, misses compute on the request path
+ - refresh:  cache plus a background refresh every --interval s and reads
+             allowed to serve a forecast up to --max_stale s old meanwhile
+Reported: read latency p50 / p95 / p99 in ms, hit rate, served staleness and
+refresh lag (forecast_cache.stats()).
+
+Uses a throwaway SQLite file unless DATABASE_URL is set (the risk_history
+tables are dropped and recreated on PostgreSQL).
+
+Usage:
+  cd backend
+  python benchmarks/bench_forecast_cache.py --subjects 200 --reads 5000 --read_ratio 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.crud import insert_prediction, insert_predictions  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.services.forecast_cache import ForecastCache  # noqa: E402
+import app.services.forecast_cache as forecast_cache_module  # noqa: E402
+import app.crud as crud_module  # noqa: E402
+
+
+def subject(i: int) -> str:
+    return f"subject-{i:06d}"
+
+
+def record(s: str, ts: datetime, rng: random.Random) -> dict:
+    score = rng.random()
+    return {"subject_id": s, "timestamp": ts, "message": "benchmark message", "sender": "child",
+            "risk_score": score, "risk_level": ("low", "medium", "high")[min(2, int(score * 3))]}
+
+
+async def run(name: str, cache: ForecastCache, args, rng: random.Random):
+    # the cache crud bumps and the route reads are the module singleton
+    crud_module.forecast_cache = forecast_cache_module.forecast_cache = cache
+    task = cache.start()
+    lat = []
+    now = datetime.now(timezone.utc)
+    try:
+        for i in range(args.reads):
+            if i % args.read_ratio == 0:
+                await insert_prediction(record(subject(rng.randrange(args.subjects)), now, rng))
+            s = subject(rng.randrange(args.subjects))
+            t0 = time.perf_counter()
+            await cache.get(s, args.days, args.recent)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            await asyncio.sleep(0)  # let the refresher run between reads
+    finally:
+        if task is not None:
+            task.cancel()
+    lat.sort()
+    st = cache.stats()
+    q = statistics.quantiles(lat, n=100)
+    print(f"{name:<8} {q[49]:>8.3f} {q[94]:>8.3f} {q[98]:>8.3f} {st['hit_rate']:>8.3f} "
+          f"{st['stale_served_s_max']:>10.2f} {st['refresh_lag_s_avg']:>9.2f}")
+
+
+async def main_async(args):
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS risk_history, risk_rollup_hour, risk_rollup_day, risk_rollup_delta CASCADE"))
+    try:
+        await init_db()
+    except Exception:
+        pass  # as on app startup
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    await insert_predictions([record(subject(s), now - timedelta(days=rng.random() * args.recent), rng)
+                              for s in range(args.subjects) for _ in range(args.rows)])
+    print(f"database: {os.environ['DATABASE_URL']}")
+    print(f"{args.subjects} subjects x {args.rows} rows, {args.reads} reads, 1 insert per {args.read_ratio} reads")
+    print(f"{'config':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hit rate':>8} {'stale max s':>10} {'lag avg s':>9}")
+    await run("off", ForecastCache(max_entries=0), args, random.Random(1))
+    await run("cache", ForecastCache(max_entries=args.size, refresh_interval_s=0), args, random.Random(1))
+    await run("refresh", ForecastCache(max_entries=args.size, refresh_interval_s=args.interval,
+                                       max_stale_s=args.max_stale), args, random.Random(1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=200, help="rows per subject")
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--read_ratio", type=int, default=20, help="reads per inserted prediction")
+    parser.add_argument("--size", type=int, default=4096, help="FORECAST_CACHE_SIZE of the cached configs")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--recent", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.5, help="refresh period in seconds")
+    parser.add_argument("--max_stale", type=float, default=2.0, help="max staleness served in seconds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
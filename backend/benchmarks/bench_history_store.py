@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-subject reads from the in-memory history store vs. the database.
+
+risk_history is filled with --subjects subjects x --rows rows (timestamps spread
+over --days days), the store (app/services/history_store.py) is preloaded as on
+app startup, and --samples randomly chosen subjects are queried with:
+ - stats:     crud.get_stats(subject_id=...)  (what /api/stats?subject_id= does)
+ - forecast:  the daily score series /api/forecast?subject_id= fits
+               (history_store.daily_scores, else rollups.daily_scores)
+once with the store disabled (range scans of ix_risk_history_subject_timestamp_id)
+and once enabled. Results of both paths are compared. Also reported: preload
+time, memory per subject, and the write-through cost per inserted row.
+
+Subjects with more rows than HISTORY_STORE_SIZE can only be answered from memory
+for windows the ring covers; pass --capacity below --rows to see fallbacks.
+
+Uses a throwaway SQLite file unless DATABASE_URL is set; on PostgreSQL the rows
+are generated server-side (the risk_history tables are dropped and recreated).
+
+Usage:
+  cd backend
+  python benchmarks/bench_history_store.py --subjects 1000 --rows 500 --capacity 1024
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.models_api import LABELS  # noqa: E402
+from app.crud import get_stats  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.rollups import daily_scores  # noqa: E402
+from app.services.history_store import history_store  # noqa: E402
+
+LEVELS = ("low", "medium", "high")
+
+
+def subject(i: int) -> str:
+    return f"subject-{i:06d}"
+
+
+async def fill(subjects: int, rows: int, days: int, now: datetime):
+    if engine.dialect.name == "postgresql":
+        probs = ", ".join(f"'{label}', round(random()::numeric, 4)" for label in LABELS)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"""
+                INSERT INTO risk_history (timestamp, subject_id, message, sender, risk_level, risk_score, label_probs)
+                SELECT timestamp '{now:%Y-%m-%d %H:%M:%S}+00' - (r + random()) / {rows} * interval '{days} days',
+                       'subject-' || lpad(s::text, 6, '0'), 'benchmark message', 'child',
+                       (ARRAY['low', 'medium', 'high'])[1 + floor(random() * 3)::int], random(),
+                       json_build_object({probs})
+                FROM generate_series(0, {rows - 1}) r, generate_series(0, {subjects - 1}) s"""))
+            await conn.execute(text("ANALYZE risk_history"))
+        return
+    rng = random.Random(0)
+
+    def rows_iter():
+        for r in range(rows):
+            for s in range(subjects):
+                score = rng.random()
+                ts = now - timedelta(days=(r + rng.random()) / rows * days)
+                yield (ts.strftime("%Y-%m-%d %H:%M:%S.%f"), subject(s), "benchmark message", "child",
+                       LEVELS[min(2, int(score * 3))], score,
+                       json.dumps({label: round(rng.random(), 4) for label in LABELS}))
+
+    con = sqlite3.connect(engine.url.database)
+    con.executemany(
+        "INSERT INTO risk_history (timestamp, subject_id, message, sender, risk_level, risk_score, label_probs) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows_iter())
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+async def forecast_series(s: str, recent: int):
+    history = await history_store.daily_scores(s, recent)
+    return history if history is not None else await daily_scores(recent, subject_id=s)
+
+
+async def latencies(query, subjects):
+    out, results = [], []
+    for s in subjects:
+        t0 = time.perf_counter()
+        results.append(await query(s))
+        out.append((time.perf_counter() - t0) * 1000.0)
+    out.sort()
+    return statistics.median(out), out[int(0.95 * (len(out) - 1))], results
+
+
+def same(a, b) -> bool:
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float):
+        return abs(a - b) <= 1e-6 * max(1.0, abs(a))  # label probabilities are kept as float32
+    return a == b
+
+
+async def main_async(args):
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS risk_history, risk_rollup_hour, risk_rollup_day, risk_rollup_delta CASCADE"))
+    try:
+        await init_db()
+    except Exception:
+        pass  # as on app startup
+    history_store.capacity = args.capacity
+    history_store.enabled = args.capacity > 0  # off by default (HISTORY_STORE_SIZE=0)
+    history_store.max_subjects = max(args.subjects, 1)
+    now = datetime.now(timezone.utc)
+    print(f"database: {os.environ['DATABASE_URL']}")
+    t0 = time.perf_counter()
+    await fill(args.subjects, args.rows, args.days, now)
+    print(f"{args.subjects} subjects x {args.rows} rows filled in {time.perf_counter() - t0:.1f} s")
+
+    t0 = time.perf_counter()
+    await history_store.warm()
+    st = history_store.stats()
+    print(f"preload: {time.perf_counter() - t0:.2f} s, {st['subjects']} subjects, {st['bytes'] / 1e6:.1f} MB "
+          f"({st['bytes_per_ring'] / 1024:.1f} KB per subject, capacity {st['capacity']})")
+
+    rng = random.Random(1)
+    sample = [subject(rng.randrange(args.subjects)) for _ in range(args.samples)]
+    print(f"{'query':<10} {'db p50/p95 ms':>16} {'store p50/p95 ms':>18} {'speedup':>8} {'hit rate':>9} {'equal':>6}")
+    queries = [("stats", lambda s: get_stats(subject_id=s)),
+               ("forecast", lambda s: forecast_series(s, args.recent))]
+    for name, query in queries:
+        history_store.enabled = False
+        db = await latencies(query, sample)
+        history_store.enabled = True
+        hits, misses = history_store.hits, history_store.misses
+        mem = await latencies(query, sample)
+        reads = history_store.hits - hits + history_store.misses - misses
+        hit_rate = (history_store.hits - hits) / reads if reads else 0.0
+        print(f"{name:<10} {db[0]:>7.2f}/{db[1]:<8.2f} {mem[0]:>8.3f}/{mem[1]:<9.3f} {db[0] / mem[0]:>7.0f}x "
+              f"{hit_rate:>9.2f} {str(same(db[2], mem[2])):>6}")
+
+    # write-through: the per-row cost crud's inserts add after commit
+    rows = [{"id": -1 - i, "timestamp": now, "subject_id": s, "risk_score": 0.5, "risk_level": "medium",
+             "label_probs": {label: 0.1 for label in LABELS}} for i, s in enumerate(sample * 20)]
+    t0 = time.perf_counter()
+    history_store.append_rows(rows)
+    print(f"write-through: {(time.perf_counter() - t0) / len(rows) * 1e6:.1f} us per row")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=500, help="rows per subject")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--capacity", type=int, default=1024, help="HISTORY_STORE_SIZE")
+    parser.add_argument("--recent", type=int, default=60, help="days fitted by the forecast")
+    parser.add_argument("--samples", type=int, default=200, help="subjects queried")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Differential check and benchmark for the compiled keyword matcher.
+
+Compares keyword_rules.match_rules_batch against the original per-rule
+`any(phrase in lower for phrase in phrases)` scans on every text of the
+dataset, a few overlapping-phrase edge cases and --fuzz random texts built
+from the rule phrases (mixed case, glued together, NUL-separated). Rule hits
+must be identical, for the whole batch and text by text, and so must the
+resulting label probabilities, also when computed from a hit matrix the caller
+already has (as /api/analyze passes its keyword stage's hits to the scorer).
+It also pins the text normalization: utils.normalize_text (what /api/predict
+scores and caches under) must stay the original strip + whitespace collapse,
+with no Unicode folding, while /api/analyze's fold_text must expose keywords
+hidden by full-width letters or invisible characters. Any difference exits
+with status 1. Then times both (skipped with --check, for CI).
+
+Usage:
+  cd backend
+  python benchmarks/bench_keyword_rules.py --data data/multi_label_dataset.csv
+  python benchmarks/bench_keyword_rules.py --check
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import models_api  # noqa: E402
+from app.core.keyword_rules import KEYWORD_RULES, match_rules, match_rules_batch  # noqa: E402
+from app.utils import fold_text, normalize_text  # noqa: E402
+
+DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
+
+EDGE_CASES = [
+    "",
+    "DEPRESSEDRUGS",          # "drugs" overlaps the tail of "depressed"
+    "bullyinghigh alone",
+    "i want to end it all\x00and take pills",
+    "İ can't go on",
+    "suicidal thoughts, so depressed and alone",
+]
+
+# (text, rule that only matches once fold_text is applied)
+FOLD_CASES = [
+    ("\uff53\uff55\uff49\uff43\uff49\uff44\uff41\uff4c thoughts", "self_harm"),  # full-width
+    ("so de\u00adpressed", "depression"),                                            # soft hyphen
+    ("sell me dr\u200bugs", "substance_abuse"),                                      # zero-width space
+    ("\ufeffbul\u2060lied again", "bullying"),
+]
+
+
+def random_texts(n: int, seed: int = 0):
+    """Rule phrases and their fragments glued with filler, in random case."""
+    rng = random.Random(seed)
+    phrases = [p for rule in KEYWORD_RULES for p in rule["phrases"]]
+    pieces = phrases + [p[:rng.randint(1, len(p))] for p in phrases] + [" ", "", "x", "\x00", "İ", ", "]
+    texts = []
+    for _ in range(n):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 8)))
+        texts.append("".join(c.upper() if rng.random() < 0.3 else c for c in text))
+    return texts
+
+
+def legacy_hits(texts):
+    """The original per-rule phrase scans, as a bool (n_texts x n_rules) matrix."""
+    return np.array([[any(phrase in text.lower() for phrase in rule["phrases"]) for rule in KEYWORD_RULES]
+                     for text in texts], dtype=bool).reshape(len(texts), len(KEYWORD_RULES))
+
+
+def legacy_probs(texts):
+    """The original keyword logic, one scan per rule per text."""
+    out = np.zeros((len(texts), len(models_api.LABELS)))
+    for i, text in enumerate(texts):
+        lower = text.lower()
+        for rule in KEYWORD_RULES:
+            if any(phrase in lower for phrase in rule["phrases"]):
+                for label, boost in rule["boosts"].items():
+                    j = models_api.LABELS.index(label)
+                    out[i, j] = max(out[i, j], boost)
+    return out
+
+
+def compiled_probs(texts):
+    return models_api._keyword_probs_batch(texts)
+
+
+def original_normalize(text):
+    """utils.normalize_text before /api/analyze added Unicode folding."""
+    return re.sub(r"\s+", " ", text.strip()) if text else ""
+
+
+def check_normalization(texts):
+    """-> number of failures: normalize_text changed, or fold_text misses a hidden keyword."""
+    failures = 0
+    for text in texts + [t for t, _ in FOLD_CASES]:
+        if normalize_text(text) != original_normalize(text):
+            print("MISMATCH (normalize_text):", repr(text), repr(normalize_text(text)))
+            failures += 1
+    names = [rule["name"] for rule in KEYWORD_RULES]
+    for text, rule in FOLD_CASES:
+        plain, folded = match_rules(normalize_text(text)), match_rules(normalize_text(fold_text(text)))
+        if plain[names.index(rule)] or not folded[names.index(rule)]:
+            print(f"MISMATCH (fold_text, {rule}):", repr(text), plain, folded)
+            failures += 1
+    return failures
+
+
+def time_it(fn, texts, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--fuzz", type=int, default=20000, help="random phrase texts checked")
+    parser.add_argument("--check", action="store_true", help="only run the differential checks")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist() + EDGE_CASES
+    checked = texts + random_texts(args.fuzz)
+    hits = match_rules_batch(checked)
+    failed = False
+    for name, a, b in (
+        ("rule hits", legacy_hits(checked), hits),
+        ("per-text rule hits", hits, np.array([match_rules(t) for t in checked]).reshape(hits.shape)),
+        ("label probabilities", legacy_probs(checked), compiled_probs(checked)),
+        ("label probabilities from hits", compiled_probs(checked), models_api._keyword_probs_batch(checked, hits)),
+    ):
+        mismatches = np.nonzero(np.any(a != b, axis=1))[0]
+        for i in mismatches[:10]:
+            print(f"MISMATCH ({name}):", repr(checked[i]), a[i], b[i])
+        failed = failed or bool(len(mismatches))
+    failed = check_normalization(checked) > 0 or failed
+    if failed:
+        raise SystemExit(1)
+    print(f"identical rule hits and label probabilities on {len(checked)} texts "
+          f"({int(hits.any(axis=1).sum())} with keyword hits)")
+    if args.check:
+        return
+
+    legacy = time_it(legacy_probs, texts, args.repeats)
+    compiled = time_it(compiled_probs, texts, args.repeats)
+    print(f"legacy scans:   {legacy:8.2f} ms ({legacy * 1000 / len(texts):.2f} us/text)")
+    print(f"compiled regex: {compiled:8.2f} ms ({compiled * 1000 / len(texts):.2f} us/text)")
+
+
+if __name__ == "__main__":
+    main()
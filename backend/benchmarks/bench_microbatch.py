@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: transformer backend, per-message forward passes vs. the micro-batcher.
+
+Builds a randomly initialized DistilBERT-style classifier with the tokenizer in
+experiments/transformer_model (nothing is downloaded), saves it like
+training/finetune_transformer.py does, loads it through the serving backend,
+then runs --clients concurrent clients that each send --requests single-message
+requests. Reports throughput and per-request latency for both modes, and checks
+that batched and per-message probabilities agree.
+
+Usage:
+  cd backend
+  python benchmarks/bench_microbatch.py --clients 32 --requests 10
+  python benchmarks/bench_microbatch.py --dim 768 --layers 6 --heads 12   # DistilBERT-sized
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import transformer_backend  # noqa: E402
+from app.core.models_api import LABELS, TRANS_DIR  # noqa: E402
+from app.services.inference_executor import run_inference, shutdown_executor  # noqa: E402
+from app.services.micro_batcher import MicroBatcher  # noqa: E402
+
+DATA_DEFAULT = ROOT / "data" / "val.csv"
+
+
+def build_tiny_model(out_dir: Path, dim: int, layers: int, heads: int):
+    """Save a random-weight classifier + the repo tokenizer + label binarizer to out_dir."""
+    import torch
+    from sklearn.preprocessing import MultiLabelBinarizer
+    from transformers import AutoTokenizer, DistilBertConfig, DistilBertForSequenceClassification
+
+    torch.manual_seed(0)
+    tokenizer = AutoTokenizer.from_pretrained(str(TRANS_DIR))
+    config = DistilBertConfig(vocab_size=tokenizer.vocab_size, dim=dim, hidden_dim=4 * dim,
+                              n_layers=layers, n_heads=heads, num_labels=len(LABELS),
+                              problem_type="multi_label_classification")
+    DistilBertForSequenceClassification(config).save_pretrained(str(out_dir))
+    tokenizer.save_pretrained(str(out_dir))
+    joblib.dump(MultiLabelBinarizer(classes=LABELS).fit([LABELS]), out_dir / "label_binarizer.joblib")
+
+
+async def run_clients(score, texts, clients: int, requests: int):
+    latencies = []
+
+    async def client(c):
+        for r in range(requests):
+            text = texts[(c * requests + r) % len(texts)]
+            t0 = time.perf_counter()
+            await score([text])
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    return time.perf_counter() - t0, latencies
+
+
+def report(name, elapsed, latencies):
+    lat = sorted(x * 1000.0 for x in latencies)
+    p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+    print(f"{name:<14} {len(lat) / elapsed:>9.1f} msg/s   p50 {statistics.median(lat):>7.1f} ms   p95 {p95:>7.1f} ms")
+
+
+async def bench(model, texts, args):
+    def scored(batch):
+        return model.predict_proba(batch), model.version
+
+    async def per_message(batch):
+        return await run_inference(scored, batch)
+
+    batcher = MicroBatcher(scored, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    # batched rows must match single-message rows (padding is masked out)
+    sample = texts[:args.max_batch]
+    single = np.vstack([(await per_message([t]))[0] for t in sample])
+    batched = np.vstack([r[0] for r in await asyncio.gather(*(batcher.submit([t]) for t in sample))])
+    print(f"max |batched - per-message| over {len(sample)} texts: {np.abs(single - batched).max():.2e}")
+
+    await run_clients(per_message, texts, 2, 2)  # warm-up
+    print(f"{args.clients} clients x {args.requests} single-message requests")
+    report("per-message", *await run_clients(per_message, texts, args.clients, args.requests))
+    batcher.batches = batcher.messages = batcher.requests = 0
+    report("micro-batched", *await run_clients(batcher.submit, texts, args.clients, args.requests))
+    print(f"micro-batcher: {batcher.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--max_batch", type=int, default=32)
+    parser.add_argument("--max_wait_ms", type=float, default=5.0)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--heads", type=int, default=4)
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist()
+    with tempfile.TemporaryDirectory() as tmp:
+        build_tiny_model(Path(tmp), args.dim, args.layers, args.heads)
+        model = transformer_backend.load_transformer(Path(tmp))
+    print(f"model: dim={args.dim} layers={args.layers} heads={args.heads} ({model.version})")
+    try:
+        asyncio.run(bench(model, texts, args))
+    finally:
+        shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
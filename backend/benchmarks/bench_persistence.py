@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sustained prediction-insert throughput, per-request insert vs. write-behind.
+
+--producers concurrent tasks each persist --records / --producers prediction
+records, the way /api/predict does after scoring:
+ - sync:          crud.insert_prediction per record (session, transaction, one
+                  INSERT, commit, refresh)
+ - write_behind:  PredictionWriter.submit per record; the flusher writes batches
+                  with one multi-row INSERT. Timed until close() has flushed
+                  everything, so the figure is rows durably written per second.
+Row counts are checked after each run. Also reports request-path latency
+(time spent in the persist call) and the writer's flush stats; a --queue_size
+below --records shows backpressure (blocked puts) at work.
+
+Uses a throwaway SQLite database unless DATABASE_URL is set (point it at a local
+Postgres to measure that instead; the risk_history table is emptied first).
+
+Usage:
+  cd backend
+  python benchmarks/bench_persistence.py --records 5000 --producers 1 8 32
+  DATABASE_URL=postgresql+asyncpg://user:pw@localhost/helmit python benchmarks/bench_persistence.py
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.crud import delete_all, insert_prediction  # noqa: E402
+from app.db import AsyncSessionLocal, init_db  # noqa: E402
+from app.models_db import RiskHistory  # noqa: E402
+from app.services.prediction_writer import PredictionWriter  # noqa: E402
+
+
+def make_record(i: int):
+    return {
+        "message": f"benchmark message {i}",
+        "sender": "child",
+        "risk_level": "low",
+        "risk_score": 0.1,
+        "label_probs": {"self_harm": 0.01, "cyberbullying": 0.02},
+        "meta": {"model_version": "bench"},
+    }
+
+
+async def count_rows() -> int:
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(select(func.count()).select_from(RiskHistory))).scalar_one()
+
+
+async def run(persist, records: int, producers: int):
+    """Persist records from concurrent producers -> per-call latencies in ms."""
+    latencies = []
+
+    async def producer(start: int, n: int):
+        for i in range(start, start + n):
+            t0 = time.perf_counter()
+            await persist(make_record(i))
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    per = records // producers
+    await asyncio.gather(*(producer(p * per, per) for p in range(producers)))
+    return latencies
+
+
+async def main_async(args):
+    try:
+        await init_db()
+    except Exception:
+        pass  # as on app startup: the table is created even if an index already exists
+    print(f"database: {os.environ['DATABASE_URL']}")
+    print(f"{'mode':<13} {'producers':>9} {'rows':>6} {'rows/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'flushes':>7} {'avg flush ms':>12} {'blocked':>7}")
+    for producers in args.producers:
+        n = args.records // producers * producers
+        for mode in ("sync", "write_behind"):
+            await delete_all()
+            writer = PredictionWriter(mode=mode, queue_size=args.queue_size, batch_size=args.batch, flush_ms=args.flush_ms)
+            writer.start()
+            persist = writer.submit if mode == "write_behind" else insert_prediction
+            t0 = time.perf_counter()
+            latencies = await run(persist, n, producers)
+            await writer.close()
+            wall = time.perf_counter() - t0
+            rows = await count_rows()
+            if rows != n:
+                raise SystemExit(f"{mode}: expected {n} rows, found {rows}")
+            lat = sorted(latencies)
+            st = writer.stats()
+            print(f"{mode:<13} {producers:>9} {rows:>6} {rows / wall:>9.0f} {statistics.median(lat):>8.3f} "
+                  f"{lat[int(0.99 * (len(lat) - 1))]:>8.3f} {st['flushes']:>7} {st['avg_flush_ms']:>12.2f} {st['blocked_puts']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--producers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--flush_ms", type=float, default=200)
+    parser.add_argument("--queue_size", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-conversation scoring latency: per-message loop vs. one batch.
+
+"before" scores every message separately (one vectorizer transform and one
+predict_proba per message, as /api/predict used to); "after" scores the whole
+conversation with models_api.predict_multilabel_batch and aggregates with a
+column-wise max.
+
+Usage:
+  cd backend
+  python benchmarks/bench_predict_batch.py --sizes 1 10 100 1000 --repeats 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import models_api  # noqa: E402
+
+DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
+
+
+def per_message(texts):
+    rows = [models_api.predict_multilabel_single(t) for t in texts]
+    agg = {}
+    for probs in rows:
+        for k, v in probs.items():
+            agg[k] = max(agg.get(k, 0.0), v)
+    return agg
+
+
+def batched(texts):
+    probs = models_api.predict_multilabel_batch(texts)
+    return models_api.probs_row_to_dict(probs.max(axis=0))
+
+
+def time_it(fn, texts, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist()
+    rng = np.random.default_rng(0)
+
+    print(f"{'messages':>9} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        texts = [corpus[i] for i in rng.integers(0, len(corpus), size=n)]
+        a, b = per_message(texts), batched(texts)
+        assert all(abs(a[l] - b[l]) < 1e-12 for l in models_api.LABELS), "batch result differs"
+        before = time_it(per_message, texts, args.repeats)
+        after = time_it(batched, texts, args.repeats)
+        print(f"{n:>9} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-pattern privacy check vs. the combined single-pass scanner.
+
+The legacy check lowercases the text and runs re.search for each pattern,
+stopping at the first hit; the scanner runs one combined regex and returns
+every finding plus a redacted copy. First checks that both flag the same
+dataset messages (the legacy check can never match the upper-case PAN format,
+so those are listed separately), that the scanner's start-character
+prefilter never changes its findings and that its "type" is the first type
+whose own patterns match anywhere (both on the dataset and on random strings),
+then times inputs of --sizes characters built from chat messages, with no
+finding and with one finding at the very end.
+
+Usage:
+  cd backend
+  python benchmarks/bench_privacy.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core.privacy_scanner import SENSITIVE_PATTERNS, find_all, scan  # noqa: E402
+
+DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
+
+SAMPLES = [
+    "call me on 9876543210", "my email is jane.doe+x@example.co.uk", "i live at 221 baker street",
+    "house no is 4521", "bank details: account number 123456789", "password: hunter2",
+    "aadhaar 1234 5678 9012", "pan ABCDE1234F", "text me +44 7911123456", "nothing to see here",
+    "account number 123456 House Number # 9999",
+]
+
+
+def legacy_check(text: str):
+    text = text.lower()
+    for label, patterns in SENSITIVE_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, text):
+                return label
+    return None
+
+
+def reference_type(text: str):
+    """First type with a pattern matching anywhere in the (unlowered) text."""
+    for label, patterns in SENSITIVE_PATTERNS.items():
+        if any(re.search(p, text) for p in patterns):
+            return label
+    return None
+
+
+def unfiltered_find_all(text: str):
+    """The scanner's alternation without the _START prefilter."""
+    pats = [p for ps in SENSITIVE_PATTERNS.values() for p in ps]
+    labels = [label for label, ps in SENSITIVE_PATTERNS.items() for _ in ps]
+    rx = re.compile("|".join(f"(?P<p{i}>{p})" for i, p in enumerate(pats)))
+    return [{"type": labels[int(m.lastgroup[1:])], "start": m.start(), "end": m.end()} for m in rx.finditer(text)]
+
+
+def random_texts(n: int, seed: int = 0):
+    """Random characters, and random runs of the samples' words (overlapping findings)."""
+    rng = random.Random(seed)
+    alphabet = "aAbBhHpPxXzZ019 +-._@:#=\n" + "".join(SAMPLES)
+    words = " ".join(SAMPLES).split() + ["House", "Number", "#", "no", "1234", "123456", "9999"]
+    chars = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 80))) for _ in range(n // 2)]
+    runs = [" ".join(rng.choice(words) for _ in range(rng.randint(2, 12))) for _ in range(n - n // 2)]
+    return chars + runs
+
+
+def time_it(fn, text, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = pd.read_csv(args.data).dropna(subset=["text"])["text"].astype(str).tolist()
+    mismatches, pan_only = [], 0
+    for text in corpus + SAMPLES:
+        old, new = legacy_check(text), scan(text)
+        if bool(old) != new["flagged"]:
+            if not old and {f["type"] for f in new["findings"]} == {"Government ID"}:
+                pan_only += 1
+            else:
+                mismatches.append(text)
+    print(f"flag agreement over {len(corpus) + len(SAMPLES)} texts: {len(mismatches)} mismatches, "
+          f"{pan_only} PAN-only finds the legacy check missed")
+    if mismatches:
+        raise SystemExit(f"scanner disagrees with legacy check on: {mismatches[:5]}")
+    fuzz = corpus + SAMPLES + random_texts(20000)
+    bad = [t for t in fuzz if find_all(t) != unfiltered_find_all(t)]
+    print(f"prefilter check over {len(fuzz)} texts: {len(bad)} differences")
+    if bad:
+        raise SystemExit(f"prefilter changes findings on: {bad[:5]}")
+    bad = [t for t in fuzz if scan(t).get("type") != reference_type(t)]
+    print(f"type check over {len(fuzz)} texts: {len(bad)} differences")
+    if bad:
+        raise SystemExit(f"scanner type differs from per-pattern search on: {bad[:5]}")
+
+    benign = " ".join(t for t in corpus if not scan(t)["flagged"])
+    print(f"{'chars':>9} {'case':<10} {'legacy ms':>10} {'scan ms':>9} {'findings':>8}")
+    for n in args.sizes:
+        filler = (benign * (n // max(1, len(benign)) + 1))[:n]
+        for case, text in (("no hit", filler), ("hit @ end", filler[:-24] + " mail me at a.b@ex.com")):
+            a = time_it(legacy_check, text, args.repeats)
+            b = time_it(scan, text, args.repeats)
+            print(f"{n:>9} {case:<10} {a:>10.2f} {b:>9.2f} {len(scan(text)['findings']):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Adversarial / fuzz benchmark: privacy scan time must stay linear in input length.
+
+Each family below is an input shape that made the previous (unbounded) patterns
+backtrack: long runs the e-mail or digit patterns restart on, whitespace runs
+between keywords and a missing number, repeated "bank detail" prefixes. Every
+family is timed at each of --sizes; the scan passes when time per character at
+the largest size is within --max_ratio of the smallest size. --before_sizes
+times the same families with the previous patterns for comparison (keep them
+small: those grow quadratically or worse).
+
+Also checks that
+ - chunked scanning finds exactly what one finditer over the whole text finds
+   (random long texts, small chunk sizes),
+ - random texts over an adversarial token alphabet stay within the same
+   per-character cost,
+ - the scan-time budget stops a scan early and reports complete=False.
+
+Usage:
+  cd backend
+  python benchmarks/bench_privacy_adversarial.py --sizes 1000 10000 100000 1000000
+  python benchmarks/bench_privacy_adversarial.py --before_sizes 250 500 1000
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import privacy_scanner  # noqa: E402
+from app.core.privacy_scanner import MAX_MATCH, scan, scan_findings  # noqa: E402
+
+# the pattern table before the linear-time rewrite
+PREVIOUS_PATTERNS = [
+    r"\b\d{1,5}\s+\w+\s+(?i:street|st|road|rd|lane|ln|avenue|ave)\b",
+    r"(?i:house|home)\s*(?i:no|number|#)?\s*(?i:is|:)?\s*\d{4,}",
+    r"\b\d{4,}\s*(?i:house|home)\b",
+    r"\b\d{10}\b",
+    r"\+\d{1,3}\s?\d{6,12}",
+    r"(?i:bank|account)\s*(?i:no|number|#|detail|details)?\s*(?i:is|:)?\s*\d{4,}",
+    r"(?i:bank\s+detail.*?(?:account\s*)?(?:no|number|#)?\s*(?:is|:)?\s*)\d{4,}",
+    r"(?i:password)\s*[:=]",
+    r"(?i:pwd)\s*[:=]",
+    r"\b\d{4}\s\d{4}\s\d{4}\b",
+    r"\b[A-Z]{5}\d{4}[A-Z]\b",
+    r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+",
+]
+
+
+def fill(unit: str, n: int) -> str:
+    return (unit * (n // len(unit) + 1))[:n]
+
+
+FAMILIES = {
+    "letters": lambda n: fill("h", n),
+    "digits": lambda n: fill("1", n),
+    "digits+spaces": lambda n: fill("1 ", n),
+    "house+spaces": lambda n: "house" + " " * (n - 6) + "x",
+    "house no+spaces": lambda n: "house no" + " " * (n - 9) + "x",
+    "bank details+spaces": lambda n: "bank details" + " " * (n - 13) + "x",
+    "bank detail repeated": lambda n: fill("bank detail ", n),
+    "email local part": lambda n: "a@" + fill("b", n - 2),
+    "email dots": lambda n: fill("a.", n) + "@",
+    "address words": lambda n: "12 " + fill("w", n - 10) + " street",
+}
+
+TOKENS = ["house", "home", "bank", "detail", "details", "account", "no", "is", ":", "#", "@", ".", "+",
+          "password", "pwd", "=", "street", " ", "  ", "\n", "1", "1234", "9876543210", "a", "b", "X", "ABCDE"]
+
+
+def fuzz_texts(count: int, length: int, seed: int = 0):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < length:
+            tok = rng.choice(TOKENS) * rng.choice((1, 1, 1, 50))
+            parts.append(tok)
+            size += len(tok)
+        out.append("".join(parts)[:length])
+    return out
+
+
+def whole_text_findings(text: str):
+    return [{"type": privacy_scanner._GROUP_TYPES[m.lastgroup], "start": m.start(), "end": m.end()}
+            for m in privacy_scanner._COMBINED.finditer(text)]
+
+
+def time_it(fn, text, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--before_sizes", type=int, nargs="*", default=[250, 500, 1000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max_ratio", type=float, default=3.0)
+    parser.add_argument("--fuzz", type=int, default=200)
+    args = parser.parse_args()
+
+    unlimited = lambda t: scan_findings(t, budget_ms=float("inf"))  # noqa: E731
+    fuzz = fuzz_texts(args.fuzz, 5000)
+    bad = [t for t in fuzz for chunk in (MAX_MATCH // 2, 997, 4096)
+           if scan_findings(t, budget_ms=float("inf"), chunk=chunk)[0] != whole_text_findings(t)]
+    print(f"chunked vs whole-text scan over {len(fuzz)} texts x 3 chunk sizes: {len(bad)} differences")
+    if bad:
+        raise SystemExit(f"chunked scan differs on: {[t[:80] for t in bad[:3]]}")
+
+    print(f"{'family':<22}" + "".join(f"{n:>12}" for n in args.sizes) + "   ns/char  (ms per scan)")
+    failures = []
+    for name, build in FAMILIES.items():
+        ms = [time_it(unlimited, build(n), args.repeats) for n in args.sizes]
+        per_char = [m * 1e6 / n for m, n in zip(ms, args.sizes)]
+        ratio = per_char[-1] / per_char[0]
+        print(f"{name:<22}" + "".join(f"{m:>12.2f}" for m in ms)
+              + f"   {per_char[0]:.0f} -> {per_char[-1]:.0f} (x{ratio:.2f})")
+        if ratio > args.max_ratio:
+            failures.append(name)
+
+    big = args.sizes[-1]
+    fuzz_ns = [time_it(unlimited, t, 1) * 1e6 / len(t) for t in fuzz_texts(max(1, args.fuzz // 20), big, seed=1)]
+    print(f"fuzz at {big} chars: max {max(fuzz_ns):.0f} ns/char, median {sorted(fuzz_ns)[len(fuzz_ns) // 2]:.0f}")
+
+    if args.before_sizes:
+        previous = re.compile("|".join(PREVIOUS_PATTERNS))
+        print(f"\nprevious patterns (ms per scan)\n{'family':<22}" + "".join(f"{n:>12}" for n in args.before_sizes))
+        for name, build in FAMILIES.items():
+            ms = [time_it(lambda t: list(previous.finditer(t)), build(n), 1) for n in args.before_sizes]
+            print(f"{name:<22}" + "".join(f"{m:>12.2f}" for m in ms))
+
+    text = FAMILIES["bank detail repeated"](max(big, 1000000))
+    t0 = time.perf_counter()
+    result = scan_findings(text, budget_ms=5.0)
+    print(f"\nbudget 5 ms on {len(text)} chars: complete={result[1]} after {(time.perf_counter() - t0) * 1000:.1f} ms; "
+          f"default budget {privacy_scanner.SCAN_BUDGET_MS:.0f} ms, max input {privacy_scanner.MAX_CHARS} chars "
+          f"(scan of a max-size input: {time_it(scan, FAMILIES['bank detail repeated'](privacy_scanner.MAX_CHARS), 1):.1f} ms)")
+    if failures:
+        raise SystemExit(f"time per char grew more than x{args.max_ratio} for: {failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: expiring and clearing risk_history, row DELETE vs. partition drop / TRUNCATE.
+
+risk_history is filled with --rows rows spread over --months months, then:
+ - expire:  everything older than --keep months removed, either by
+            `DELETE ... WHERE timestamp < cutoff` (the unpartitioned way) or by
+            enforce_retention() dropping whole month partitions (archival off,
+            or on with --archive to include writing the Parquet files)
+ - clear:   the whole table emptied, by `DELETE FROM risk_history` (the previous
+            delete_all) or crud.delete_all() (TRUNCATE)
+Each is timed on a fresh fill, and the table's on-disk size (heap + indexes,
+all partitions) is reported afterwards: DELETE leaves dead tuples behind until
+VACUUM, dropped partitions and TRUNCATE give the space back at once.
+
+Needs PostgreSQL (partitions); the risk_history tables are dropped and recreated.
+
+Usage:
+  cd backend
+  DATABASE_URL=postgresql+asyncpg://user:pw@localhost/helmit python benchmarks/bench_retention.py --rows 1000000
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.crud import delete_all  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.partitions import add_months, create_month, enforce_retention, month_partitions, month_start  # noqa: E402
+
+
+async def sql(statement: str):
+    async with engine.begin() as conn:
+        result = await conn.execute(text(statement))
+        return result.scalar() if result.returns_rows else None
+
+
+async def table_mb() -> float:
+    size = await sql(
+        "SELECT coalesce(sum(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+        "WHERE c.relname = 'risk_history' OR c.oid IN (SELECT inhrelid FROM pg_inherits i "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'risk_history')")
+    return float(size) / 1e6
+
+
+async def fill(rows: int, months: int, now: datetime):
+    await sql("DROP TABLE IF EXISTS risk_history, risk_rollup_hour, risk_rollup_day, risk_rollup_delta CASCADE")
+    await init_db()
+    # the month partitions for the whole span, so no row lands in the default partition
+    async with engine.begin() as conn:
+        have = set(await conn.run_sync(month_partitions))
+        month = month_start(now - timedelta(days=months * 30))
+        while month <= month_start(now):
+            if month not in have:
+                await conn.run_sync(create_month, month)
+            month = add_months(month, 1)
+    # server-side generate_series: the fill itself is not what is measured
+    await sql(f"""
+        INSERT INTO risk_history (timestamp, message, sender, risk_level, risk_score, label_probs)
+        SELECT timestamp '{now:%Y-%m-%d %H:%M:%S}+00' - random() * interval '{months * 30} days',
+               'benchmark message ' || g, 'child', 'low', random(), '{{"self_harm": 0.1}}'::json
+        FROM generate_series(1, {rows}) g""")
+    await sql("ANALYZE risk_history")
+
+
+async def timed(coro):
+    t0 = time.perf_counter()
+    await coro
+    return (time.perf_counter() - t0) * 1000.0
+
+
+async def main_async(args):
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("needs DATABASE_URL pointing at PostgreSQL")
+    now = datetime.now(timezone.utc)
+    cutoff = month_start(add_months(month_start(now), -args.keep))
+    retention_days = (now - cutoff).days
+    archive_dir = tempfile.mkdtemp() if args.archive else None
+    print(f"{args.rows} rows over {args.months} months, keeping {args.keep} (cutoff {cutoff:%Y-%m-%d})")
+    print(f"{'operation':<34} {'ms':>10} {'size after MB':>14}")
+    runs = [
+        ("expire: DELETE WHERE timestamp <", lambda: sql(f"DELETE FROM risk_history WHERE timestamp < '{cutoff.isoformat()}'")),
+        ("expire: drop partitions" + (" +archive" if archive_dir else ""),
+         lambda: enforce_retention(retention_days, archive_dir, now=now + timedelta(hours=1))),
+        ("clear: DELETE FROM risk_history", lambda: sql("DELETE FROM risk_history")),
+        ("clear: delete_all (TRUNCATE)", delete_all),
+    ]
+    for name, op in runs:
+        await fill(args.rows, args.months, now)
+        ms = await timed(op())
+        print(f"{name:<34} {ms:>10.1f} {await table_mb():>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--keep", type=int, default=3, help="months kept by the expire runs")
+    parser.add_argument("--archive", action="store_true", help="archive expired months to Parquet before dropping")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
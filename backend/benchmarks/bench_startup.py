@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import time of app.main and per-model load time.
+
+Each run imports app.main in a fresh interpreter (so nothing is cached), then
+warms up the model registry and prints how long each artifact took to load.
+
+Usage:
+  cd backend
+  DATABASE_URL=sqlite+aiosqlite:///./bench.db python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app.main
+import_s = time.perf_counter() - t0
+from app.core.model_registry import registry
+t0 = time.perf_counter()
+registry.warm_up()
+warm_s = time.perf_counter() - t0
+print(json.dumps({"import_s": import_s, "warmup_s": warm_s, "models": registry.status()}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=str(ROOT), env=env,
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    imports = [r["import_s"] * 1000 for r in results]
+    warms = [r["warmup_s"] * 1000 for r in results]
+    print(f"import app.main: median {statistics.median(imports):.0f} ms (min {min(imports):.0f}, max {max(imports):.0f})")
+    print(f"registry warm-up: median {statistics.median(warms):.0f} ms")
+    for name in results[0]["models"]:
+        loads = [r["models"][name]["load_ms"] or 0.0 for r in results]
+        print(f"  {name:<16} median load {statistics.median(loads):.0f} ms, "
+              f"available={results[-1]['models'][name]['available']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /api/stats from rollups vs. scanning risk_history (SQL and Python).
+
+The original route fetched the latest 1000 full rows through get_history and
+aggregated them in Python (Counter of levels, per-label probability lists, daily
+buckets from re-parsed ISO strings), so it never covered more than 1000
+predictions. crud.get_stats now reads the hour/day rollups (app/rollups.py),
+so its cost follows the number of buckets in range, not of predictions.
+
+The table is filled up to each of --sizes rows in turn (timestamps spread over
+--days days, seven label probabilities per row), the rollups are rebuilt from it
+(the fill bypasses crud, as a bulk import would), then timed:
+ - python/1000:   the original route's work, latest 1000 rows only
+ - python/all:    the same Python aggregation over every row (skipped above
+                  --python_max rows)
+ - scan/all:      the rollup aggregates computed by scanning risk_history in SQL
+                  (aggregate_range(use_rollups=False), i.e. the pre-rollup get_stats)
+ - stats/all:     get_stats() over the full history
+ - stats/7d:      get_stats(from=now-7d)
+stats/all is compared with scan/all and, where it runs, python/all.
+
+Uses a throwaway SQLite file unless DATABASE_URL is set (rows are inserted with
+the app's own bulk insert on other databases, which is slower to fill).
+
+Usage:
+  cd backend
+  python benchmarks/bench_stats.py --sizes 10000 1000000 10000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from app.core.models_api import LABELS  # noqa: E402
+from app.crud import get_history_page, get_stats, insert_predictions, iter_history  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.rollups import aggregate_range, rebuild_rollups  # noqa: E402
+
+LEVELS = ("low", "medium", "high")
+
+
+def make_rows(start: int, n: int, days: int, now: datetime, rng: random.Random):
+    for i in range(start, start + n):
+        score = rng.random()
+        yield {
+            "timestamp": now - timedelta(seconds=rng.random() * days * 86400),
+            "message": f"benchmark message {i}",
+            "sender": "child",
+            "risk_level": LEVELS[min(2, int(score * 3))],
+            "risk_score": score,
+            "label_probs": {label: round(rng.random(), 4) for label in LABELS},
+            "meta": None,
+        }
+
+
+async def fill(start: int, n: int, days: int, now: datetime, rng: random.Random):
+    rows = make_rows(start, n, days, now, rng)
+    if engine.dialect.name == "sqlite":
+        # straight through sqlite3 in the format SQLAlchemy stores, for speed
+        path = engine.url.database
+        con = sqlite3.connect(path)
+        con.executemany(
+            "INSERT INTO risk_history (timestamp, message, sender, risk_level, risk_score, label_probs, meta) "
+            "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            ((r["timestamp"].strftime("%Y-%m-%d %H:%M:%S.%f"), r["message"], r["sender"], r["risk_level"],
+              r["risk_score"], json.dumps(r["label_probs"])) for r in rows))
+        con.commit()
+        con.close()
+        return
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) == 10000:
+            await insert_predictions(batch)
+            batch = []
+    await insert_predictions(batch)
+
+
+def python_stats(history):
+    """The aggregation the previous /api/stats route did in Python."""
+    levels = Counter(h["risk_level"] for h in history)
+    per_label = defaultdict(list)
+    daily = defaultdict(list)
+    for h in history:
+        for label, prob in (h.get("label_probs") or {}).items():
+            per_label[label].append(float(prob) * 100)
+        daily[h["timestamp"][:10]].append(float(h["risk_score"]) * 100)
+    return {
+        "risk_level_distribution": dict(levels),
+        "label_distribution": {k: sum(v) / len(v) for k, v in per_label.items()},
+        "total_predictions": len(history),
+        "average_risk_score": round(sum(float(h["risk_score"]) for h in history) / len(history) * 100, 2),
+    }
+
+
+async def timed(coro):
+    t0 = time.perf_counter()
+    out = await coro
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+async def python_all():
+    return python_stats([r async for r in iter_history(order="asc")])
+
+
+async def python_1000():
+    rows, _ = await get_history_page(limit=1000, order="desc")
+    return python_stats(rows)
+
+
+def close(a, b):
+    return all(abs(a[k] - b[k]) < 1e-6 for k in a) and a.keys() == b.keys()
+
+
+def same_days(a, b):
+    return a.keys() == b.keys() and all(
+        all(abs(a[d][k] - b[d][k]) <= 1e-9 * max(1.0, abs(b[d][k])) for k in a[d]) for d in a)
+
+
+async def main_async(args):
+    try:
+        await init_db()
+    except Exception:
+        pass  # as on app startup
+    print(f"database: {os.environ['DATABASE_URL']}")
+    print(f"{'rows':>10} {'fill s':>7} {'rebuild s':>9} {'python/1000 ms':>14} {'python/all ms':>13} "
+          f"{'scan/all ms':>11} {'stats/all ms':>12} {'stats/7d ms':>11} match")
+    now = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    have = 0
+    for size in sorted(args.sizes):
+        t0 = time.perf_counter()
+        await fill(have, size - have, args.days, now, rng)
+        have = size
+        fill_s = time.perf_counter() - t0
+        _, t_rebuild = await timed(rebuild_rollups())
+        _, t_py1k = await timed(python_1000())
+        scan, t_scan = await timed(aggregate_range(use_rollups=False))
+        sql, t_sql = await timed(get_stats())
+        _, t_sql7 = await timed(get_stats(since=now - timedelta(days=7)))
+        match = same_days(await aggregate_range(), scan)
+        if not match:
+            raise SystemExit(f"rollup and scan aggregates differ at {size} rows")
+        t_pyall = float("nan")
+        if size <= args.python_max:
+            py, t_pyall = await timed(python_all())
+            match = (sql["total_predictions"] == py["total_predictions"]
+                     and sql["risk_level_distribution"] == py["risk_level_distribution"]
+                     and abs(sql["average_risk_score"] - py["average_risk_score"]) < 0.011
+                     and close(sql["label_distribution"], py["label_distribution"]))
+            if not match:
+                raise SystemExit(f"rollup and Python stats differ at {size} rows")
+        print(f"{size:>10} {fill_s:>7.1f} {t_rebuild / 1000:>9.1f} {t_py1k:>14.1f} {t_pyall:>13.1f} "
+              f"{t_scan:>11.1f} {t_sql:>12.1f} {t_sql7:>11.1f} {match}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000, 10000000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--python_max", type=int, default=1000000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
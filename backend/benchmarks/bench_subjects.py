@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-subject stats / forecast / history latency as the number of subjects grows.
+
+risk_history is grown to each of --subjects subject counts in turn, --rows rows
+per subject (timestamps spread over --days days), and after each step
+--samples randomly chosen subjects are queried with:
+ - stats:     crud.get_stats(subject_id=...)            (what /api/stats?subject_id= does)
+ - forecast:  rollups.daily_scores(60, subject_id=...)  (the series /api/forecast?subject_id= fits)
+ - history:   crud.get_history_page(limit=100, subject_id=...)
+All three are range scans of ix_risk_history_subject_timestamp_id, so their
+latency should follow rows per subject and stay flat in the number of subjects.
+Reported: median and p95 in ms; the first result of each query is checked
+against the subject's row count.
+
+Uses a throwaway SQLite file unless DATABASE_URL is set; on PostgreSQL the rows
+are generated server-side (the risk_history tables are dropped and recreated).
+
+Usage:
+  cd backend
+  python benchmarks/bench_subjects.py --subjects 10 100 1000 10000 --rows 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.core.models_api import LABELS  # noqa: E402
+from app.crud import get_history_page, get_stats  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.rollups import daily_scores  # noqa: E402
+
+LEVELS = ("low", "medium", "high")
+
+
+def subject(i: int) -> str:
+    return f"subject-{i:06d}"
+
+
+async def fill(first: int, last: int, rows: int, days: int, now: datetime):
+    """Rows for subjects first..last-1, in arrival order (subjects interleaved)."""
+    if engine.dialect.name == "postgresql":
+        probs = ", ".join(f"'{label}', round(random()::numeric, 4)" for label in LABELS)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"""
+                INSERT INTO risk_history (timestamp, subject_id, message, sender, risk_level, risk_score, label_probs)
+                SELECT timestamp '{now:%Y-%m-%d %H:%M:%S}+00' - (r + random()) / {rows} * interval '{days} days',
+                       'subject-' || lpad(s::text, 6, '0'), 'benchmark message', 'child',
+                       (ARRAY['low', 'medium', 'high'])[1 + floor(random() * 3)::int], random(),
+                       json_build_object({probs})
+                FROM generate_series(0, {rows - 1}) r, generate_series({first}, {last - 1}) s"""))
+            await conn.execute(text("ANALYZE risk_history"))
+        return
+    rng = random.Random(first)
+
+    def rows_iter():
+        for r in range(rows):
+            for s in range(first, last):
+                score = rng.random()
+                ts = now - timedelta(days=(r + rng.random()) / rows * days)
+                yield (ts.strftime("%Y-%m-%d %H:%M:%S.%f"), subject(s), "benchmark message", "child",
+                       LEVELS[min(2, int(score * 3))], score,
+                       json.dumps({label: round(rng.random(), 4) for label in LABELS}))
+
+    con = sqlite3.connect(engine.url.database)
+    con.executemany(
+        "INSERT INTO risk_history (timestamp, subject_id, message, sender, risk_level, risk_score, label_probs) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", rows_iter())
+    con.commit()
+    con.execute("ANALYZE")
+    con.close()
+
+
+async def latencies(query, subjects, check):
+    out = []
+    for i, s in enumerate(subjects):
+        t0 = time.perf_counter()
+        result = await query(s)
+        out.append((time.perf_counter() - t0) * 1000.0)
+        if i == 0 and not check(result):
+            raise SystemExit(f"unexpected result for {s}: {result!r:.200}")
+    out.sort()
+    return statistics.median(out), out[int(0.95 * (len(out) - 1))]
+
+
+async def main_async(args):
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS risk_history, risk_rollup_hour, risk_rollup_day, risk_rollup_delta CASCADE"))
+    try:
+        await init_db()
+    except Exception:
+        pass  # as on app startup
+    print(f"database: {os.environ['DATABASE_URL']}")
+    print(f"{'subjects':>8} {'rows':>10} {'fill s':>7} {'stats p50/p95 ms':>17} {'forecast p50/p95 ms':>20} {'history p50/p95 ms':>19}")
+    now = datetime.now(timezone.utc)
+    rng = random.Random(0)
+    have = 0
+    for n in sorted(args.subjects):
+        t0 = time.perf_counter()
+        await fill(have, n, args.rows, args.days, now)
+        have = n
+        fill_s = time.perf_counter() - t0
+        sample = [subject(rng.randrange(n)) for _ in range(args.samples)]
+        stats = await latencies(lambda s: get_stats(subject_id=s), sample,
+                                lambda r: r["total_predictions"] == args.rows)
+        forecast = await latencies(lambda s: daily_scores(60, subject_id=s), sample,
+                                   lambda r: len(r) >= min(60, args.days))
+        history = await latencies(lambda s: get_history_page(limit=100, subject_id=s), sample,
+                                  lambda r: len(r[0]) == min(100, args.rows))
+        print(f"{n:>8} {n * args.rows:>10} {fill_s:>7.1f} {stats[0]:>8.2f}/{stats[1]:<8.2f} "
+              f"{forecast[0]:>10.2f}/{forecast[1]:<9.2f} {history[0]:>9.2f}/{history[1]:<9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--rows", type=int, default=1000, help="rows per subject")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--samples", type=int, default=50, help="subjects queried per step")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
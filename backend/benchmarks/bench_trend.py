@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: incremental trend estimator vs. np.polyfit for the linear forecast fallback.
+
+For each --window, a stream of --predictions random predictions spread over
+--days days (several per day, days in order) is fed one by one to a
+TrendWindow (app/services/trend.py), unweighted and with --halflife. After
+every prediction its forecast is compared with
+forecast_engine.linear_extrapolate on the same window of daily means, and the
+largest absolute difference is reported (the series drifts within [0.2, 0.8],
+so the [0, 1] clipping rarely hides a difference). --check additionally feeds
+the stream through a TrendStore as crud's inserts do, with a forecast that
+seeds the estimator between each insert's commit and its observe(), and compares
+every forecast after it with linear_extrapolate on the committed rows. A
+difference above --tol exits with status 1; --check runs only these
+comparisons, for CI.
+
+Timed per forecast:
+ - polyfit:      linear_extrapolate(series) (np.arange + np.polyfit over the window)
+ - incremental:  TrendWindow.extrapolate() (closed form over the running sums)
+ - update:       TrendWindow.add() of one prediction
+
+Usage:
+  cd backend
+  python benchmarks/bench_trend.py --window 10 60 250 1000 --halflife 14
+  python benchmarks/bench_trend.py --check
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# app.services.trend imports the database layer; nothing is read from it here
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_TMP.name}/bench.db")
+
+from app.services import trend as trend_module  # noqa: E402
+from app.services.forecast_engine import linear_extrapolate  # noqa: E402
+from app.services.trend import TrendStore, TrendWindow  # noqa: E402
+
+
+def stream(n: int, days: int, rng: random.Random):
+    """(day, score) predictions, days ascending, with a slowly drifting mean."""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    per_day = max(1, n // days)
+    level = 0.4
+    for d in range(days):
+        level = min(0.8, max(0.2, level + rng.uniform(-0.03, 0.03)))
+        for _ in range(rng.randint(1, 2 * per_day)):
+            yield start + timedelta(days=d), min(1.0, max(0.0, rng.gauss(level, 0.1)))
+
+
+def check(window: int, halflife: float, args, rng: random.Random):
+    trend = TrendWindow(window, halflife)
+    totals = {}  # day -> [sum, n]
+    worst = 0.0
+    for i, (day, score) in enumerate(stream(args.predictions, args.days, rng)):
+        trend.add(day, score)
+        t = totals.setdefault(day, [0.0, 0])
+        t[0] += score
+        t[1] += 1
+        if i % args.check_every:
+            continue
+        series = [s / n for s, n in totals.values()]
+        ref = linear_extrapolate(series[-window:], args.horizon, halflife)
+        worst = max(worst, max(abs(a - b) for a, b in zip(trend.extrapolate(args.horizon), ref)))
+    return trend, [s / n for s, n in totals.values()], worst
+
+
+async def check_seed_race(window: int, args, rng: random.Random) -> float:
+    """Max difference when a forecast seeds the estimator while each insert is in flight."""
+    store = TrendStore(window, 0.0, max_subjects=1)
+    committed = {}  # day -> [sum, n], what the database holds
+
+    async def load_daily_totals(subject_id, limit):
+        await asyncio.sleep(0)
+        return [(day, s, n) for day, (s, n) in committed.items()][-limit:]
+
+    trend_module.load_daily_totals = load_daily_totals
+    worst = 0.0
+    for i, (day, score) in enumerate(stream(args.predictions // 10, args.days // 10, rng)):
+        if i % 5 == 0:
+            store.clear()  # seed again, as after an eviction or an out-of-order prediction
+        values = [{"timestamp": day, "subject_id": "s", "risk_score": score}]
+        with store.writing(values):
+            t = committed.setdefault(day, [0.0, 0])
+            t[0] += score
+            t[1] += 1
+            # a forecast between the commit and observe(); its seed already sees the row
+            await store.extrapolate("s", args.horizon, window)
+            store.observe(values)
+        got = await store.extrapolate("s", args.horizon, window)
+        series = [s / n for s, n in committed.values()][-window:]
+        ref = linear_extrapolate(series, args.horizon)
+        worst = max(worst, max(abs(a - b) for a, b in zip(got, ref)))
+    return worst
+
+
+def per_call_us(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--window", type=int, nargs="+", default=[1, 2, 10, 60, 250, 1000])
+    parser.add_argument("--halflife", type=float, default=14.0, help="EW half-life in days with predictions")
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--predictions", type=int, default=20000)
+    parser.add_argument("--horizon", type=int, default=3, help="days forecast")
+    parser.add_argument("--check_every", type=int, default=7, help="compare after every n-th prediction")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--tol", type=float, default=1e-9, help="max difference from linear_extrapolate")
+    parser.add_argument("--check", action="store_true", help="only compare with linear_extrapolate")
+    args = parser.parse_args()
+
+    if args.check:
+        failed = False
+        for window in args.window:
+            for halflife in (0.0, args.halflife):
+                worst = check(window, halflife, args, random.Random(window))[2]
+                print(f"window {window:>5} halflife {halflife:>5g}: max diff {worst:.1e}")
+                failed = failed or not worst <= args.tol
+            worst = asyncio.run(check_seed_race(window, args, random.Random(window)))
+            print(f"window {window:>5} seed race:     max diff {worst:.1e}")
+            failed = failed or not worst <= args.tol
+        if failed:
+            raise SystemExit(f"incremental trend differs from linear_extrapolate by more than {args.tol:g}")
+        return
+
+    failed = False
+    print(f"{'window':>6} {'max diff':>9} {'EW max diff':>11} {'polyfit us':>11} {'incremental us':>15} "
+          f"{'update us':>10} {'speedup':>8}")
+    for window in args.window:
+        trend, series, worst = check(window, 0.0, args, random.Random(window))
+        _, _, worst_ew = check(window, args.halflife, args, random.Random(window))
+        tail = series[-window:]
+        polyfit_us = per_call_us(lambda: linear_extrapolate(tail, args.horizon), args.repeat)
+        incremental_us = per_call_us(lambda: trend.extrapolate(args.horizon), args.repeat)
+        newest = trend.days[-1][0]
+        update_us = per_call_us(lambda: trend.add(newest, 0.5), args.repeat)
+        print(f"{window:>6} {worst:>9.1e} {worst_ew:>11.1e} {polyfit_us:>11.1f} {incremental_us:>15.2f} "
+              f"{update_us:>10.2f} {polyfit_us / incremental_us:>7.0f}x")
+        failed = failed or not max(worst, worst_ew) <= args.tol
+    if failed:
+        raise SystemExit(f"incremental trend differs from linear_extrapolate by more than {args.tol:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Export CPU serving variants of the fine-tuned transformer.
+
+Reads experiments/transformer_model (as saved by finetune_transformer.py) and writes,
+next to the fp32 weights:
+ - model.onnx        ONNX graph (dynamic batch and sequence axes)
+ - model_int8.onnx   ONNX graph with int8 weights (onnxruntime dynamic quantization)
+ - export_manifest.json
+The int8 PyTorch variant (dynamically quantized Linear layers) has no file of its
+own: quantization is deterministic, so the serving loader applies it to the fp32
+weights at load time. It is validated and timed here like the others.
+
+Every variant is loaded back through the serving loader
+(app.core.transformer_backend) and scored on --val: it passes when no per-label
+probability differs from fp32 by more than --tol. The manifest records, per
+variant, the max difference, micro/macro F1, per-message latency and memory;
+serving with TRANSFORMER_RUNTIME=auto picks the fastest variant that passed.
+
+Usage:
+  cd backend
+  python training/export_transformer.py --model_dir experiments/transformer_model \
+    --val data/val.csv --formats int8 onnx onnx_int8 --tol 0.05
+
+Notes:
+ - ONNX export/serving needs `onnx` + `onnxruntime` (pip install onnx onnxruntime onnxscript);
+   without them only the int8 PyTorch variant is validated.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.core import models_api, transformer_backend  # noqa: E402
+from app.core.models_api import LABELS  # noqa: E402
+
+DATA_DIR = ROOT / "data"
+FORMATS = ("int8", "onnx", "onnx_int8")
+
+
+def export_onnx(model, tokenizer, out_path: Path):
+    import torch
+    enc = tokenizer(["export sample", "a slightly longer export sample"], padding=True, return_tensors="pt")
+    torch.onnx.export(
+        model, (enc["input_ids"], enc["attention_mask"]), str(out_path),
+        input_names=["input_ids", "attention_mask"], output_names=["logits"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"},
+                      "logits": {0: "batch"}},
+        opset_version=17, dynamo=False,
+    )
+
+
+def export_onnx_int8(onnx_path: Path, out_path: Path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(onnx_path), str(out_path), weight_type=QuantType.QInt8)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def param_mb(model, path: Path) -> float:
+    """In-memory size of the weights the variant actually holds."""
+    if model.runtime.startswith("onnx"):
+        import onnx
+        return sum(len(t.raw_data) for t in onnx.load(str(path)).graph.initializer) / 1e6
+    total = 0
+    for t in list(model.model.state_dict().values()):
+        if isinstance(t, tuple):  # packed int8 Linear params: (weight, bias)
+            t = [x for x in t if x is not None]
+        for x in (t if isinstance(t, list) else [t]):
+            if hasattr(x, "element_size"):
+                total += x.nelement() * x.element_size()
+    return total / 1e6
+
+
+def measure(model_dir: Path, runtime: str, texts, y_true, reference, latency_n: int):
+    """Load a variant through the serving loader and score it on the validation texts."""
+    before = rss_mb()
+    model = transformer_backend.load_transformer(model_dir, runtime)
+    rss_delta = rss_mb() - before
+    probs = model.predict_proba(texts)
+    model.predict_proba(texts[:1])  # warm-up
+    lat = []
+    for t in texts[:latency_n]:
+        t0 = time.perf_counter()
+        model.predict_proba([t])
+        lat.append((time.perf_counter() - t0) * 1000.0)
+    t0 = time.perf_counter()
+    model.predict_proba(texts)
+    batch_ms = (time.perf_counter() - t0) * 1000.0
+    if runtime in transformer_backend.RUNTIME_FILES:
+        path = model_dir / transformer_backend.RUNTIME_FILES[runtime]
+    else:
+        path = transformer_backend.weights_path(model_dir)
+    pred = (probs >= 0.5).astype(int)
+    return probs, {
+        "file": path.name,
+        "size_mb": round(os.path.getsize(path) / 1e6, 2),
+        "param_mb": round(param_mb(model, path), 2),
+        "rss_delta_mb": round(rss_delta, 1),
+        "latency_ms": round(statistics.median(lat), 3),
+        "batch_ms_per_msg": round(batch_ms / len(texts), 3),
+        "f1_micro": round(float(f1_score(y_true, pred, average="micro", zero_division=0)), 4),
+        "f1_macro": round(float(f1_score(y_true, pred, average="macro", zero_division=0)), 4),
+        "max_abs_diff": round(float(np.abs(probs - reference).max()), 6) if reference is not None else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_dir", type=str, default=str(transformer_backend.MODEL_DIR))
+    parser.add_argument("--val", type=str, default=str(DATA_DIR / "val.csv"))
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--tol", type=float, default=0.05)
+    parser.add_argument("--latency_n", type=int, default=100)
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    weights = transformer_backend.weights_path(model_dir)
+    if weights is None:
+        raise SystemExit(f"no fine-tuned weights in {model_dir}; run training/finetune_transformer.py first")
+    has_onnx = all(importlib.util.find_spec(m) is not None for m in ("onnx", "onnxruntime"))
+    formats = [f for f in args.formats if has_onnx or not f.startswith("onnx")]
+    if formats != args.formats:
+        print("onnx/onnxruntime not installed; skipping ONNX exports")
+
+    if "onnx" in formats or "onnx_int8" in formats:
+        fp32 = transformer_backend.load_transformer(model_dir, "fp32")
+        onnx_path = model_dir / transformer_backend.RUNTIME_FILES["onnx"]
+        export_onnx(fp32.model, fp32.tokenizer, onnx_path)
+        if "onnx_int8" in formats:
+            export_onnx_int8(onnx_path, model_dir / transformer_backend.RUNTIME_FILES["onnx_int8"])
+        del fp32
+
+    val = pd.read_csv(args.val).dropna(subset=["text"])
+    texts = val["text"].astype(str).tolist()
+    y_true = val[LABELS].fillna(0).astype(int).values
+
+    reference, results = None, {}
+    for runtime in ["fp32"] + formats:
+        probs, info = measure(model_dir, runtime, texts, y_true, reference, args.latency_n)
+        if reference is None:
+            reference = probs
+        info["passed"] = info["max_abs_diff"] <= args.tol
+        results[runtime] = info
+
+    manifest = {
+        "source_version": models_api._file_version(weights),
+        "tolerance": args.tol,
+        "val": str(args.val),
+        "artifacts": results,
+    }
+    with open(model_dir / transformer_backend.MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"{'runtime':<10} {'file MB':>7} {'param MB':>8} {'rss MB':>7} {'ms/msg':>7} {'batch ms/msg':>12} "
+          f"{'micro F1':>8} {'macro F1':>8} {'max diff':>9} passed")
+    for name, r in results.items():
+        print(f"{name:<10} {r['size_mb']:>7.1f} {r['param_mb']:>8.1f} {r['rss_delta_mb']:>7.1f} {r['latency_ms']:>7.2f} "
+              f"{r['batch_ms_per_msg']:>12.3f} {r['f1_micro']:>8.4f} {r['f1_macro']:>8.4f} "
+              f"{r['max_abs_diff']:>9.4f} {r['passed']}")
+    chosen = transformer_backend.choose_runtime(model_dir, manifest["source_version"], "auto")
+    print(f"wrote {model_dir / transformer_backend.MANIFEST_FILE}; TRANSFORMER_RUNTIME=auto will serve {chosen}")
+
+
+if __name__ == "__main__":
+    main()
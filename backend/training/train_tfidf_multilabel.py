@@ -1,5 +1,6 @@
 # backend/training/train_tfidf_multilabel.py
 import argparse
+import hashlib
 from pathlib import Path
 import joblib
 import numpy as np
@@ -16,6 +17,8 @@ ROOT = Path(__file__).resolve().parents[1]
 DATA_DEFAULT = ROOT / "data" / "multi_label_dataset.csv"
 EXP_DIR = ROOT / "experiments"
 EXP_DIR.mkdir(parents=True, exist_ok=True)
+PIPE_PATH = EXP_DIR / "tfidf_ovr_pipeline.joblib"
+COMPILED_PATH = EXP_DIR / "tfidf_ovr_compiled.joblib"
 
 LABELS = [
   "mental_health_risk",
@@ -64,6 +67,61 @@ def evaluate(y_true, y_pred, y_prob):
     except Exception:
         pass
 
+def compile_pipeline(pipeline):
+    """
+    Flatten a fitted TF-IDF -> OneVsRest(CalibratedClassifierCV(LR, isotonic)) pipeline
+    into plain arrays: vocabulary + idf, one stacked coefficient matrix with a column
+    per (label, fold), and each fold's isotonic calibrator as an np.interp table.
+    """
+    tfidf = pipeline.named_steps["tfidf"]
+    ovr = pipeline.named_steps["clf"]
+    if tfidf.analyzer != "word" or tfidf.sublinear_tf or tfidf.norm not in ("l2", None):
+        raise ValueError("compile_pipeline only supports word analyzers with linear tf and l2/no norm")
+
+    n_features = len(tfidf.vocabulary_)
+    coef_cols, intercepts, calib_x, calib_y, col_label = [], [], [], [], []
+    for j, est in enumerate(ovr.estimators_):
+        if not hasattr(est, "calibrated_classifiers_"):
+            # label constant in training -> _ConstantPredictor
+            coef_cols.append(np.zeros(n_features))
+            intercepts.append(0.0)
+            calib_x.append(np.array([0.0]))
+            calib_y.append(np.array([float(np.ravel(est.y_)[0])]))
+            col_label.append(j)
+            continue
+        for cc in est.calibrated_classifiers_:
+            lr = cc.estimator
+            coef_cols.append(np.asarray(lr.coef_, dtype=np.float64).ravel())
+            intercepts.append(float(np.ravel(lr.intercept_)[0]))
+            iso = cc.calibrators[0]
+            calib_x.append(np.asarray(iso.X_thresholds_, dtype=np.float64))
+            calib_y.append(np.asarray(iso.y_thresholds_, dtype=np.float64))
+            col_label.append(j)
+
+    return {
+        "format": "tfidf_ovr_compiled",
+        "format_version": 1,
+        "labels": list(LABELS),
+        "vocabulary": {str(k): int(v) for k, v in tfidf.vocabulary_.items()},
+        "idf": np.asarray(tfidf.idf_, dtype=np.float64),
+        "token_pattern": tfidf.token_pattern,
+        "lowercase": bool(tfidf.lowercase),
+        "ngram_range": tuple(tfidf.ngram_range),
+        "norm": tfidf.norm,
+        "coef": np.column_stack(coef_cols),          # (n_features, n_cols)
+        "intercept": np.asarray(intercepts),         # (n_cols,)
+        "calib_x": calib_x,
+        "calib_y": calib_y,
+        "col_label": np.asarray(col_label),          # (n_cols,) -> label index
+    }
+
+def export_compiled(pipeline, pipe_path=PIPE_PATH, out_path=COMPILED_PATH):
+    compiled = compile_pipeline(pipeline)
+    # ties the compiled scorer to the exact pipeline artifact it was built from
+    compiled["source_version"] = hashlib.sha256(Path(pipe_path).read_bytes()).hexdigest()[:12]
+    joblib.dump(compiled, out_path)
+    print("Saved compiled scorer ->", out_path)
+
 def train(args):
     X, Y, df = load_data(args.data)
     X_train, X_val, y_train, y_val = train_test_split(X, Y, test_size=0.15, random_state=42)
@@ -82,9 +140,10 @@ def train(args):
     evaluate(y_val, y_pred, y_prob)
 
     # Save pipeline
-    out_path = EXP_DIR / "tfidf_ovr_pipeline.joblib"
+    out_path = PIPE_PATH
     joblib.dump(pipeline, out_path)
     print("Saved pipeline ->", out_path)
+    export_compiled(pipeline, out_path)
 
     # save a small metrics file for reference
     metrics = {"n_train": len(X_train), "n_val": len(X_val)}
@@ -94,5 +153,10 @@ def train(args):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--data", default=str(DATA_DEFAULT))
+    parser.add_argument("--export_only", action="store_true",
+                        help="compile the existing pipeline artifact without retraining")
     args = parser.parse_args()
-    train(args)
+    if args.export_only:
+        export_compiled(joblib.load(PIPE_PATH))
+    else:
+        train(args)